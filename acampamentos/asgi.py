@@ -3,6 +3,8 @@ ASGI config for acampamentos project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP segue para o Django; WebSocket (ws/pagamento/<id>/) vai para o Channels.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +15,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'acampamentos.settings')
 
-application = get_asgi_application()
+# inicializa o Django antes de importar consumers/models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from inscricoes.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+})
@@ -60,6 +60,8 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "inscricoes.context_processors.pagina_publica",
+                "inscricoes.context_processors.politica",
             ],
         },
     },
@@ -120,3 +122,38 @@ EMAIL_TIMEOUT = 20
 
 # ───────────────── Outras
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# ───────────────── Cache (status de pagamento, páginas públicas…)
+# Redis compartilhado entre processos quando REDIS_URL existir; senão, memória local.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# ───────────────── Channels (push de status de pagamento via WebSocket)
+# Com REDIS_URL o push atravessa processos (web + worker); sem ele, só chega
+# o que for salvo no próprio processo web (as telas de espera ainda fazem uma
+# checagem lenta de segurança).
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+# ───────────────── Mercado Pago
+# Aponta o SDK para outro host (ex.: simulador local `manage.py simular_mp`,
+# http://127.0.0.1:8765). Vazio = API real.
+MP_API_BASE_URL = os.environ.get("MP_API_BASE_URL", "")
+# Timeouts (conexão, leitura) em segundos por operação; sobrescreve
+# inscricoes.services.mp_clients.TIMEOUTS. Ex.: {"POST /v1/payments": (3.05, 15)}
+MP_TIMEOUTS = {}
@@ -2,11 +2,18 @@ from django import forms
 from django.apps import apps
 from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.urls import reverse
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils import timezone
 
 from .utils.phones import normalizar_e164_br, validar_e164_br
+from .services import miniaturas
+from .services.importacao_inscricoes import importar_inscricoes, relatorio_erros_csv
+from .services.mp_reconciliacao import conciliar_evento
 from .models import (
     Paroquia, Participante, EventoAcampamento, Inscricao, Pagamento,
     InscricaoSenior, InscricaoJuvenil, InscricaoMirim, InscricaoServos,
@@ -15,7 +22,8 @@ from .models import (
     PoliticaPrivacidade, VideoEventoAcampamento, CrachaTemplate,
     PreferenciasComunicacao, PoliticaReembolso,
     MercadoPagoOwnerConfig, Repasse, SiteImage, LeadLanding, SiteVisit,
-    Grupo, Ministerio, AlocacaoGrupo, AlocacaoMinisterio, Filho
+    Grupo, Ministerio, AlocacaoGrupo, AlocacaoMinisterio, Filho,
+    NotificacaoMercadoPago, Reembolso, ArquivoFoto, MiniaturaImagem,
 )
 
 # =========================================================
@@ -216,6 +224,18 @@ class ParticipanteAdmin(admin.ModelAdmin):
 
 
 # ======================= Eventos ========================
+class ImportarInscricoesForm(forms.Form):
+    arquivo = forms.FileField(label="Planilha (.csv ou .xlsx)")
+    dry_run = forms.BooleanField(label="Só validar (não grava)", required=False)
+    baixar_relatorio = forms.BooleanField(label="Baixar relatório de erros (CSV)", required=False)
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data["arquivo"]
+        if not arquivo.name.lower().endswith((".csv", ".xlsx", ".xlsm")):
+            raise forms.ValidationError("Envie um arquivo .csv ou .xlsx.")
+        return arquivo
+
+
 @admin.register(EventoAcampamento)
 class EventoAcampamentoAdmin(SomenteMinhaParoquiaAdmin):
     list_display = (
@@ -227,7 +247,8 @@ class EventoAcampamentoAdmin(SomenteMinhaParoquiaAdmin):
     prepopulated_fields = {'slug': ('nome',)}
     search_fields = ('nome', 'paroquia__nome')
     fk_limitadas_por_paroquia = ()
-    actions = ["ativar_servos", "desativar_servos", "abrir_inscricao_publica", "abrir_evento_servos"]
+    actions = ["ativar_servos", "desativar_servos", "abrir_inscricao_publica", "abrir_evento_servos",
+               "conciliar_pagamentos_mp", "importar_planilha"]
 
     fieldsets = (
         (None, {
@@ -243,6 +264,12 @@ class EventoAcampamentoAdmin(SomenteMinhaParoquiaAdmin):
             "description": "Para eventos de Servos, selecione o evento principal. "
                            "No evento principal, use a flag para permitir inscrições de servos."
         }),
+        ("Sala de espera", {
+            "fields": ("sala_espera_max_ativos", "sala_espera_por_minuto"),
+            "description": "Para eventos concorridos: na abertura das inscrições, quem passar do limite "
+                           "aguarda numa fila com a posição e o tempo estimado.",
+            "classes": ("collapse",),
+        }),
     )
 
     def get_readonly_fields(self, request, obj=None):
@@ -336,6 +363,73 @@ class EventoAcampamentoAdmin(SomenteMinhaParoquiaAdmin):
         except Exception:
             self.message_user(request, "Não foi possível montar a URL de inscrição.", level=messages.ERROR)
 
+    @admin.action(description="Conciliar pagamentos com o Mercado Pago")
+    def conciliar_pagamentos_mp(self, request, queryset):
+        for ev in queryset.select_related("paroquia__mp_config"):
+            try:
+                res = conciliar_evento(ev)
+            except Exception as e:
+                self.message_user(request, f"{ev.nome}: falha na conciliação ({e}).", level=messages.ERROR)
+                continue
+            self.message_user(
+                request,
+                f"{ev.nome}: {res.consultados} pagamento(s) no MP, {res.criados} criado(s), "
+                f"{res.atualizados} atualizado(s), {res.confirmados} inscrição(ões) confirmada(s).",
+                level=messages.SUCCESS,
+            )
+
+    @admin.action(description="Importar inscrições de planilha (CSV/XLSX)")
+    def importar_planilha(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Selecione apenas um evento.", level=messages.WARNING)
+            return
+        return HttpResponseRedirect(
+            reverse("admin:inscricoes_eventoacampamento_importar", args=[queryset.first().pk])
+        )
+
+    def get_urls(self):
+        return [
+            path("<path:object_id>/importar-inscricoes/", self.admin_site.admin_view(self.importar_view),
+                 name="inscricoes_eventoacampamento_importar"),
+        ] + super().get_urls()
+
+    def importar_view(self, request, object_id):
+        evento = get_object_or_404(self.get_queryset(request), pk=object_id)
+        if not self.has_change_permission(request, evento):
+            raise PermissionDenied
+
+        form = ImportarInscricoesForm(request.POST or None, request.FILES or None)
+        res = None
+        if request.method == "POST" and form.is_valid():
+            arquivo = form.cleaned_data["arquivo"]
+            try:
+                res = importar_inscricoes(evento, arquivo, nome=arquivo.name,
+                                          dry_run=form.cleaned_data["dry_run"])
+            except Exception as e:
+                form.add_error("arquivo", f"Não foi possível ler a planilha: {e}")
+            else:
+                if res.erros and form.cleaned_data["baixar_relatorio"]:
+                    resp = HttpResponse(relatorio_erros_csv(res.erros), content_type="text/csv; charset=utf-8")
+                    resp["Content-Disposition"] = f'attachment; filename="erros-importacao-{evento.slug}.csv"'
+                    return resp
+                prefixo = "[simulação] " if form.cleaned_data["dry_run"] else ""
+                self.message_user(
+                    request,
+                    f"{prefixo}{res.linhas} linha(s): {res.inscricoes_novas} inscrição(ões) nova(s), "
+                    f"{res.inscricoes_atualizadas} atualizada(s), {len(res.erros)} linha(s) com erro.",
+                    level=messages.WARNING if res.erros else messages.SUCCESS,
+                )
+
+        return TemplateResponse(request, "admin/inscricoes/eventoacampamento/importar_inscricoes.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "original": evento,
+            "title": f"Importar inscrições — {evento.nome}",
+            "form": form,
+            "res": res,
+            "erros": res.erros[:500] if res else [],
+        })
+
     @admin.action(description="Ir para o evento de Servos vinculado (se existir)")
     def abrir_evento_servos(self, request, queryset):
         if queryset.count() != 1:
@@ -414,6 +508,48 @@ class PagamentoAdmin(admin.ModelAdmin):
         return qs.none()
 
 
+@admin.register(NotificacaoMercadoPago)
+class NotificacaoMercadoPagoAdmin(admin.ModelAdmin):
+    list_display = ("payment_id", "status", "inscricao", "tentativas", "proxima_tentativa", "recebida_em", "processada_em")
+    list_filter = ("status",)
+    search_fields = ("payment_id", "inscricao__participante__nome")
+    readonly_fields = ("recebida_em", "atualizada_em", "processada_em")
+    actions = ["reprocessar"]
+
+    @admin.action(description="Reprocessar notificações selecionadas")
+    def reprocessar(self, request, queryset):
+        n = queryset.exclude(status=NotificacaoMercadoPago.Status.PROCESSANDO).update(
+            status=NotificacaoMercadoPago.Status.PENDENTE,
+            tentativas=0,
+            proxima_tentativa=timezone.now(),
+            ultimo_erro="",
+        )
+        self.message_user(request, f"{n} notificação(ões) devolvida(s) à fila.", level=messages.SUCCESS)
+
+
+@admin.register(MiniaturaImagem)
+class MiniaturaImagemAdmin(admin.ModelAdmin):
+    list_display = ("fonte", "origem", "status", "tentativas", "proxima_tentativa", "atualizada_em")
+    list_filter = ("status", "origem")
+    search_fields = ("fonte", "sha256")
+    readonly_fields = ("fonte", "origem", "sha256", "arquivos", "ultimo_erro", "criada_em", "atualizada_em")
+    actions = ["refazer"]
+
+    @admin.action(description="Gerar de novo as miniaturas selecionadas")
+    def refazer(self, request, queryset):
+        n = queryset.exclude(status=MiniaturaImagem.Status.PROCESSANDO).update(
+            status=MiniaturaImagem.Status.PENDENTE,
+            sha256="",
+            arquivos={},
+            tentativas=0,
+            proxima_tentativa=timezone.now(),
+            ultimo_erro="",
+        )
+        for fonte in queryset.values_list("fonte", flat=True):
+            miniaturas.invalidar(fonte)
+        self.message_user(request, f"{n} imagem(ns) devolvida(s) à fila.", level=messages.SUCCESS)
+
+
 # ========== Inscrições específicas por tipo ============
 BASE_LIST_DISPLAY = (
     'inscricao', 'data_nascimento', 'paroquia', 'batizado',
@@ -609,6 +745,42 @@ class PoliticaReembolsoAdmin(admin.ModelAdmin):
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
+@admin.register(Reembolso)
+class ReembolsoAdmin(admin.ModelAdmin):
+    list_display = ("pagamento", "evento", "motivo", "status", "valor", "taxa_percentual", "tentativas", "processado_em")
+    list_filter = ("status", "motivo")
+    search_fields = ("evento__nome", "pagamento__transacao_id", "mp_refund_id",
+                     "pagamento__inscricao__participante__nome")
+    readonly_fields = ("mp_refund_id", "tentativas", "solicitado_em", "processado_em", "atualizado_em")
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        user = request.user
+        if getattr(user, "is_superuser", False) or getattr(user, "tipo_usuario", "") == "admin_geral":
+            return qs
+        if getattr(user, "paroquia_id", None):
+            return qs.filter(evento__paroquia=user.paroquia)
+        return qs.none()
+
+
+@admin.register(ArquivoFoto)
+class ArquivoFotoAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "status", "tentativas", "proxima_tentativa", "criada_em", "processada_em")
+    list_filter = ("status",)
+    search_fields = ("sha256", "inscricoes__participante__nome")
+    readonly_fields = ("sha256", "original", "imagem", "cloudinary_ref", "inscricoes",
+                       "tentativas", "ultimo_erro", "criada_em", "atualizada_em", "processada_em")
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        user = request.user
+        if getattr(user, "is_superuser", False) or getattr(user, "tipo_usuario", "") == "admin_geral":
+            return qs
+        if getattr(user, "paroquia_id", None):
+            return qs.filter(inscricoes__paroquia=user.paroquia).distinct()
+        return qs.none()
+
+
 @admin.register(MercadoPagoOwnerConfig)
 class MercadoPagoOwnerConfigAdmin(admin.ModelAdmin):
     list_display = ("nome_exibicao", "ativo", "email_cobranca")
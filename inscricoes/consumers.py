@@ -0,0 +1,33 @@
+# inscricoes/consumers.py
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .services.pagamento_status import estado_pagamento, grupo_pagamento
+
+
+class StatusPagamentoConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/pagamento/<inscricao_id>/ — envia o estado atual ao conectar e depois
+    um push a cada mudança (services.pagamento_status.notificar_status).
+    Substitui o polling de /api/pagamento/status/<id>/ nas telas de espera.
+    """
+
+    async def connect(self):
+        self.inscricao_id = int(self.scope["url_route"]["kwargs"]["inscricao_id"])
+        estado = await database_sync_to_async(estado_pagamento)(self.inscricao_id)
+        if estado is None:
+            await self.close()
+            return
+
+        self.grupo = grupo_pagamento(self.inscricao_id)
+        await self.channel_layer.group_add(self.grupo, self.channel_name)
+        await self.accept()
+        await self.send_json(estado)
+
+    async def disconnect(self, code):
+        grupo = getattr(self, "grupo", None)
+        if grupo:
+            await self.channel_layer.group_discard(grupo, self.channel_name)
+
+    async def pagamento_status(self, event):
+        await self.send_json(event["estado"])
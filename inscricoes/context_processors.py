@@ -0,0 +1,17 @@
+# inscricoes/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .services.politica import politica_atual
+
+
+def pagina_publica(request):
+    """
+    Valores por requisição das páginas em cache (services.paginas_publicas):
+    marcadores na renderização que vai para o cache, valores reais fora dele.
+    """
+    return getattr(request, "pagina_publica", {})
+
+
+def politica(request):
+    """PoliticaPrivacidade em cache (services.politica), consultada só se o template usar."""
+    return {"politica": SimpleLazyObject(politica_atual)}
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inscricoes.utils.benchmark_pagamentos import comparar, executar, salvar
+
+
+class Command(BaseCommand):
+    help = ("Benchmark ponta a ponta do pagamento (checkout → PIX → rajada de webhooks → polling) "
+            "contra o simulador local do MP. Grava o resultado em JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participantes", type=int, default=50)
+        parser.add_argument("--concorrencia", type=int, default=20, help="Participantes simultâneos.")
+        parser.add_argument("--intervalo-poll-ms", type=int, default=250)
+        parser.add_argument("--timeout", type=float, default=60.0,
+                            help="Segundos que cada participante espera pela confirmação.")
+        parser.add_argument("--latencia-mp-ms", type=float, default=80.0)
+        parser.add_argument("--jitter-mp-ms", type=float, default=20.0)
+        parser.add_argument("--taxa-erro-mp", type=float, default=0.0)
+        parser.add_argument("--atraso-webhook-ms", type=float, default=0.0)
+        parser.add_argument("--workers-webhook", type=int, default=1, help="Workers drenando a caixa de entrada.")
+        parser.add_argument("--saida", default="benchmarks/pagamentos.json", help="Arquivo JSON do resultado.")
+        parser.add_argument("--comparar", help="JSON de uma rodada anterior para comparar os p95.")
+        parser.add_argument("--manter-dados", action="store_true", help="Não apaga paróquia/evento/inscrições criados.")
+
+    def handle(self, *args, **opts):
+        anterior = None
+        if opts["comparar"]:
+            try:
+                anterior = json.loads(Path(opts["comparar"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Não foi possível ler {opts['comparar']}: {e}")
+
+        resultado = executar(
+            participantes=opts["participantes"],
+            concorrencia=max(1, opts["concorrencia"]),
+            intervalo_poll_ms=opts["intervalo_poll_ms"],
+            timeout_confirmacao=opts["timeout"],
+            latencia_mp_ms=opts["latencia_mp_ms"],
+            jitter_mp_ms=opts["jitter_mp_ms"],
+            taxa_erro_mp=opts["taxa_erro_mp"],
+            atraso_webhook_ms=opts["atraso_webhook_ms"],
+            workers_webhook=opts["workers_webhook"],
+            manter_dados=opts["manter_dados"],
+            progresso=self.stdout.write,
+        )
+
+        saida = Path(opts["saida"])
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        salvar(resultado, str(saida))
+
+        for rota, m in resultado["rotas"].items():
+            lat, q = m["latencia_ms"], m["queries"]
+            self.stdout.write(
+                f"{rota:<24} n={lat['n']:<5} p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms "
+                f"queries p50={q['p50']} max={q['max']} http={m['status_http']}"
+            )
+        lag = resultado["lag_webhook_confirmacao_ms"]
+        if lag["n"]:
+            self.stdout.write(f"webhook → confirmação: p50={lag['p50']}ms p95={lag['p95']}ms p99={lag['p99']}ms")
+        if anterior:
+            for linha in comparar(resultado, anterior):
+                self.stdout.write(linha)
+
+        estilo = self.style.WARNING if resultado["nao_confirmados"] or any(resultado["erros"].values()) else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{resultado['confirmados']} confirmado(s), {resultado['nao_confirmados']} sem confirmação, "
+            f"erros {resultado['erros']} em {resultado['duracao_s']}s → {saida}"
+        ))
@@ -0,0 +1,54 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inscricoes.management.utils import evento_por_slug_ou_id
+from inscricoes.models import EventoAcampamento
+from inscricoes.services.mp_reconciliacao import MAX_WORKERS, conciliar_evento
+
+
+def _data(valor, fim=False):
+    if not valor:
+        return None
+    try:
+        d = datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor} (use AAAA-MM-DD)")
+    return timezone.make_aware(datetime.combine(d, time.max if fim else time.min))
+
+
+class Command(BaseCommand):
+    help = "Concilia em lote os pagamentos de um ou mais eventos com o Mercado Pago (search por janela de datas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("eventos", nargs="*", help="Slug ou id (UUID) dos eventos.")
+        parser.add_argument("--abertos", action="store_true",
+                            help="Todos os eventos que ainda não terminaram.")
+        parser.add_argument("--inicio", help="Início da janela (AAAA-MM-DD). Padrão: abertura das inscrições.")
+        parser.add_argument("--fim", help="Fim da janela (AAAA-MM-DD). Padrão: fim do evento + folga.")
+        parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Consultas simultâneas ao MP.")
+        parser.add_argument("--dry-run", action="store_true", help="Só mostra o que mudaria.")
+
+    def handle(self, *args, **opts):
+        qs = EventoAcampamento.objects.select_related("paroquia__mp_config")
+        if opts["abertos"]:
+            eventos = list(qs.filter(data_fim__gte=timezone.localdate()))
+        else:
+            eventos = [evento_por_slug_ou_id(ref, qs) for ref in opts["eventos"]]
+        if not eventos:
+            raise CommandError("Informe ao menos um evento (slug/id) ou use --abertos.")
+
+        inicio, fim = _data(opts["inicio"]), _data(opts["fim"], fim=True)
+        for ev in eventos:
+            try:
+                res = conciliar_evento(ev, inicio=inicio, fim=fim,
+                                       max_workers=max(1, opts["workers"]), dry_run=opts["dry_run"])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"{ev.nome}: {e}"))
+                continue
+            prefixo = "[dry-run] " if opts["dry_run"] else ""
+            self.stdout.write(self.style.SUCCESS(
+                f"{prefixo}{ev.nome}: {res.consultados} pagamento(s) no MP, {res.casados} inscrição(ões) casada(s), "
+                f"{res.criados} criado(s), {res.atualizados} atualizado(s), {res.confirmados} confirmada(s)."
+            ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inscricoes.services.pagamento_expiracao import MAX_WORKERS, expirar_pendentes
+
+
+class Command(BaseCommand):
+    help = ("Confere no Mercado Pago os pagamentos pendentes com PIX/preferência vencidos e "
+            "cancela (ou confirma) em lote. Use --loop para rodar periodicamente.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Consultas simultâneas ao MP.")
+        parser.add_argument("--dry-run", action="store_true", help="Só conta os pendentes vencidos.")
+        parser.add_argument("--loop", action="store_true", help="Fica rodando até ser interrompido.")
+        parser.add_argument("--intervalo", type=float, default=300.0,
+                            help="Segundos entre varreduras (modo --loop).")
+
+    def _rodada(self, opts):
+        res = expirar_pendentes(max_workers=max(1, opts["workers"]), dry_run=opts["dry_run"])
+        if opts["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"[dry-run] {res.candidatos} pagamento(s) pendente(s) vencido(s)."))
+            return
+        for pk, erro in res.erros[:20]:
+            self.stderr.write(self.style.ERROR(f"Pagamento {pk}: {erro}"))
+        if res.candidatos or not opts["loop"]:
+            estilo = self.style.WARNING if res.erros else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f"{res.candidatos} pendente(s) vencido(s): {res.cancelados} cancelado(s), "
+                f"{res.confirmados} confirmado(s), {res.mantidos} mantido(s), {len(res.erros)} erro(s)."
+            ))
+
+    def handle(self, *args, **opts):
+        if not opts["loop"]:
+            self._rodada(opts)
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("==> Varredura de pagamentos pendentes iniciada"))
+        try:
+            while True:
+                self._rodada(opts)
+                time.sleep(opts["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Varredura interrompida."))
@@ -0,0 +1,53 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inscricoes.services.financeiro import TAXA_SISTEMA_DEFAULT
+from inscricoes.services.repasse_lote import MAX_WORKERS, gerar_repasses, saldos_a_repassar
+
+
+class Command(BaseCommand):
+    help = ("Gera os PIX de repasse (conta do DONO) de todos os eventos encerrados com saldo em aberto, "
+            "em todas as paróquias.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ate", help="Eventos encerrados antes desta data (AAAA-MM-DD). Padrão: hoje.")
+        parser.add_argument("--taxa", default=str(TAXA_SISTEMA_DEFAULT), help="Taxa do sistema em %%.")
+        parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Cobranças simultâneas no MP.")
+        parser.add_argument("--dry-run", action="store_true", help="Só lista os saldos, sem gerar cobranças.")
+
+    def handle(self, *args, **opts):
+        try:
+            ate = datetime.strptime(opts["ate"], "%Y-%m-%d").date() if opts["ate"] else timezone.localdate()
+        except ValueError:
+            raise CommandError(f"Data inválida: {opts['ate']} (use AAAA-MM-DD)")
+        try:
+            taxa = Decimal(opts["taxa"])
+        except InvalidOperation:
+            raise CommandError(f"Taxa inválida: {opts['taxa']}")
+
+        if opts["dry_run"]:
+            saldos = saldos_a_repassar(encerrados_ate=ate, taxa_percentual=taxa)
+            for resumo, fin, saldo in saldos:
+                self.stdout.write(f"{resumo.paroquia.nome} / {resumo.evento.nome}: base R$ {fin['base_repasse']} "
+                                  f"→ repasse R$ {saldo}")
+            self.stdout.write(self.style.SUCCESS(f"[dry-run] {len(saldos)} evento(s) com saldo a repassar."))
+            return
+
+        def progresso(feitos, total, rep, erro):
+            situacao = self.style.ERROR(f"erro: {erro}") if erro else f"R$ {rep.valor_repasse}"
+            self.stdout.write(f"[{feitos}/{total}] {rep.paroquia.nome} / {rep.evento.nome}: {situacao}")
+
+        try:
+            res = gerar_repasses(encerrados_ate=ate, taxa_percentual=taxa,
+                                 max_workers=max(1, opts["workers"]), progresso=progresso)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        estilo = self.style.WARNING if res.erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{res.eventos} evento(s) com saldo: {res.criados} repasse(s) novo(s), "
+            f"{res.gerados} PIX gerado(s), {res.reaproveitados} reaproveitado(s), {len(res.erros)} erro(s)."
+        ))
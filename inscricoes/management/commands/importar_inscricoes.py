@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inscricoes.management.utils import evento_por_slug_ou_id
+from inscricoes.models import EventoAcampamento
+from inscricoes.services.importacao_inscricoes import LOTE, importar_inscricoes, relatorio_erros_csv
+
+
+class Command(BaseCommand):
+    help = ("Importa inscrições de uma planilha CSV/XLSX para um evento (upsert em lote de participantes, "
+            "inscrições, dados do tipo do evento e contatos), com relatório de erros por linha.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("evento", help="Slug ou id (UUID) do evento.")
+        parser.add_argument("arquivo", help="Planilha .csv ou .xlsx (primeira linha = cabeçalho).")
+        parser.add_argument("--dry-run", action="store_true", help="Só valida, sem gravar.")
+        parser.add_argument("--relatorio", help="Grava o relatório de erros (CSV) neste caminho.")
+        parser.add_argument("--lote", type=int, default=LOTE, help="Linhas por bloco.")
+
+    def handle(self, *args, **opts):
+        evento = evento_por_slug_ou_id(opts["evento"], EventoAcampamento.objects.select_related("paroquia"))
+
+        def progresso(linhas):
+            self.stdout.write(f"{linhas} linha(s) lida(s)...")
+
+        inicio = time.monotonic()
+        try:
+            res = importar_inscricoes(evento, opts["arquivo"], dry_run=opts["dry_run"],
+                                      tamanho_lote=max(1, opts["lote"]), progresso=progresso)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Não foi possível ler a planilha: {e}")
+
+        for erro in res.erros[:20]:
+            self.stderr.write(self.style.ERROR(f"Linha {erro.linha} ({erro.coluna}): {erro.mensagem}"))
+        if len(res.erros) > 20:
+            self.stderr.write(f"... e mais {len(res.erros) - 20} erro(s).")
+        if opts["relatorio"]:
+            with open(opts["relatorio"], "w", newline="", encoding="utf-8") as fh:
+                relatorio_erros_csv(res.erros, fh)
+            self.stdout.write(f"Relatório de erros: {opts['relatorio']}")
+
+        prefixo = "[dry-run] " if opts["dry_run"] else ""
+        estilo = self.style.WARNING if res.erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{prefixo}{res.linhas} linha(s) em {time.monotonic() - inicio:.1f}s: "
+            f"{res.inscricoes_novas} inscrição(ões) nova(s), {res.inscricoes_atualizadas} atualizada(s), "
+            f"{res.participantes_novos} participante(s) novo(s), {len(res.erros)} linha(s) com erro."
+        ))
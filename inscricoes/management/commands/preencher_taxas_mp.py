@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from inscricoes.management.utils import evento_por_slug_ou_id
+from inscricoes.services.mp_taxas import MAX_WORKERS, preencher_taxas
+
+
+class Command(BaseCommand):
+    help = "Relê no Mercado Pago os pagamentos confirmados e grava fee_mp / net_received (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("eventos", nargs="*", help="Slug ou id (UUID) dos eventos. Padrão: todos.")
+        parser.add_argument("--todos", action="store_true",
+                            help="Relê também os pagamentos que já têm taxa gravada.")
+        parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Consultas simultâneas ao MP.")
+        parser.add_argument("--dry-run", action="store_true", help="Só conta os pagamentos a reler.")
+
+    def handle(self, *args, **opts):
+        eventos = None
+        if opts["eventos"]:
+            eventos = [evento_por_slug_ou_id(ref) for ref in opts["eventos"]]
+
+        def progresso(feitos, total):
+            if feitos == total or feitos % 50 == 0:
+                self.stdout.write(f"[{feitos}/{total}] pagamentos relidos")
+
+        res = preencher_taxas(todos=opts["todos"], eventos=eventos, max_workers=max(1, opts["workers"]),
+                              dry_run=opts["dry_run"], progresso=progresso)
+        if opts["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"[dry-run] {res.pagamentos} pagamento(s) a reler."))
+            return
+
+        for pk, erro in res.erros[:20]:
+            self.stderr.write(self.style.ERROR(f"Pagamento {pk}: {erro}"))
+        estilo = self.style.WARNING if res.erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{res.pagamentos} pagamento(s) relido(s): {res.atualizados} atualizado(s), "
+            f"{res.sem_mudanca} sem mudança, {len(res.erros)} erro(s)."
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inscricoes.services import fotos, miniaturas
+
+
+class Command(BaseCommand):
+    help = ("Reduz e envia as fotos pendentes do cadastro de casais e gera as miniaturas das imagens "
+            "enviadas (use --loop para rodar como worker).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Fica rodando até ser interrompido.")
+        parser.add_argument("--lote", type=int, default=20, help="Fotos (e miniaturas) reservadas por rodada.")
+        parser.add_argument("--intervalo", type=float, default=2.0,
+                            help="Segundos de espera quando a fila está vazia (modo --loop).")
+
+    def handle(self, *args, **opts):
+        lote = opts["lote"]
+
+        def processar_lote():
+            # a fila mais cheia decide se vale outra rodada imediata
+            n_fotos, n_miniaturas = fotos.processar_lote(lote), miniaturas.processar_lote(lote)
+            return n_fotos + n_miniaturas, max(n_fotos, n_miniaturas) >= lote
+
+        if not opts["loop"]:
+            total = 0
+            while True:
+                n, cheia = processar_lote()
+                total += n
+                if not cheia:
+                    break
+            self.stdout.write(self.style.SUCCESS(f"{total} foto(s)/miniatura(s) processada(s)."))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("==> Worker de fotos iniciado"))
+        try:
+            while True:
+                n, _ = processar_lote()
+                if n:
+                    self.stdout.write(f"{n} foto(s)/miniatura(s) processada(s).")
+                else:
+                    time.sleep(opts["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker interrompido."))
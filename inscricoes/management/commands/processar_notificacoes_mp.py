@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inscricoes.services.mp_webhook_inbox import processar_lote
+
+
+class Command(BaseCommand):
+    help = "Drena a caixa de entrada dos webhooks do Mercado Pago (use --loop para rodar como worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Fica rodando até ser interrompido.")
+        parser.add_argument("--lote", type=int, default=50, help="Notificações reservadas por rodada.")
+        parser.add_argument("--intervalo", type=float, default=2.0,
+                            help="Segundos de espera quando a fila está vazia (modo --loop).")
+
+    def handle(self, *args, **opts):
+        lote = opts["lote"]
+
+        if not opts["loop"]:
+            total = 0
+            while True:
+                n = processar_lote(lote)
+                total += n
+                if n < lote:
+                    break
+            self.stdout.write(self.style.SUCCESS(f"{total} notificação(ões) processada(s)."))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("==> Worker de notificações MP iniciado"))
+        try:
+            while True:
+                n = processar_lote(lote)
+                if n:
+                    self.stdout.write(f"{n} notificação(ões) processada(s).")
+                else:
+                    time.sleep(opts["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker interrompido."))
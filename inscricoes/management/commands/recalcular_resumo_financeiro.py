@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inscricoes.management.utils import evento_por_slug_ou_id
+from inscricoes.models import EventoAcampamento
+from inscricoes.services.financeiro import recalcular_resumos
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o resumo financeiro por evento a partir dos pagamentos confirmados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("eventos", nargs="*", help="Slug ou id (UUID) dos eventos. Padrão: todos.")
+
+    def handle(self, *args, **opts):
+        ids = None
+        if opts["eventos"]:
+            qs = EventoAcampamento.objects.only("pk")
+            ids = [evento_por_slug_ou_id(ref, qs).pk for ref in opts["eventos"]]
+
+        with transaction.atomic():
+            total = recalcular_resumos(ids)
+        self.stdout.write(self.style.SUCCESS(f"{total} resumo(s) financeiro(s) recalculado(s)."))
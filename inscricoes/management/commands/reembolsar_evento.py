@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from inscricoes.management.utils import evento_por_slug_ou_id
+from inscricoes.models import EventoAcampamento, Reembolso
+from inscricoes.services.reembolso_lote import MAX_WORKERS, POR_SEGUNDO, reembolsar_evento
+
+
+class Command(BaseCommand):
+    help = ("Executa em lote os reembolsos de um evento no Mercado Pago, conforme a PoliticaReembolso "
+            "(solicitações pendentes) ou integralmente (--evento-cancelado).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("evento", help="Slug ou id (UUID) do evento.")
+        parser.add_argument("--evento-cancelado", action="store_true",
+                            help="Reembolsa integralmente todos os pagamentos confirmados do evento.")
+        parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Chamadas simultâneas ao MP.")
+        parser.add_argument("--por-segundo", type=float, default=POR_SEGUNDO,
+                            help="Ritmo máximo de reembolsos por segundo.")
+        parser.add_argument("--dry-run", action="store_true", help="Só calcula, sem gravar nem chamar o MP.")
+
+    def handle(self, *args, **opts):
+        evento = evento_por_slug_ou_id(opts["evento"], EventoAcampamento.objects.select_related("paroquia__mp_config"))
+
+        motivo = Reembolso.Motivo.EVENTO_CANCELADO if opts["evento_cancelado"] else Reembolso.Motivo.SOLICITACAO
+
+        def progresso(feitos, total, reembolso, erro):
+            if erro or feitos == total or feitos % 50 == 0:
+                self.stdout.write(f"[{feitos}/{total}] pagamento {reembolso.pagamento_id}: {erro or 'ok'}")
+
+        res = reembolsar_evento(evento, motivo, max_workers=max(1, opts["workers"]),
+                                por_segundo=opts["por_segundo"], dry_run=opts["dry_run"], progresso=progresso)
+        prefixo = "[dry-run] " if opts["dry_run"] else ""
+        for pk, erro in res.erros[:20]:
+            self.stderr.write(self.style.ERROR(f"Pagamento {pk}: {erro}"))
+        estilo = self.style.WARNING if res.erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{prefixo}{evento.nome}: {res.pagamentos} pagamento(s), {res.concluidos} reembolsado(s), "
+            f"{res.negados} negado(s), {len(res.erros)} erro(s); R$ {res.total_devolvido} devolvido(s)."
+        ))
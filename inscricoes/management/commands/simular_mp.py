@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from inscricoes.utils.mp_simulador import ConfigSimulador, SimuladorMP
+
+
+class Command(BaseCommand):
+    help = ("Sobe um simulador local da API do Mercado Pago (preferências, pagamentos, busca, reembolsos) "
+            "com latência/erros configuráveis e disparo de webhooks. Use com MP_API_BASE_URL=<url do simulador>.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--porta", type=int, default=8765)
+        parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latência média por chamada.")
+        parser.add_argument("--jitter-ms", type=float, default=0.0, help="Desvio padrão da latência.")
+        parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas HTTP 500 (0–1).")
+        parser.add_argument("--taxa-limite", type=float, default=0.0, help="Fração de respostas HTTP 429 (0–1).")
+        parser.add_argument("--aprovar-pix-apos", type=float, default=None,
+                            help="Segundos até um PIX pendente ser aprovado sozinho (padrão: nunca).")
+        parser.add_argument("--webhook-url", default="",
+                            help="Envia os webhooks para esta URL em vez da notification_url do pagamento.")
+        parser.add_argument("--atraso-webhook-ms", type=float, default=0.0)
+
+    def handle(self, *args, **opts):
+        config = ConfigSimulador(
+            latencia_ms=opts["latencia_ms"],
+            jitter_ms=opts["jitter_ms"],
+            taxa_erro=opts["taxa_erro"],
+            taxa_limite=opts["taxa_limite"],
+            aprovar_pix_apos=opts["aprovar_pix_apos"],
+            webhook_url=opts["webhook_url"],
+            atraso_webhook_ms=opts["atraso_webhook_ms"],
+        )
+        servidor = SimuladorMP((opts["host"], opts["porta"]), config)
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulador MP em {servidor.url} — rode a aplicação com MP_API_BASE_URL={servidor.url}"
+        ))
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
@@ -0,0 +1,22 @@
+# inscricoes/management/utils.py
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+
+from inscricoes.models import EventoAcampamento
+
+
+def evento_por_slug_ou_id(ref, queryset=None) -> EventoAcampamento:
+    """
+    Evento pelo slug ou, se não houver, pelo id (UUID), para os argumentos dos comandos.
+    `queryset` permite select_related/only; CommandError quando não existe.
+    """
+    qs = EventoAcampamento.objects.all() if queryset is None else queryset
+    evento = qs.filter(slug=ref).first()
+    if evento is None:
+        try:
+            evento = qs.filter(pk=ref).first()
+        except (ValidationError, ValueError):  # ref não é um UUID
+            evento = None
+    if evento is None:
+        raise CommandError(f"Evento não encontrado: {ref}")
+    return evento
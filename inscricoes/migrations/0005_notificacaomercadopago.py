@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0004_politicaprivacidade_imagem_pagto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacaoMercadoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_id', models.CharField(max_length=64, unique=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('processada', 'Processada'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('reprocessar', models.BooleanField(default=False)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_erro', models.TextField(blank=True)),
+                ('recebida_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('processada_em', models.DateTimeField(blank=True, null=True)),
+                ('inscricao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificacoes_mp', to='inscricoes.inscricao')),
+            ],
+            options={
+                'verbose_name': 'Notificação do Mercado Pago',
+                'verbose_name_plural': 'Notificações do Mercado Pago',
+                'ordering': ['recebida_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='inscricoes__status_b62721_idx')],
+            },
+        ),
+    ]
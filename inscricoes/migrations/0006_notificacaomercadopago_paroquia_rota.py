@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0005_notificacaomercadopago'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacaomercadopago',
+            name='paroquia_rota',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
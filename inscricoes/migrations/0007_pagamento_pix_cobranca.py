@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0006_notificacaomercadopago_paroquia_rota'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagamento',
+            name='pix_expira_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='pix_qr_code',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='pix_qr_code_base64',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='pix_ticket_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0007_pagamento_pix_cobranca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagamento',
+            name='mp_init_point',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='mp_preference_email',
+            field=models.EmailField(blank=True, default='', max_length=254),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='mp_preference_expira_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='mp_preference_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='mp_preference_valor',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+    ]
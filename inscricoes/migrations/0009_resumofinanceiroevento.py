@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def preencher_resumos(apps, schema_editor):
+    EventoAcampamento = apps.get_model("inscricoes", "EventoAcampamento")
+    Pagamento = apps.get_model("inscricoes", "Pagamento")
+    Resumo = apps.get_model("inscricoes", "ResumoFinanceiroEvento")
+
+    totais = {
+        row["inscricao__evento_id"]: row
+        for row in (Pagamento.objects.filter(status="confirmado")
+                    .values("inscricao__evento_id")
+                    .annotate(qtd=Count("id"), bruto=Sum("valor"), taxas=Sum("fee_mp")))
+    }
+    linhas = []
+    for evento_id, paroquia_id in EventoAcampamento.objects.values_list("pk", "paroquia_id"):
+        t = totais.get(evento_id) or {}
+        bruto = t.get("bruto") or Decimal("0.00")
+        taxas = t.get("taxas") or Decimal("0.00")
+        linhas.append(Resumo(
+            evento_id=evento_id, paroquia_id=paroquia_id, qtd_confirmados=t.get("qtd") or 0,
+            bruto=bruto, taxas_mp=taxas, liquido=bruto - taxas,
+        ))
+    Resumo.objects.bulk_create(linhas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0008_pagamento_preferencia_checkout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoFinanceiroEvento',
+            fields=[
+                ('evento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo_financeiro', serialize=False, to='inscricoes.eventoacampamento')),
+                ('qtd_confirmados', models.IntegerField(default=0)),
+                ('bruto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('taxas_mp', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('liquido', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('paroquia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_financeiros', to='inscricoes.paroquia')),
+            ],
+            options={
+                'verbose_name': 'Resumo financeiro do evento',
+                'verbose_name_plural': 'Resumos financeiros dos eventos',
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0009_resumofinanceiroevento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['pix_expira_em'], name='pagamento_pend_pix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['mp_preference_expira_em'], name='pagamento_pend_pref_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0010_pagamento_indices_pendentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reembolso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('solicitacao', 'Solicitação do participante'), ('evento_cancelado', 'Evento cancelado')], default='solicitacao', max_length=20)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('concluido', 'Concluído'), ('negado', 'Negado'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('taxa_percentual', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=5)),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('mp_refund_id', models.CharField(blank=True, default='', max_length=64)),
+                ('ultimo_erro', models.TextField(blank=True, default='')),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('solicitado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reembolsos', to='inscricoes.eventoacampamento')),
+                ('pagamento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reembolso', to='inscricoes.pagamento')),
+            ],
+            options={
+                'verbose_name': 'Reembolso',
+                'verbose_name_plural': 'Reembolsos',
+                'indexes': [models.Index(fields=['evento', 'status'], name='inscricoes__evento__0bd838_idx')],
+            },
+        ),
+    ]
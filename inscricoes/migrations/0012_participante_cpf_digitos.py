@@ -0,0 +1,91 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:02
+
+import re
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def _peso(inscricao):
+    """Qual das duas inscrições no mesmo evento sobrevive: pagamento confirmado > com pagamento > mais antiga."""
+    pag = getattr(inscricao, "pagamento", None)
+    return (pag is not None and pag.status == "confirmado", pag is not None, -inscricao.pk)
+
+
+def unificar_por_cpf(apps, schema_editor):
+    """
+    Preenche cpf_digitos e junta participantes com o mesmo CPF em formatos
+    diferentes ("123.456.789-09" / "12345678909"): fica o mais antigo; as
+    inscrições e preferências dos demais passam para ele. Inscrição repetida
+    no mesmo evento: vale a de maior peso (_peso), a outra é removida.
+    """
+    Participante = apps.get_model("inscricoes", "Participante")
+    Inscricao = apps.get_model("inscricoes", "Inscricao")
+    Prefs = apps.get_model("inscricoes", "PreferenciasComunicacao")
+    Pagamento = apps.get_model("inscricoes", "Pagamento")
+    Resumo = apps.get_model("inscricoes", "ResumoFinanceiroEvento")
+
+    grupos = defaultdict(list)
+    for pk, cpf in Participante.objects.order_by("pk").values_list("pk", "cpf"):
+        grupos[re.sub(r"\D", "", cpf or "")].append(pk)
+    # mesma regra de Participante.save: só CPF com 11 dígitos é unificado e indexado
+    grupos = {d: pks for d, pks in grupos.items() if len(d) == 11}
+
+    eventos_afetados = set()
+    for digitos, pks in grupos.items():
+        sobrevivente, duplicados = pks[0], pks[1:]
+        for dup in duplicados:  # raro: quase todo grupo tem um participante só
+            ja_tem = {
+                i.evento_id: i
+                for i in Inscricao.objects.filter(participante_id=sobrevivente).select_related("pagamento")
+            }
+            for insc in Inscricao.objects.filter(participante_id=dup).select_related("pagamento"):
+                atual = ja_tem.get(insc.evento_id)
+                if atual is None:
+                    Inscricao.objects.filter(pk=insc.pk).update(participante_id=sobrevivente)
+                    continue
+                fica, sai = (insc, atual) if _peso(insc) > _peso(atual) else (atual, insc)
+                if getattr(sai, "pagamento", None) is not None and getattr(fica, "pagamento", None) is None:
+                    Pagamento.objects.filter(pk=sai.pagamento.pk).update(inscricao_id=fica.pk)
+                eventos_afetados.add(insc.evento_id)
+                Inscricao.objects.filter(pk=sai.pk).delete()
+                if fica.pk == insc.pk:
+                    Inscricao.objects.filter(pk=insc.pk).update(participante_id=sobrevivente)
+                    ja_tem[insc.evento_id] = insc
+            if Prefs.objects.filter(participante_id=sobrevivente).exists():
+                Prefs.objects.filter(participante_id=dup).delete()
+            else:
+                Prefs.objects.filter(participante_id=dup).update(participante_id=sobrevivente)
+            Participante.objects.filter(pk=dup).delete()
+
+    Participante.objects.bulk_update(
+        [Participante(pk=pks[0], cpf_digitos=digitos) for digitos, pks in grupos.items()],
+        ["cpf_digitos"], batch_size=1000,
+    )
+
+    # pagamentos removidos com inscrições repetidas: resumo financeiro desses eventos refeito
+    for evento_id in eventos_afetados:
+        t = (Pagamento.objects.filter(status="confirmado", inscricao__evento_id=evento_id)
+             .aggregate(qtd=Count("id"), bruto=Sum("valor"), taxas=Sum("fee_mp")))
+        bruto, taxas = t["bruto"] or Decimal("0.00"), t["taxas"] or Decimal("0.00")
+        Resumo.objects.filter(evento_id=evento_id).update(
+            qtd_confirmados=t["qtd"], bruto=bruto, taxas_mp=taxas, liquido=bruto - taxas,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0011_reembolso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participante',
+            name='cpf_digitos',
+            field=models.CharField(blank=True, editable=False, max_length=11, null=True),
+        ),
+        migrations.RunPython(unificar_por_cpf, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0012_participante_cpf_digitos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='participante',
+            name='cpf_digitos',
+            field=models.CharField(blank=True, editable=False, max_length=11, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0013_participante_cpf_digitos_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoFoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('original', models.FileField(blank=True, upload_to='fotos/originais/')),
+                ('imagem', models.ImageField(blank=True, upload_to='fotos/')),
+                ('cloudinary_ref', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('pronta', 'Pronta'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_erro', models.TextField(blank=True, default='')),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('processada_em', models.DateTimeField(blank=True, null=True)),
+                ('inscricoes', models.ManyToManyField(blank=True, related_name='fotos', to='inscricoes.inscricao')),
+            ],
+            options={
+                'verbose_name': 'Foto enviada',
+                'verbose_name_plural': 'Fotos enviadas',
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='inscricoes__status_4c4bca_idx')],
+            },
+        ),
+    ]
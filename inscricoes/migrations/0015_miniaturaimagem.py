@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0014_arquivofoto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MiniaturaImagem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fonte', models.CharField(max_length=255, unique=True)),
+                ('origem', models.CharField(max_length=80)),
+                ('sha256', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('arquivos', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('pronta', 'Pronta'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_erro', models.TextField(blank=True, default='')),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Miniatura de imagem',
+                'verbose_name_plural': 'Miniaturas de imagens',
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='inscricoes__status_0c498b_idx')],
+            },
+        ),
+    ]
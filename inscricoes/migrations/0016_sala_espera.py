@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:18
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0015_miniaturaimagem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventoacampamento',
+            name='sala_espera_max_ativos',
+            field=models.PositiveIntegerField(default=0, help_text='Quantas pessoas preenchem a inscrição ao mesmo tempo; as demais aguardam na fila. 0 = sem fila.', verbose_name='Inscrições simultâneas'),
+        ),
+        migrations.AddField(
+            model_name='eventoacampamento',
+            name='sala_espera_por_minuto',
+            field=models.PositiveIntegerField(default=60, help_text='Ritmo com que a fila é liberada.', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Admissões por minuto'),
+        ),
+    ]
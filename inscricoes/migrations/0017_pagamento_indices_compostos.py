@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0016_sala_espera'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pagamento',
+            name='pagamento_pend_pix_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pagamento',
+            name='pagamento_pend_pref_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['status', 'pix_expira_em'], name='pagamento_status_pix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['status', 'mp_preference_expira_em'], name='pagamento_status_pref_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inscricoes', '0017_pagamento_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repasse',
+            name='geracao_pix',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='repasse',
+            name='pix_expira_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,5 @@
-import re
 import uuid
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 from typing import Optional
 from django.conf import settings
@@ -24,6 +23,7 @@ from django.utils.functional import cached_property
 from cloudinary.models import CloudinaryField
 
 # utils de telefone do próprio app
+from .utils.cpf import cpf_digitos
 from .utils.phones import normalizar_e164_br, validar_e164_br
 
 # tenta importar o cliente do WhatsApp (sem quebrar em dev)
@@ -106,9 +106,18 @@ class PastoralMovimento(models.Model):
 # ---------------------------------------------------------------------
 # Participante
 # ---------------------------------------------------------------------
+class ParticipanteQuerySet(models.QuerySet):
+    def por_cpf(self, cpf):
+        """CPF em qualquer formato (com ou sem máscara) → um seek no índice único de cpf_digitos."""
+        d = cpf_digitos(cpf)
+        return self.filter(cpf_digitos=d) if len(d) == 11 else self.none()
+
+
 class Participante(models.Model):
     nome      = models.CharField(max_length=150)
     cpf       = models.CharField(max_length=14, unique=True)
+    # só dígitos, mantido no save(); é por ele que todas as buscas por CPF passam (objects.por_cpf)
+    cpf_digitos = models.CharField(max_length=11, unique=True, null=True, blank=True, editable=False)
     telefone  = models.CharField(max_length=15)
     email     = models.EmailField()
     foto      = CloudinaryField(null=True, blank=True, verbose_name="Foto do Participante")
@@ -136,9 +145,23 @@ class Participante(models.Model):
         verbose_name="Token para QR Code"
     )
 
+    objects = ParticipanteQuerySet.as_manager()
+
+    def clean(self):
+        super().clean()
+        # "123.456.789-09" e "12345678909" são o mesmo participante
+        if self.cpf and Participante.objects.por_cpf(self.cpf).exclude(pk=self.pk).exists():
+            raise ValidationError({'cpf': "Já existe um participante com este CPF."})
+
     def save(self, *args, **kwargs):
         if not self.qr_token:
             self.qr_token = uuid.uuid4()
+        # só CPF completo vai ao índice (max_length=11); valor legado fora do padrão fica sem
+        d = cpf_digitos(self.cpf)
+        self.cpf_digitos = d if len(d) == 11 else None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "cpf" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "cpf_digitos"}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -195,6 +218,19 @@ class EventoAcampamento(models.Model):
         help_text="Se este for um evento de Servos, vincule ao evento principal em que irão servir."
     )
 
+    # Sala de espera na abertura das inscrições (services.sala_espera)
+    sala_espera_max_ativos = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Inscrições simultâneas",
+        help_text="Quantas pessoas preenchem a inscrição ao mesmo tempo; as demais aguardam na fila. 0 = sem fila."
+    )
+    sala_espera_por_minuto = models.PositiveIntegerField(
+        default=60,
+        validators=[MinValueValidator(1)],
+        verbose_name="Admissões por minuto",
+        help_text="Ritmo com que a fila é liberada."
+    )
+
     def save(self, *args, **kwargs):
         # slug único e resiliente
         if not self.slug:
@@ -368,6 +404,19 @@ class Inscricao(models.Model):
     def __str__(self):
         return f"{self.participante.nome} – {self.evento.nome} – {self.paroquia.nome}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # estado publicado nas telas de espera: signals.push_status_inscricao só avisa quando muda
+        obj._status_salvo = obj.status_publicado() if obj._campos_status_carregados() else None
+        return obj
+
+    def _campos_status_carregados(self) -> bool:
+        return not ({"status", "pagamento_confirmado"} & self.get_deferred_fields())
+
+    def status_publicado(self) -> tuple:
+        return (self.status, self.pagamento_confirmado)
+
     # ------------------------------------------------------------
     # URLs úteis
     # ------------------------------------------------------------
@@ -511,24 +560,13 @@ class Inscricao(models.Model):
                     outra.inscricao_pareada = None
                     outra.save(update_fields=['inscricao_pareada'])
 
-    # utils para CPF do cônjuge
-    def _digits(self, s: Optional[str]) -> str:
-        return re.sub(r'\D', '', s or '')
-
-    def _fmt(self, digits: str) -> str:
-        return f"{digits[0:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:11]}" if len(digits) == 11 else digits
-
     def tentar_vincular_conjuge(self) -> bool:
         if self.par is not None:
             return False
-        d = self._digits(self.cpf_conjuge)
-        if len(d) != 11:
+        if len(cpf_digitos(self.cpf_conjuge)) != 11:
             return False
-        variantes = {d, self._fmt(d)}
-        from . import participante as _p
-        try:
-            conjuge_part = _p.Participante.objects.get(cpf__in=variantes)
-        except _p.Participante.DoesNotExist:
+        conjuge_part = Participante.objects.por_cpf(self.cpf_conjuge).first()
+        if conjuge_part is None:
             return False
         alvo = type(self).objects.filter(evento=self.evento, participante=conjuge_part).first()
         if not alvo or alvo.par is not None:
@@ -833,35 +871,139 @@ class Pagamento(models.Model):
         verbose_name='Comprovante de Pagamento'
     )
 
+    # cobrança PIX em aberto (reaproveitada até expirar, sem nova chamada ao MP)
+    pix_qr_code = models.TextField(blank=True, default="")
+    pix_qr_code_base64 = models.TextField(blank=True, default="")
+    pix_ticket_url = models.URLField(max_length=500, blank=True, default="")
+    pix_expira_em = models.DateTimeField(null=True, blank=True)
+
+    # preferência do Checkout Pro (reaproveitada enquanto valor e pagador não mudarem)
+    mp_preference_id = models.CharField(max_length=100, blank=True, default="")
+    mp_init_point = models.URLField(max_length=500, blank=True, default="")
+    mp_preference_valor = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    mp_preference_email = models.EmailField(blank=True, default="")
+    mp_preference_expira_em = models.DateTimeField(null=True, blank=True)
+
+    # margem para o participante conseguir pagar antes do QR vencer
+    PIX_MARGEM_REUSO = timedelta(minutes=3)
+    PREFERENCIA_VALIDADE = timedelta(hours=24)
+    PREFERENCIA_MARGEM_REUSO = timedelta(minutes=30)
+
+    class Meta:
+        indexes = [
+            # varredura de pendentes vencidos (services.pagamento_expiracao); compostos e não
+            # parciais: o MySQL ignora índice com condition
+            models.Index(fields=["status", "pix_expira_em"], name="pagamento_status_pix_idx"),
+            models.Index(fields=["status", "mp_preference_expira_em"], name="pagamento_status_pref_idx"),
+        ]
+
     def __str__(self):
         return f"Pagamento de {self.inscricao}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        obj = super().from_db(db, field_names, values)
+        # foto do que já está somado em ResumoFinanceiroEvento (usada na exclusão; o save relê travado)
+        obj._financeiro_salvo = obj.contribuicao_financeira() if obj._campos_financeiros_carregados() else None
+        return obj
+
+    def _campos_financeiros_carregados(self) -> bool:
+        return not ({"status", "valor", "fee_mp"} & self.get_deferred_fields())
+
+    @classmethod
+    def _contribuicao(cls, status, valor, fee_mp) -> tuple:
+        if status != cls.StatusPagamento.CONFIRMADO:
+            return (0, Decimal("0.00"), Decimal("0.00"))
+        return (1, Decimal(valor or 0), Decimal(fee_mp or 0))
 
-# 🔔 NOVO: sincroniza Pagamento → Inscricao e propaga para o cônjuge (casais)
-@receiver(post_save, sender=Pagamento)
-def _sincronizar_pagamento_inscricao(sender, instance: 'Pagamento', created, **kwargs):
+    def contribuicao_financeira(self) -> tuple:
+        """(qtd, bruto, taxas_mp) com que este pagamento entra no resumo do evento."""
+        return self._contribuicao(self.status, self.valor, self.fee_mp)
+
+    def save(self, *args, **kwargs):
+        # pagamento, inscrição/par e resumo financeiro mudam juntos (receivers em signals.py)
+        with transaction.atomic():
+            if self.pk is not None:
+                # a variação parte da linha travada, não da lida antes: retorno do MP,
+                # webhook e varredura confirmando juntos não somam duas vezes no resumo
+                salvo = (Pagamento.objects.select_for_update().filter(pk=self.pk)
+                         .values_list("status", "valor", "fee_mp").first())
+                self._financeiro_salvo = self._contribuicao(*salvo) if salvo else self._contribuicao(None, 0, 0)
+            super().save(*args, **kwargs)
+        self._financeiro_salvo = self.contribuicao_financeira()
+
+    def pix_reutilizavel(self, valor) -> bool:
+        """True se a cobrança PIX guardada ainda serve para este valor."""
+        return bool(
+            self.status == self.StatusPagamento.PENDENTE
+            and self.metodo == self.MetodoPagamento.PIX
+            and self.transacao_id
+            and self.pix_qr_code
+            and self.pix_expira_em
+            and self.pix_expira_em > timezone.now() + self.PIX_MARGEM_REUSO
+            and self.valor == valor
+        )
+
+    def preferencia_reutilizavel(self, valor, email) -> bool:
+        """True se a preferência guardada vale para este valor/pagador e não está perto de expirar."""
+        return bool(
+            self.status != self.StatusPagamento.CONFIRMADO
+            and self.mp_preference_id
+            and self.mp_init_point
+            and self.mp_preference_expira_em
+            and self.mp_preference_expira_em > timezone.now() + self.PREFERENCIA_MARGEM_REUSO
+            and self.mp_preference_valor == valor
+            and (self.mp_preference_email or "").lower() == (email or "").lower()
+        )
+
+
+# ---------------------------------------------------------------------
+# Caixa de entrada dos webhooks do Mercado Pago
+# ---------------------------------------------------------------------
+class NotificacaoMercadoPago(models.Model):
     """
-    Ao salvar Pagamento, reflete na Inscricao.pagamento_confirmado e dispara
-    a lógica de propagação para o cônjuge (via save() da Inscricao).
+    Notificação recebida em mp_webhook, gravada ANTES de qualquer chamada ao MP.
+    O worker `manage.py processar_notificacoes_mp` drena a fila.
+    Uma linha por payment_id: reentregas do MP apenas reabrem a linha existente.
     """
-    try:
-        ins = instance.inscricao
-    except Exception:
-        return
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        PROCESSANDO = "processando", "Processando"
+        PROCESSADA = "processada", "Processada"
+        ERRO = "erro", "Erro"
 
-    status = (instance.status or '').lower()
-    deve_marcar = (status == 'confirmado')
+    payment_id = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
 
-    # evita salvar se já está coerente
-    if bool(ins.pagamento_confirmado) == deve_marcar and bool(ins.inscricao_concluida) == deve_marcar:
-        return
+    # id da paróquia assinado na notification_url (?r=); evita a consulta de "descoberta".
+    # Inteiro simples (não FK) para nunca recusar o webhook por paróquia removida.
+    paroquia_rota = models.PositiveIntegerField(null=True, blank=True)
+    # preenchida no 1º processamento; usada para ordenar por inscrição
+    inscricao = models.ForeignKey(
+        Inscricao, null=True, blank=True, on_delete=models.SET_NULL, related_name="notificacoes_mp"
+    )
 
-    ins.pagamento_confirmado = deve_marcar
-    ins.inscricao_concluida = deve_marcar
-    try:
-        ins.save()  # save() cuidará de propagar ao cônjuge quando for "casais"
-    except Exception:
-        pass
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    # chegou nova entrega enquanto a linha estava em processamento
+    reprocessar = models.BooleanField(default=False)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+
+    recebida_em = models.DateTimeField(auto_now_add=True)
+    atualizada_em = models.DateTimeField(auto_now=True)
+    processada_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Notificação do Mercado Pago"
+        verbose_name_plural = "Notificações do Mercado Pago"
+        ordering = ["recebida_em"]
+        indexes = [
+            models.Index(fields=["status", "proxima_tentativa"]),
+        ]
+
+    def __str__(self):
+        return f"MP {self.payment_id} ({self.get_status_display()})"
 
 
 # ---------------------------------------------------------------------
@@ -1289,6 +1431,121 @@ class PoliticaReembolso(models.Model):
         super().save(*args, **kwargs)
 
 
+class Reembolso(models.Model):
+    """
+    Devolução de um pagamento confirmado, executada em lote
+    (services.reembolso_lote). Uma linha por pagamento: repetir o lote
+    reaproveita a linha e a mesma chave de idempotência no MP.
+    """
+    class Motivo(models.TextChoices):
+        SOLICITACAO = "solicitacao", "Solicitação do participante"
+        EVENTO_CANCELADO = "evento_cancelado", "Evento cancelado"
+
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        CONCLUIDO = "concluido", "Concluído"
+        NEGADO = "negado", "Negado"
+        ERRO = "erro", "Erro"
+
+    pagamento = models.OneToOneField(Pagamento, on_delete=models.CASCADE, related_name="reembolso")
+    evento = models.ForeignKey(EventoAcampamento, on_delete=models.CASCADE, related_name="reembolsos")
+    motivo = models.CharField(max_length=20, choices=Motivo.choices, default=Motivo.SOLICITACAO)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+
+    valor_pago = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))
+    taxa_percentual = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal("0.00"))
+    valor = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0.00"))  # a devolver
+
+    mp_refund_id = models.CharField(max_length=64, blank=True, default="")
+    ultimo_erro = models.TextField(blank=True, default="")
+    tentativas = models.PositiveIntegerField(default=0)
+
+    solicitado_em = models.DateTimeField(default=timezone.now)  # base do prazo da política
+    processado_em = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Reembolso"
+        verbose_name_plural = "Reembolsos"
+        indexes = [models.Index(fields=["evento", "status"])]
+
+    def __str__(self):
+        return f"Reembolso {self.pagamento_id} — {self.valor} ({self.status})"
+
+
+class ArquivoFoto(models.Model):
+    """
+    Foto enviada no cadastro de casais, gravada uma vez por conteúdo (sha256).
+    formulario_casais só guarda o original e liga as inscrições; o worker
+    `manage.py processar_fotos` reduz a imagem, sobe uma vez (storage e
+    Cloudinary) e aponta InscricaoCasais.foto_casal e Participante.foto de
+    todas as inscrições ligadas para o mesmo arquivo (services.fotos).
+    """
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        PROCESSANDO = "processando", "Processando"
+        PRONTA = "pronta", "Pronta"
+        ERRO = "erro", "Erro"
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    original = models.FileField(upload_to="fotos/originais/", blank=True)  # apagado depois de processado
+    imagem = models.ImageField(upload_to="fotos/", blank=True)              # versão reduzida (foto_casal)
+    cloudinary_ref = models.CharField(max_length=255, blank=True, default="")  # valor de Participante.foto
+    inscricoes = models.ManyToManyField(Inscricao, blank=True, related_name="fotos")
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True, default="")
+
+    criada_em = models.DateTimeField(auto_now_add=True)
+    atualizada_em = models.DateTimeField(auto_now=True)
+    processada_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Foto enviada"
+        verbose_name_plural = "Fotos enviadas"
+        indexes = [models.Index(fields=["status", "proxima_tentativa"])]
+
+    def __str__(self):
+        return f"Foto {self.sha256[:12]} ({self.status})"
+
+
+class MiniaturaImagem(models.Model):
+    """
+    Miniaturas (WebP + JPEG, larguras fixas) de uma imagem enviada, geradas
+    pelo worker de fotos (services.miniaturas). `fonte` é o valor gravado no
+    campo de origem (nome no storage ou referência do Cloudinary); as
+    templates escolhem a menor que cobre a largura pedida (templatetags.miniaturas).
+    """
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        PROCESSANDO = "processando", "Processando"
+        PRONTA = "pronta", "Pronta"
+        ERRO = "erro", "Erro"
+
+    fonte = models.CharField(max_length=255, unique=True)
+    origem = models.CharField(max_length=80)  # "app_label.Modelo.campo" de onde a fonte veio
+    sha256 = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    arquivos = models.JSONField(default=dict, blank=True)  # {"320": {"webp": nome, "jpeg": nome}, ...}
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True, default="")
+
+    criada_em = models.DateTimeField(auto_now_add=True)
+    atualizada_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Miniatura de imagem"
+        verbose_name_plural = "Miniaturas de imagens"
+        indexes = [models.Index(fields=["status", "proxima_tentativa"])]
+
+    def __str__(self):
+        return f"{self.origem}: {self.fonte} ({self.status})"
+
+
 class MercadoPagoOwnerConfig(models.Model):
     """
     Credenciais do Mercado Pago do DONO do sistema.
@@ -1327,9 +1584,14 @@ class Repasse(models.Model):
     transacao_id = models.CharField(max_length=64, blank=True, null=True)
     qr_code_text = models.TextField(blank=True, null=True)     # copia-e-cola
     qr_code_base64 = models.TextField(blank=True, null=True)   # <img src="data:image/png;base64,...">
+    pix_expira_em = models.DateTimeField(null=True, blank=True)
+    # sobe a cada cobrança descartada (vencida ou de outro valor); entra na chave de idempotência
+    geracao_pix = models.PositiveIntegerField(default=0)
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    PIX_MARGEM_REUSO = timedelta(minutes=3)
+
     class Meta:
         ordering = ["-criado_em"]
         constraints = [
@@ -1339,6 +1601,49 @@ class Repasse(models.Model):
     def __str__(self):
         return f"Repasse {self.paroquia} / {self.evento} — {self.valor_repasse} ({self.status})"
 
+    def pix_reutilizavel(self) -> bool:
+        """True se a cobrança PIX guardada ainda dá tempo de pagar."""
+        return bool(
+            self.transacao_id
+            and self.qr_code_text
+            and self.pix_expira_em
+            and self.pix_expira_em > timezone.now() + self.PIX_MARGEM_REUSO
+        )
+
+    def descartar_pix(self) -> None:
+        """Esquece a cobrança atual; a próxima sai com nova chave de idempotência."""
+        if self.transacao_id:
+            self.geracao_pix += 1
+        self.transacao_id = self.qr_code_text = self.qr_code_base64 = None
+        self.pix_expira_em = None
+
+
+class ResumoFinanceiroEvento(models.Model):
+    """
+    Totais dos pagamentos CONFIRMADOS do evento, mantidos a cada mudança de
+    Pagamento (services.financeiro). Repasses e o financeiro geral leem daqui
+    em vez de agregar Pagamento a cada tela.
+    Reconstrução: `manage.py recalcular_resumo_financeiro`.
+    """
+    evento = models.OneToOneField(
+        "inscricoes.EventoAcampamento", on_delete=models.CASCADE,
+        primary_key=True, related_name="resumo_financeiro",
+    )
+    paroquia = models.ForeignKey("inscricoes.Paroquia", on_delete=models.CASCADE, related_name="resumos_financeiros")
+    qtd_confirmados = models.IntegerField(default=0)
+    bruto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    taxas_mp = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    # bruto - taxas_mp (base do repasse)
+    liquido = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    atualizado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Resumo financeiro do evento"
+        verbose_name_plural = "Resumos financeiros dos eventos"
+
+    def __str__(self):
+        return f"Resumo {self.evento} — {self.bruto} ({self.qtd_confirmados} pagos)"
+
 
 # ---------------------------------------------------------------------
 # Mídias do Site (landing / institucional)
@@ -0,0 +1,8 @@
+# inscricoes/routing.py
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path("ws/pagamento/<int:inscricao_id>/", consumers.StatusPagamentoConsumer.as_asgi()),
+]
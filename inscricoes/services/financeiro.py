@@ -0,0 +1,130 @@
+# inscricoes/services/financeiro.py
+"""
+Resumo financeiro por evento (ResumoFinanceiroEvento).
+
+- aplicar_variacao(): chamado no post_save/post_delete de Pagamento; soma a
+  diferença (antes → depois) na linha do evento com um UPDATE (F()), dentro
+  da transação do save. O "antes" vem da linha do Pagamento travada no save
+  (Pagamento.save), então confirmações simultâneas não somam em dobro.
+- recalcular_resumos(): reconstrói as linhas a partir de Pagamento com um
+  único agregado agrupado por evento (comando recalcular_resumo_financeiro,
+  conciliação em lote, eventos sem linha).
+- financeiro_evento(): números do repasse (base, taxa do sistema, líquido)
+  a partir da linha do evento.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import EventoAcampamento, Inscricao, Pagamento, ResumoFinanceiroEvento
+
+TAXA_SISTEMA_DEFAULT = Decimal("3.00")
+ZERO = Decimal("0.00")
+CENTAVO = Decimal("0.01")
+# contribuição de um pagamento não confirmado / inexistente
+SEM_CONTRIBUICAO = (0, ZERO, ZERO)
+
+
+def _dinheiro(campo):
+    return Coalesce(Sum(campo), Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def recalcular_resumos(evento_ids=None) -> int:
+    """Reconstrói os resumos (todos, ou só de `evento_ids`). Retorna quantas linhas gravou."""
+    eventos = EventoAcampamento.objects.all()
+    if evento_ids is not None:
+        eventos = eventos.filter(pk__in=evento_ids)
+
+    totais = {
+        row["inscricao__evento_id"]: row
+        for row in (Pagamento.objects
+                    .filter(status=Pagamento.StatusPagamento.CONFIRMADO, inscricao__evento__in=eventos)
+                    .values("inscricao__evento_id")
+                    .annotate(qtd=Count("id"), bruto=_dinheiro("valor"), taxas=_dinheiro("fee_mp")))
+    }
+
+    agora = timezone.now()
+    linhas = []
+    for evento_id, paroquia_id in eventos.values_list("pk", "paroquia_id"):
+        t = totais.get(evento_id) or {"qtd": 0, "bruto": ZERO, "taxas": ZERO}
+        linhas.append(ResumoFinanceiroEvento(
+            evento_id=evento_id,
+            paroquia_id=paroquia_id,
+            qtd_confirmados=t["qtd"],
+            bruto=t["bruto"],
+            taxas_mp=t["taxas"],
+            liquido=t["bruto"] - t["taxas"],
+            atualizado_em=agora,
+        ))
+
+    # MySQL (ON DUPLICATE KEY UPDATE) não aceita alvo do conflito; lá vale a chave única de evento
+    alvo = {"unique_fields": ["evento"]} if connection.features.supports_update_conflicts_with_target else {}
+    ResumoFinanceiroEvento.objects.bulk_create(
+        linhas,
+        batch_size=500,
+        update_conflicts=True,
+        **alvo,
+        update_fields=["paroquia", "qtd_confirmados", "bruto", "taxas_mp", "liquido", "atualizado_em"],
+    )
+    return len(linhas)
+
+
+def aplicar_variacao(inscricao_id, antes, depois, *, reconstruir=True) -> None:
+    """
+    Soma (depois - antes) no resumo do evento da inscrição.
+    `antes`/`depois` são Pagamento.contribuicao_financeira(); `antes=None`
+    (valor anterior desconhecido) reconstrói a linha do evento.
+    `reconstruir=False` (exclusões): só o UPDATE — numa exclusão em cascata
+    do evento a linha já pode ter sido apagada e não deve renascer.
+    """
+    if antes is not None and antes == depois:
+        return
+    # id antes do UPDATE: o MySQL recusa subconsulta com LIMIT dentro de IN (erro 1235)
+    evento_id = Inscricao.objects.filter(pk=inscricao_id).values_list("evento_id", flat=True).first()
+    if evento_id is None:
+        return
+
+    if antes is not None:
+        qtd, bruto, taxas = (d - a for a, d in zip(antes, depois))
+        atualizadas = ResumoFinanceiroEvento.objects.filter(evento_id=evento_id).update(
+            qtd_confirmados=F("qtd_confirmados") + qtd,
+            bruto=F("bruto") + bruto,
+            taxas_mp=F("taxas_mp") + taxas,
+            liquido=F("liquido") + (bruto - taxas),
+            atualizado_em=timezone.now(),
+        )
+        if atualizadas or not reconstruir:
+            return
+    elif not reconstruir:
+        return
+
+    # sem linha (evento anterior ao resumo) ou estado anterior desconhecido
+    with transaction.atomic():
+        recalcular_resumos([evento_id])
+
+
+def resumo_evento(evento) -> ResumoFinanceiroEvento:
+    try:
+        return evento.resumo_financeiro
+    except ResumoFinanceiroEvento.DoesNotExist:
+        recalcular_resumos([evento.pk])
+        return ResumoFinanceiroEvento.objects.get(evento=evento)
+
+
+def financeiro_evento(resumo: ResumoFinanceiroEvento, taxa_percentual=TAXA_SISTEMA_DEFAULT) -> dict:
+    """Base do repasse = bruto - taxas MP; taxa do sistema incide sobre a base."""
+    taxa_percentual = Decimal(taxa_percentual)
+    base = (resumo.bruto - resumo.taxas_mp).quantize(CENTAVO)
+    taxa = (base * taxa_percentual / Decimal("100")).quantize(CENTAVO)
+    return {
+        "bruto": resumo.bruto,
+        "taxas_mp": resumo.taxas_mp,
+        "qtd_confirmados": resumo.qtd_confirmados,
+        "base_repasse": base,
+        "taxa_percent": taxa_percentual,
+        "valor_repasse": taxa,
+        "liquido_paroquia": (base - taxa).quantize(CENTAVO),
+    }
@@ -0,0 +1,194 @@
+# inscricoes/services/fotos.py
+"""
+Fotos do cadastro de casais, processadas fora da requisição.
+
+Antes, a última etapa de formulario_casais lia a foto inteira para a memória
+e a gravava quatro vezes (duas InscricaoCasais.foto_casal, dois
+Participante.foto), com os uploads ao Cloudinary dentro da requisição.
+
+1. Requisição: registrar_foto() calcula o sha256 em blocos e guarda o
+   original uma vez (mesmo conteúdo → mesma ArquivoFoto); vincular_foto()
+   liga as inscrições. Foto já processada é aplicada na hora (dois UPDATEs).
+2. Worker (`manage.py processar_fotos --loop`): reduz a imagem (MAX_LADO),
+   grava a versão final uma vez no storage e uma vez no Cloudinary e aponta
+   para ela foto_casal e Participante.foto de todas as inscrições ligadas;
+   as miniaturas (services.miniaturas) saem desses mesmos bytes.
+   Falha → reagenda com backoff, como a caixa de entrada do MP.
+"""
+import hashlib
+import io
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from cloudinary import uploader
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from ..models import ArquivoFoto, InscricaoCasais, Participante
+from . import miniaturas
+
+logger = logging.getLogger("django")
+
+MAX_LADO = 1600
+QUALIDADE_JPEG = 85
+MAX_TENTATIVAS = 6
+BACKOFF_BASE_SEGUNDOS = 30
+BACKOFF_MAX_SEGUNDOS = 60 * 60
+PROCESSANDO_TIMEOUT = timedelta(minutes=10)
+
+St = ArquivoFoto.Status
+
+
+# ----------------------------------------------------------------------
+# Requisição
+# ----------------------------------------------------------------------
+def _sha256(arquivo) -> str:
+    h = hashlib.sha256()
+    if hasattr(arquivo, "chunks"):
+        for bloco in arquivo.chunks():
+            h.update(bloco)
+    else:
+        for bloco in iter(lambda: arquivo.read(64 * 1024), b""):
+            h.update(bloco)
+    arquivo.seek(0)
+    return h.hexdigest()
+
+
+def registrar_foto(arquivo, nome: str = "") -> ArquivoFoto:
+    """Guarda o original (uma vez por conteúdo) e devolve a ArquivoFoto."""
+    sha = _sha256(arquivo)
+    existente = ArquivoFoto.objects.filter(sha256=sha).first()
+    if existente:
+        return existente
+    extensao = Path(nome or getattr(arquivo, "name", "") or "").suffix.lower() or ".jpg"
+    foto = ArquivoFoto(sha256=sha)
+    foto.original.save(f"{sha}{extensao}", arquivo, save=False)
+    try:
+        with transaction.atomic():
+            foto.save()
+    except IntegrityError:
+        # outra requisição gravou o mesmo conteúdo ao mesmo tempo
+        foto.original.delete(save=False)
+        return ArquivoFoto.objects.get(sha256=sha)
+    return foto
+
+
+def vincular_foto(foto: ArquivoFoto, inscricoes) -> None:
+    """Liga as inscrições à foto; se ela já está pronta, aplica agora."""
+    with transaction.atomic():
+        # trava a linha: o worker não fecha a foto entre a leitura do status e o vínculo
+        foto = ArquivoFoto.objects.select_for_update().get(pk=foto.pk)
+        foto.inscricoes.add(*inscricoes)
+    if foto.status == St.PRONTA:
+        _aplicar(foto, [i.pk for i in inscricoes])
+    elif foto.status == St.ERRO:
+        # nova chance para um arquivo que falhou antes
+        ArquivoFoto.objects.filter(pk=foto.pk, status=St.ERRO).update(
+            status=St.PENDENTE, tentativas=0, proxima_tentativa=timezone.now(),
+        )
+
+
+def _aplicar(foto: ArquivoFoto, inscricao_ids) -> None:
+    """Os quatro lugares (foto_casal e Participante.foto) apontam para o mesmo arquivo."""
+    if foto.imagem:
+        InscricaoCasais.objects.filter(inscricao_id__in=inscricao_ids).update(foto_casal=foto.imagem.name)
+    if foto.cloudinary_ref:
+        Participante.objects.filter(inscricao__in=inscricao_ids).update(foto=foto.cloudinary_ref)
+
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+def reduzir(dados: bytes) -> bytes:
+    """JPEG com no máximo MAX_LADO px no maior lado, já na orientação do EXIF."""
+    with Image.open(io.BytesIO(dados)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((MAX_LADO, MAX_LADO))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        saida = io.BytesIO()
+        img.save(saida, "JPEG", quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+    return saida.getvalue()
+
+
+def _backoff(tentativas: int) -> timedelta:
+    segundos = BACKOFF_BASE_SEGUNDOS * (2 ** max(tentativas - 1, 0))
+    return timedelta(seconds=min(segundos, BACKOFF_MAX_SEGUNDOS))
+
+
+def _reservar(limite: int, agora) -> list:
+    ArquivoFoto.objects.filter(status=St.PROCESSANDO, atualizada_em__lt=agora - PROCESSANDO_TIMEOUT).update(
+        status=St.PENDENTE, proxima_tentativa=agora,
+    )
+    with transaction.atomic():
+        ids = list(
+            ArquivoFoto.objects.select_for_update(skip_locked=True)
+            .filter(status=St.PENDENTE, proxima_tentativa__lte=agora)
+            .order_by("criada_em")
+            .values_list("pk", flat=True)[:limite]
+        )
+        if ids:
+            ArquivoFoto.objects.filter(pk__in=ids).update(status=St.PROCESSANDO, tentativas=F("tentativas") + 1)
+    return list(ArquivoFoto.objects.filter(pk__in=ids).order_by("criada_em"))
+
+
+def processar_foto(foto: ArquivoFoto) -> None:
+    try:
+        if not foto.imagem:
+            with foto.original.open("rb") as fh:
+                reduzida = reduzir(fh.read())
+            foto.imagem.save(f"{foto.sha256}.jpg", ContentFile(reduzida), save=False)
+            ArquivoFoto.objects.filter(pk=foto.pk).update(imagem=foto.imagem.name)
+        if not foto.cloudinary_ref:
+            with foto.imagem.open("rb") as fh:
+                # public_id pelo conteúdo: reenvio depois de uma falha não duplica o asset
+                recurso = uploader.upload_resource(fh, public_id=f"fotos/{foto.sha256}", overwrite=False)
+            foto.cloudinary_ref = recurso.get_prep_value()
+            ArquivoFoto.objects.filter(pk=foto.pk).update(cloudinary_ref=foto.cloudinary_ref)
+    except Exception as e:
+        logger.exception("Erro ao processar foto %s: %s", foto.pk, e)
+        if foto.tentativas >= MAX_TENTATIVAS:
+            ArquivoFoto.objects.filter(pk=foto.pk).update(status=St.ERRO, ultimo_erro=str(e))
+        else:
+            ArquivoFoto.objects.filter(pk=foto.pk).update(
+                status=St.PENDENTE, proxima_tentativa=timezone.now() + _backoff(foto.tentativas),
+                ultimo_erro=str(e),
+            )
+        # o que já deu certo (ex.: a versão reduzida) vale desde já
+        _aplicar(foto, list(foto.inscricoes.values_list("pk", flat=True)))
+        return
+
+    with transaction.atomic():
+        ArquivoFoto.objects.filter(pk=foto.pk).update(
+            status=St.PRONTA, processada_em=timezone.now(), ultimo_erro="", original="",
+        )
+        # inscrições ligadas durante o processamento também entram aqui
+        _aplicar(foto, list(foto.inscricoes.values_list("pk", flat=True)))
+    if foto.original:
+        foto.original.delete(save=False)
+    _gerar_miniaturas(foto)
+
+
+def _gerar_miniaturas(foto: ArquivoFoto) -> None:
+    """Os bytes já estão aqui: as miniaturas dos dois campos saem de uma vez (os UPDATEs não disparam signals)."""
+    fontes = {foto.imagem.name: "inscricoes.InscricaoCasais.foto_casal",
+              foto.cloudinary_ref: "inscricoes.Participante.foto"}
+    try:
+        with foto.imagem.open("rb") as fh:
+            miniaturas.gerar_de_dados(fh.read(), fontes)
+    except Exception as e:
+        logger.exception("Erro ao gerar miniaturas da foto %s: %s", foto.pk, e)
+        for fonte, origem in fontes.items():
+            miniaturas.agendar(fonte, origem)
+
+
+def processar_lote(limite: int = 20) -> int:
+    """Processa um lote de fotos pendentes. Retorna quantas foram tratadas."""
+    lote = _reservar(limite, timezone.now())
+    for foto in lote:
+        processar_foto(foto)
+    return len(lote)
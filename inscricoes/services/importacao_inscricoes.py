@@ -0,0 +1,435 @@
+# inscricoes/services/importacao_inscricoes.py
+"""
+Importação em lote de inscrições a partir de planilha (CSV/XLSX).
+
+Paróquias chegam com centenas de campistas antigos em planilhas. Pelo
+formulário público/admin cada linha passaria por Inscricao.save() (full_clean,
+ensure_base_instance, sinais) uma a uma. Aqui:
+
+1. Leitura em blocos de LOTE linhas (CSV com chunksize do pandas, XLSX com o
+   openpyxl em read_only): a planilha nunca fica inteira na memória.
+2. Validação vetorizada (pandas) de cada bloco. Linha recusada vira ErroLinha
+   (linha da planilha, coluna, mensagem); as demais seguem.
+3. Upsert em lote por bloco, numa transação: Participante (por cpf_digitos),
+   Inscricao (participante + evento), o BaseInscricao do tipo do evento e os
+   Contato. Célula vazia não apaga o que já estava gravado.
+
+bulk_create/bulk_update não passam por save() nem sinais: cpf_digitos e as
+PreferenciasComunicacao dos participantes novos são preenchidos aqui.
+"""
+import csv
+import io
+import re
+import unicodedata
+from collections import namedtuple
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+from django.db import models, transaction
+
+from ..models import (
+    Contato, Inscricao, InscricaoCasais, InscricaoEvento, InscricaoJuvenil, InscricaoMirim,
+    InscricaoRetiro, InscricaoSenior, InscricaoServos, InscricaoStatus, Participante,
+    PreferenciasComunicacao,
+)
+from ..utils.eventos import tipo_efetivo_evento
+
+LOTE = 1000
+
+ErroLinha = namedtuple("ErroLinha", "linha coluna mensagem")
+
+# tipo efetivo → subtipo de BaseInscricao (o mesmo do formulario_personalizado)
+MODELO_POR_TIPO = {
+    "senior":  InscricaoSenior,
+    "juvenil": InscricaoJuvenil,
+    "mirim":   InscricaoMirim,
+    "servos":  InscricaoServos,
+    "casais":  InscricaoCasais,
+    "evento":  InscricaoEvento,
+    "retiro":  InscricaoRetiro,
+}
+
+CAMPOS_PARTICIPANTE = ["nome", "telefone", "email", "CEP", "endereco", "numero", "bairro", "cidade", "estado"]
+# coluna da planilha → campo do Contato
+CAMPOS_CONTATO = {
+    "contato_nome": "nome",
+    "contato_telefone": "telefone",
+    "contato_grau_parentesco": "grau_parentesco",
+    "contato_ja_e_campista": "ja_e_campista",
+}
+# cabeçalhos comuns nas planilhas das paróquias (já normalizados por _coluna)
+APELIDOS = {
+    "cep": "CEP",
+    "nome_completo": "nome",
+    "celular": "telefone",
+    "whatsapp": "telefone",
+    "e_mail": "email",
+    "uf": "estado",
+    "data_de_nascimento": "data_nascimento",
+    "nascimento": "data_nascimento",
+    "camisa": "tamanho_camisa",
+    "contato_parentesco": "contato_grau_parentesco",
+    "contato_de_emergencia": "contato_nome",
+    "telefone_contato": "contato_telefone",
+}
+_FORA_DA_BASE = {"id", "inscricao", "paroquia", "pastoral_movimento"}
+_SIM = {"sim", "s", "x", "yes", "1", "true", "verdadeiro"}
+_NAO = {"nao", "não", "n", "no", "0", "false", "falso"}
+_EMAIL = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+@dataclass
+class ResultadoImportacao:
+    linhas: int = 0
+    participantes_novos: int = 0
+    inscricoes_novas: int = 0
+    inscricoes_atualizadas: int = 0
+    erros: list = field(default_factory=list)  # [ErroLinha]
+
+    @property
+    def importadas(self) -> int:
+        return self.inscricoes_novas + self.inscricoes_atualizadas
+
+
+# ----------------------------------------------------------------------
+# Leitura
+# ----------------------------------------------------------------------
+def _coluna(nome) -> str:
+    """'Data de Nascimento ' → 'data_de_nascimento' → apelido, se houver."""
+    s = unicodedata.normalize("NFKD", str(nome or "")).encode("ascii", "ignore").decode()
+    s = re.sub(r"[^a-z0-9]+", "_", s.strip().lower()).strip("_")
+    return APELIDOS.get(s, s)
+
+
+def _celula(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)  # CPF/telefone digitados como número no Excel
+    return str(v).strip()
+
+
+def ler_planilha(arquivo, nome: str = "", tamanho: int = LOTE):
+    """
+    Gera DataFrames de texto (blocos de `tamanho` linhas) com as colunas
+    normalizadas e o índice = número da linha na planilha (cabeçalho = 1).
+    `arquivo`: caminho ou arquivo aberto; `nome` decide o formato pela extensão.
+    """
+    nome = nome or str(getattr(arquivo, "name", arquivo))
+    inicio = 2
+    if Path(nome).suffix.lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+
+        ws = load_workbook(arquivo, read_only=True, data_only=True).active
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = [_coluna(c) for c in next(linhas, ())]
+        bloco = []
+        for linha in linhas:
+            bloco.append([_celula(v) for v in linha[:len(cabecalho)]])
+            if len(bloco) >= tamanho:
+                yield pd.DataFrame(bloco, columns=cabecalho, index=range(inicio, inicio + len(bloco)))
+                inicio, bloco = inicio + len(bloco), []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=cabecalho, index=range(inicio, inicio + len(bloco)))
+        return
+
+    if isinstance(arquivo, (str, Path)):
+        with open(arquivo, "rb") as fh:
+            amostra = fh.read(4096)
+    else:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+    if isinstance(amostra, bytes):
+        amostra = amostra.decode("utf-8-sig", "ignore")
+    sep = ";" if amostra.count(";") > amostra.count(",") else ","  # Excel pt-BR exporta com ";"
+    for df in pd.read_csv(arquivo, sep=sep, dtype=str, keep_default_na=False, chunksize=tamanho,
+                          encoding="utf-8-sig", skip_blank_lines=True):
+        df.columns = [_coluna(c) for c in df.columns]
+        df.index = range(inicio, inicio + len(df))
+        inicio += len(df)
+        yield df.apply(lambda s: s.str.strip())
+
+
+# ----------------------------------------------------------------------
+# Validação (vetorizada, por bloco)
+# ----------------------------------------------------------------------
+def campos_base(Modelo) -> dict:
+    """{nome: Field} dos campos do subtipo de BaseInscricao que a planilha pode trazer."""
+    if Modelo is None:
+        return {}
+    return {
+        f.name: f for f in Modelo._meta.concrete_fields
+        if f.name not in _FORA_DA_BASE and not isinstance(f, models.FileField)
+    }
+
+
+def _escolhas(f) -> dict:
+    """Valor digitado (minúsculo) → chave da choice; aceita a chave e o rótulo."""
+    mapa = {}
+    for chave, rotulo in f.choices:
+        mapa[str(chave).lower()] = chave
+        mapa[str(rotulo).lower()] = chave
+    if set(mapa.values()) == {"sim", "nao"}:
+        mapa.update({v: "sim" for v in _SIM})
+        mapa.update({v: "nao" for v in _NAO})
+    return mapa
+
+
+def _tamanho_maximo(f):
+    return f.max_length if isinstance(f, models.CharField) and not f.choices else None
+
+
+def validar_bloco(df: pd.DataFrame, base: dict) -> tuple:
+    """
+    Normaliza o bloco e separa as linhas válidas.
+    Retorna (DataFrame válido, [ErroLinha]); valores vazios ficam como None.
+    """
+    df = df.loc[(df != "").any(axis=1)].copy()  # linhas totalmente vazias
+    ruim = pd.Series(False, index=df.index)
+    erros = []
+
+    def recusar(mascara, coluna, mensagem):
+        nonlocal ruim
+        mascara = mascara & ~ruim  # um erro por linha basta
+        erros.extend(ErroLinha(int(linha), coluna, mensagem) for linha in df.index[mascara])
+        ruim |= mascara
+
+    for obrig in ("nome", "cpf"):
+        if obrig not in df.columns:
+            erros.extend(ErroLinha(int(linha), obrig, "Coluna obrigatória ausente.") for linha in df.index)
+            return df.iloc[0:0], erros
+
+    # CPF: só dígitos; número do Excel perde o zero à esquerda
+    bruto = df["cpf"]
+    cpf = bruto.str.replace(r"\D", "", regex=True)
+    sem_mascara = bruto.str.fullmatch(r"\d{9,10}")
+    df["cpf"] = cpf.where(~sem_mascara, cpf.str.zfill(11))
+    recusar(df["nome"] == "", "nome", "Nome obrigatório.")
+    recusar(df["cpf"].str.len() != 11, "cpf", "CPF deve ter 11 dígitos.")
+    recusar(df["cpf"].str.fullmatch(r"(\d)\1{10}"), "cpf", "CPF inválido.")
+    repetido = df["cpf"].duplicated(keep="last") & ~ruim
+    for linha in df.index[repetido]:
+        ultima = df.index[df["cpf"] == df.at[linha, "cpf"]][-1]
+        erros.append(ErroLinha(int(linha), "cpf", f"CPF repetido na planilha; vale a linha {ultima}."))
+    ruim |= repetido
+
+    df["nome"] = df["nome"].str.title()
+    if "email" in df.columns:
+        df["email"] = df["email"].str.lower()
+        recusar((df["email"] != "") & ~df["email"].str.match(_EMAIL), "email", "E-mail inválido.")
+    if "estado" in df.columns:
+        df["estado"] = df["estado"].str.upper()
+        ufs = {uf for uf, _ in Participante._meta.get_field("estado").choices}
+        recusar((df["estado"] != "") & ~df["estado"].isin(ufs), "estado", "UF inválida.")
+    for col in ("endereco", "bairro", "cidade"):
+        if col in df.columns:
+            df[col] = df[col].str.title()
+    for col in CAMPOS_PARTICIPANTE:
+        maximo = col in df.columns and _tamanho_maximo(Participante._meta.get_field(col))
+        if maximo:
+            recusar(df[col].str.len() > maximo, col, f"Máximo de {maximo} caracteres.")
+
+    # BaseInscricao do tipo do evento
+    for nome, f in base.items():
+        if nome not in df.columns:
+            if not f.null and not f.has_default() and not f.blank:
+                erros.extend(ErroLinha(int(linha), nome, "Coluna obrigatória ausente.") for linha in df.index[~ruim])
+                ruim[:] = True
+            continue
+        s = df[nome]
+        vazio = s == ""
+        if not f.null and not f.blank:
+            recusar(vazio, nome, "Campo obrigatório.")
+        if isinstance(f, models.DateField):
+            # ISO (inclusive data do Excel lida pelo openpyxl) ou dd/mm/aaaa
+            iso = s.str.match(r"\d{4}-\d{2}-\d{2}")
+            datas = pd.to_datetime(s.where(~vazio & ~iso), errors="coerce", dayfirst=True, format="mixed")
+            datas = datas.fillna(pd.to_datetime(s.where(iso).str[:10], errors="coerce", format="%Y-%m-%d"))
+            recusar(~vazio & datas.isna(), nome, "Data inválida (use dd/mm/aaaa).")
+            df[nome] = datas.dt.date.astype(object)
+        elif isinstance(f, models.FloatField):
+            numeros = pd.to_numeric(s.str.replace(",", ".", regex=False).where(~vazio), errors="coerce")
+            recusar(~vazio & numeros.isna(), nome, "Número inválido.")
+            df[nome] = numeros.astype(object)
+        elif f.choices:
+            valores = s.str.lower().map(_escolhas(f))
+            recusar(~vazio & valores.isna(), nome, "Valor fora das opções.")
+            df[nome] = valores.astype(object)
+        elif _tamanho_maximo(f):
+            recusar(s.str.len() > f.max_length, nome, f"Máximo de {f.max_length} caracteres.")
+
+    # Contato
+    if "contato_nome" in df.columns:
+        tem = df["contato_nome"] != ""
+        df["contato_nome"] = df["contato_nome"].str.title()
+        if "contato_telefone" in df.columns:
+            recusar(tem & (df["contato_telefone"] == ""), "contato_telefone", "Telefone do contato obrigatório.")
+        if "contato_grau_parentesco" in df.columns:
+            graus = df["contato_grau_parentesco"].str.lower().map(_escolhas(Contato._meta.get_field("grau_parentesco")))
+            recusar(tem & (df["contato_grau_parentesco"] != "") & graus.isna(),
+                    "contato_grau_parentesco", "Grau de parentesco fora das opções.")
+            df["contato_grau_parentesco"] = graus.fillna("outro")
+        for col in ("contato_nome", "contato_telefone"):
+            maximo = col in df.columns and _tamanho_maximo(Contato._meta.get_field(CAMPOS_CONTATO[col]))
+            if maximo:
+                recusar(df[col].str.len() > maximo, col, f"Máximo de {maximo} caracteres.")
+        if "contato_ja_e_campista" in df.columns:
+            df["contato_ja_e_campista"] = df["contato_ja_e_campista"].str.lower().isin(_SIM)
+
+    ok = df.loc[~ruim].replace({"": None})
+    return ok.astype(object).where(ok.notna(), None), erros
+
+
+# ----------------------------------------------------------------------
+# Gravação (upsert em lote)
+# ----------------------------------------------------------------------
+def _mesclar(obj, valores: dict) -> bool:
+    """Copia os valores não vazios para `obj`; True se algo mudou."""
+    mudou = False
+    for campo, valor in valores.items():
+        if valor is not None and getattr(obj, campo) != valor:
+            setattr(obj, campo, valor)
+            mudou = True
+    return mudou
+
+
+def _gravar_bloco(evento, Modelo, ok: pd.DataFrame, base: dict, res: ResultadoImportacao) -> None:
+    registros = ok.to_dict("records")
+    cols_part = [c for c in CAMPOS_PARTICIPANTE if c in ok.columns]
+    cols_base = [c for c in base if c in ok.columns]
+    com_contato = "contato_nome" in ok.columns
+    cpfs = [r["cpf"] for r in registros]
+
+    with transaction.atomic():
+        # Participante
+        existentes = {p.cpf_digitos: p for p in Participante.objects.filter(cpf_digitos__in=cpfs)}
+        novos, alterados = [], []
+        for r in registros:
+            valores = {c: r[c] for c in cols_part}
+            p = existentes.get(r["cpf"])
+            if p is None:
+                p = Participante(cpf=r["cpf"], cpf_digitos=r["cpf"])
+                _mesclar(p, valores)
+                novos.append(p)
+            elif _mesclar(p, valores):
+                alterados.append(p)
+        Participante.objects.bulk_create(novos, batch_size=LOTE)
+        if alterados and cols_part:
+            Participante.objects.bulk_update(alterados, cols_part, batch_size=LOTE)
+        part_ids = dict(Participante.objects.filter(cpf_digitos__in=cpfs).values_list("cpf_digitos", "pk"))
+        PreferenciasComunicacao.objects.bulk_create(
+            [PreferenciasComunicacao(participante_id=part_ids[p.cpf_digitos]) for p in novos],
+            batch_size=LOTE, ignore_conflicts=True,
+        )
+        res.participantes_novos += len(novos)
+
+        # Inscricao (contato de emergência espelhado do Contato, como no formulario_contato)
+        def emergencia(r):
+            if not (com_contato and r["contato_nome"]):
+                return {}
+            return {"contato_emergencia_nome": r["contato_nome"],
+                    "contato_emergencia_telefone": r.get("contato_telefone"),
+                    "contato_emergencia_grau_parentesco": r.get("contato_grau_parentesco"),
+                    "contato_emergencia_ja_e_campista": bool(r.get("contato_ja_e_campista"))}
+
+        insc_existentes = {
+            i.participante_id: i
+            for i in Inscricao.objects.filter(evento=evento, participante_id__in=part_ids.values())
+        }
+        novas, alteradas = [], []
+        for r in registros:
+            pid = part_ids[r["cpf"]]
+            insc = insc_existentes.get(pid)
+            if insc is None:
+                novas.append(Inscricao(
+                    participante_id=pid, evento=evento, paroquia_id=evento.paroquia_id,
+                    status=InscricaoStatus.ENVIADA, inscricao_enviada=True, **emergencia(r),
+                ))
+            elif _mesclar(insc, emergencia(r)):
+                alteradas.append(insc)
+        Inscricao.objects.bulk_create(novas, batch_size=LOTE)
+        if alteradas:
+            Inscricao.objects.bulk_update(
+                alteradas, ["contato_emergencia_nome", "contato_emergencia_telefone",
+                            "contato_emergencia_grau_parentesco", "contato_emergencia_ja_e_campista"],
+                batch_size=LOTE,
+            )
+        insc_ids = dict(
+            Inscricao.objects.filter(evento=evento, participante_id__in=part_ids.values())
+            .values_list("participante_id", "pk")
+        )
+        res.inscricoes_novas += len(novas)
+        res.inscricoes_atualizadas += len(registros) - len(novas)
+        por_linha = [insc_ids[part_ids[r["cpf"]]] for r in registros]
+
+        # BaseInscricao do tipo
+        if Modelo is not None:
+            bases = {b.inscricao_id: b for b in Modelo.objects.filter(inscricao_id__in=por_linha)}
+            novas_bases, bases_alteradas = [], []
+            for r, iid in zip(registros, por_linha):
+                valores = {c: r[c] for c in cols_base}
+                b = bases.get(iid)
+                if b is None:
+                    b = Modelo(inscricao_id=iid, paroquia_id=evento.paroquia_id)
+                    _mesclar(b, valores)
+                    novas_bases.append(b)
+                elif _mesclar(b, valores):
+                    bases_alteradas.append(b)
+            Modelo.objects.bulk_create(novas_bases, batch_size=LOTE)
+            if bases_alteradas and cols_base:
+                Modelo.objects.bulk_update(bases_alteradas, cols_base, batch_size=LOTE)
+
+        # Contato: um por (inscrição, nome)
+        if com_contato:
+            contatos = {
+                (c.inscricao_id, c.nome.lower()): c
+                for c in Contato.objects.filter(inscricao_id__in=por_linha)
+            }
+            novos_contatos, contatos_alterados = [], []
+            for r, iid in zip(registros, por_linha):
+                if not r["contato_nome"]:
+                    continue
+                valores = {campo: r.get(col) for col, campo in CAMPOS_CONTATO.items() if col in ok.columns}
+                c = contatos.get((iid, r["contato_nome"].lower()))
+                if c is None:
+                    c = Contato(inscricao_id=iid, grau_parentesco="outro")
+                    _mesclar(c, valores)
+                    novos_contatos.append(c)
+                    contatos[(iid, c.nome.lower())] = c
+                elif _mesclar(c, valores):
+                    contatos_alterados.append(c)
+            Contato.objects.bulk_create(novos_contatos, batch_size=LOTE)
+            if contatos_alterados:
+                Contato.objects.bulk_update(contatos_alterados, ["telefone", "grau_parentesco", "ja_e_campista"],
+                                            batch_size=LOTE)
+
+
+def importar_inscricoes(evento, arquivo, *, nome: str = "", dry_run=False, tamanho_lote=LOTE,
+                        progresso=None) -> ResultadoImportacao:
+    """
+    Importa a planilha para o evento. `progresso(linhas_lidas)` é chamado a
+    cada bloco. Com dry_run só valida (o relatório de erros sai igual).
+    """
+    res = ResultadoImportacao()
+    Modelo = MODELO_POR_TIPO.get(tipo_efetivo_evento(evento))
+    base = campos_base(Modelo)
+    for bloco in ler_planilha(arquivo, nome, tamanho_lote):
+        ok, erros = validar_bloco(bloco, base)
+        res.linhas += len(bloco)
+        res.erros.extend(erros)
+        if len(ok) and not dry_run:
+            _gravar_bloco(evento, Modelo, ok, base, res)
+        if progresso:
+            progresso(res.linhas)
+    res.erros.sort()
+    return res
+
+
+def relatorio_erros_csv(erros, destino=None):
+    """Relatório por linha (linha;coluna;mensagem). Sem `destino`, devolve o texto."""
+    saida = destino or io.StringIO()
+    w = csv.writer(saida, delimiter=";")
+    w.writerow(["linha", "coluna", "mensagem"])
+    w.writerows(erros)
+    return None if destino else saida.getvalue()
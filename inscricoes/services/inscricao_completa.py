@@ -0,0 +1,156 @@
+# inscricoes/services/inscricao_completa.py
+"""
+Inscrição pública numa requisição só (views.api_inscricao).
+
+O fluxo HTML espalha a inscrição por quatro idas e voltas (inscricao_inicial
++ endereço, formulario_personalizado, formulario_contato, formulario_saude),
+cada uma recarregando os objetos. Aqui as mesmas validações rodam de uma vez:
+
+1. Participante/inscrição já existentes localizados pelo CPF (só leitura).
+2. Cada etapa validada pelo form da etapa HTML correspondente (prefixo = nome
+   da etapa); havendo erro, voltam todos agrupados por etapa e nada é gravado.
+3. Tudo válido: gravação numa transação só, terminando em inscricao_enviada
+   (os disparos automáticos continuam no save do modelo).
+
+Casais (dois participantes, formulario_casais) e o fluxo "pagamento" seguem
+só no HTML.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.forms import modelform_factory
+
+from ..forms import (
+    ContatoForm, DadosSaudeForm, InscricaoEventoForm, InscricaoJuvenilForm, InscricaoMirimForm,
+    InscricaoRetiroForm, InscricaoSeniorForm, InscricaoServosForm, ParticipanteEnderecoForm,
+    ParticipanteInicialForm,
+)
+from ..models import Inscricao, Participante, PreferenciasComunicacao
+from ..utils.cpf import cpf_digitos
+from ..utils.eventos import tipo_efetivo_evento
+from .consent import registrar_optin_marketing
+
+ETAPAS = ("participante", "endereco", "personalizado", "contato", "saude")
+
+# tipo efetivo → form da etapa "personalizado" (o modelo dela recebe também a saúde)
+FORM_POR_TIPO = {
+    "senior":  InscricaoSeniorForm,
+    "juvenil": InscricaoJuvenilForm,
+    "mirim":   InscricaoMirimForm,
+    "servos":  InscricaoServosForm,
+    "evento":  InscricaoEventoForm,
+    "retiro":  InscricaoRetiroForm,
+}
+
+
+@dataclass
+class ResultadoInscricao:
+    inscricao: Inscricao | None = None
+    criada: bool = False
+    erros: dict = field(default_factory=dict)  # {etapa: {campo: [mensagens]}}
+
+
+def aceita_api(evento) -> bool:
+    return tipo_efetivo_evento(evento) in FORM_POR_TIPO
+
+
+def _com_prefixo(dados: dict) -> dict:
+    """{"saude": {"altura": 1.7}} → {"saude-altura": 1.7}, o formato dos forms com prefixo."""
+    planos = {}
+    for etapa in ETAPAS:
+        bloco = dados.get(etapa) or {}
+        if isinstance(bloco, dict):
+            planos.update({f"{etapa}-{campo}": valor for campo, valor in bloco.items()})
+    return planos
+
+
+def _erros(form) -> dict:
+    return {campo: [str(m) for m in msgs] for campo, msgs in form.errors.items()}
+
+
+def enviar_inscricao(evento, dados: dict, arquivos=None, *, consentimento=False, request=None) -> ResultadoInscricao:
+    """
+    Valida e grava todas as etapas da inscrição no evento.
+    `dados` traz um dicionário por etapa (ETAPAS); `arquivos` usa as mesmas
+    chaves com prefixo (ex.: "saude-foto"). `consentimento` equivale ao modal
+    da Política de Privacidade da etapa de saúde.
+    """
+    res = ResultadoInscricao()
+    FormPersonalizado = FORM_POR_TIPO[tipo_efetivo_evento(evento)]
+    Modelo = FormPersonalizado._meta.model
+    SaudeForm = modelform_factory(Modelo, form=DadosSaudeForm, fields=DadosSaudeForm.Meta.fields)
+    rel = Modelo._meta.model_name
+    planos = _com_prefixo(dados)
+    arquivos = arquivos or {}
+
+    # 1) o que já existe (retomada de uma inscrição começada no HTML)
+    participante_form = ParticipanteInicialForm(planos, prefix="participante")
+    cpf = cpf_digitos(planos.get("participante-cpf"))
+    participante = Participante.objects.por_cpf(cpf).first() if cpf else None
+    inscricao = None
+    if participante is not None:
+        inscricao = (Inscricao.objects.select_related(rel)
+                     .filter(participante=participante, evento=evento).first())
+    base = getattr(inscricao, rel, None) if inscricao else None
+
+    # 2) validação de todas as etapas
+    endereco_form = ParticipanteEnderecoForm(planos, prefix="endereco")
+    personalizado_form = FormPersonalizado(planos, arquivos, instance=base or Modelo(), prefix="personalizado")
+    contato_form = ContatoForm(planos, prefix="contato")
+    forms = {"participante": participante_form, "endereco": endereco_form,
+             "personalizado": personalizado_form, "contato": contato_form}
+    for etapa, form in forms.items():
+        if not form.is_valid():
+            res.erros[etapa] = _erros(form)
+    # depois do personalizado: a saúde grava no mesmo objeto e prevalece nos campos em comum
+    saude_form = SaudeForm(planos, arquivos, instance=personalizado_form.instance, prefix="saude")
+    if not saude_form.is_valid():
+        res.erros["saude"] = _erros(saude_form)
+    if cpf and len(cpf) != 11:
+        res.erros.setdefault("participante", {})["cpf"] = ["Informe um CPF válido (11 dígitos)."]
+    if not consentimento:
+        res.erros.setdefault("saude", {})["__all__"] = [
+            "Você precisa aceitar a Política de Privacidade para enviar a inscrição."
+        ]
+    if res.erros:
+        return res
+
+    # 3) gravação
+    inicial, endereco = participante_form.cleaned_data, endereco_form.cleaned_data
+    with transaction.atomic():
+        participante, _ = Participante.objects.update_or_create(
+            cpf_digitos=cpf,
+            defaults={"cpf": cpf, "nome": inicial["nome"], "email": inicial["email"],
+                      "telefone": inicial["telefone"], **endereco},
+        )
+        inscricao, res.criada = Inscricao.objects.get_or_create(
+            participante=participante, evento=evento, defaults={"paroquia": evento.paroquia},
+        )
+
+        obj = personalizado_form.save(commit=False)
+        saude_form.save(commit=False)
+        obj.inscricao = inscricao
+        obj.paroquia = inscricao.paroquia
+        obj.save()
+        personalizado_form.save_m2m()
+        saude_form.save_m2m()
+
+        foto = saude_form.cleaned_data.get("foto")
+        if foto:
+            participante.foto = foto
+            participante.save(update_fields=["foto"])
+
+        prefs = PreferenciasComunicacao.objects.filter(participante=participante).first()
+        if not (prefs and prefs.whatsapp_marketing_opt_in):
+            registrar_optin_marketing(participante, request)
+
+        for campo, valor in contato_form.cleaned_data.items():
+            setattr(inscricao, campo, valor)
+        inscricao.save()
+        # separado, como no formulario_saude: o autoajuste booleans→status grava só o status
+        if not inscricao.inscricao_enviada:
+            inscricao.inscricao_enviada = True
+            inscricao.save(update_fields=["inscricao_enviada"])
+
+    res.inscricao = inscricao
+    return res
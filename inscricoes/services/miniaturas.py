@@ -0,0 +1,244 @@
+# inscricoes/services/miniaturas.py
+"""
+Miniaturas das imagens enviadas (Pillow), para crachás, telão e site não
+puxarem a imagem no tamanho do upload.
+
+- Campos atendidos: CAMPOS (Participante.foto, EventoAcampamento.banner,
+  Comunicado.capa, InscricaoCasais.foto_casal, SiteImage.imagem).
+- Ao salvar um desses campos (signals.agendar_miniaturas) nasce uma
+  MiniaturaImagem PENDENTE; o worker de fotos (`manage.py processar_fotos`)
+  baixa a fonte uma vez e grava LARGURAS × FORMATOS no storage. O conteúdo é
+  identificado pelo sha256: a mesma imagem em dois campos (ex.: a foto do
+  casal) reaproveita os arquivos já gerados.
+- Leitura: url_miniatura() escolhe a menor largura que cobre a pedida, com o
+  mapa de arquivos em cache; sem miniatura pronta, devolve a URL original.
+"""
+import hashlib
+import io
+import logging
+from datetime import timedelta
+
+import requests
+from cloudinary.models import CloudinaryField
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from ..models import MiniaturaImagem
+
+logger = logging.getLogger("django")
+
+CAMPOS = (
+    ("inscricoes.Participante", "foto"),
+    ("inscricoes.EventoAcampamento", "banner"),
+    ("inscricoes.Comunicado", "capa"),
+    ("inscricoes.InscricaoCasais", "foto_casal"),
+    ("inscricoes.SiteImage", "imagem"),
+)
+
+LARGURAS = (96, 240, 480, 960, 1600)
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+MAX_TENTATIVAS = 6
+BACKOFF_BASE_SEGUNDOS = 30
+BACKOFF_MAX_SEGUNDOS = 60 * 60
+PROCESSANDO_TIMEOUT = timedelta(minutes=10)
+DOWNLOAD_TIMEOUT = 20
+
+CACHE_TTL = 24 * 60 * 60
+CACHE_TTL_PENDENTE = 5 * 60
+
+St = MiniaturaImagem.Status
+
+
+def fonte_de(valor) -> str:
+    """Valor gravado no banco para o campo (nome no storage / referência do Cloudinary)."""
+    if not valor:
+        return ""
+    if hasattr(valor, "get_prep_value"):  # CloudinaryResource
+        return valor.get_prep_value() or ""
+    return getattr(valor, "name", None) or str(valor)
+
+
+# ----------------------------------------------------------------------
+# Agendamento
+# ----------------------------------------------------------------------
+def agendar(valor, origem: str) -> None:
+    """Garante uma MiniaturaImagem para a fonte; as já prontas não são refeitas."""
+    fonte = fonte_de(valor)
+    if not fonte or len(fonte) > 255 or cache.get(_chave(fonte)):
+        return
+    obj, criada = MiniaturaImagem.objects.get_or_create(fonte=fonte, defaults={"origem": origem})
+    if not criada and obj.status == St.ERRO:
+        MiniaturaImagem.objects.filter(pk=obj.pk, status=St.ERRO).update(
+            status=St.PENDENTE, tentativas=0, proxima_tentativa=timezone.now(),
+        )
+
+
+def gerar_de_dados(dados: bytes, fontes: dict) -> None:
+    """
+    Quem já tem os bytes em mãos (worker de fotos) gera as miniaturas na hora,
+    para todas as fontes {fonte: origem} com esse mesmo conteúdo.
+    """
+    sha = hashlib.sha256(dados).hexdigest()
+    arquivos = _gravar(sha, dados)
+    for fonte, origem in fontes.items():
+        if not fonte:
+            continue
+        MiniaturaImagem.objects.update_or_create(
+            fonte=fonte,
+            defaults={"origem": origem, "sha256": sha, "arquivos": arquivos,
+                      "status": St.PRONTA, "ultimo_erro": ""},
+        )
+        cache.set(_chave(fonte), arquivos, CACHE_TTL)
+
+
+# ----------------------------------------------------------------------
+# Geração
+# ----------------------------------------------------------------------
+def renderizar(dados: bytes) -> dict:
+    """{largura: {formato: bytes}}; larguras acima da original viram uma só, na largura original."""
+    saida = {}
+    with Image.open(io.BytesIO(dados)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        for largura in sorted({min(w, img.width) for w in LARGURAS}):
+            altura = max(1, round(img.height * largura / img.width))
+            copia = img if largura == img.width else img.resize((largura, altura), Image.LANCZOS)
+            saida[largura] = {}
+            for formato, (pil, opcoes) in FORMATOS.items():
+                quadro = copia.convert("RGB") if pil == "JPEG" and copia.mode != "RGB" else copia
+                buf = io.BytesIO()
+                quadro.save(buf, pil, **opcoes)
+                saida[largura][formato] = buf.getvalue()
+    return saida
+
+
+def _gravar(sha: str, dados: bytes) -> dict:
+    """Grava as miniaturas do conteúdo e devolve {"largura": {formato: nome}}; reaproveita as de mesmo sha."""
+    pronta = (MiniaturaImagem.objects.filter(sha256=sha, status=St.PRONTA)
+              .exclude(arquivos={}).values_list("arquivos", flat=True).first())
+    if pronta:
+        return pronta
+    arquivos = {}
+    for largura, por_formato in renderizar(dados).items():
+        for formato, conteudo in por_formato.items():
+            nome = default_storage.save(f"miniaturas/{sha[:2]}/{sha}/{largura}.{formato}", ContentFile(conteudo))
+            arquivos.setdefault(str(largura), {})[formato] = nome
+    return arquivos
+
+
+def _ler_fonte(m: MiniaturaImagem) -> bytes:
+    """Bytes da imagem de origem: do Cloudinary (campos CloudinaryField) ou do storage."""
+    label, campo = m.origem.rsplit(".", 1)
+    field = apps.get_model(label)._meta.get_field(campo)
+    if isinstance(field, CloudinaryField):
+        url = field.parse_cloudinary_resource(m.fonte).build_url(secure=True)
+        resp = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+        resp.raise_for_status()
+        return resp.content
+    with default_storage.open(m.fonte, "rb") as fh:
+        return fh.read()
+
+
+def _backoff(tentativas: int) -> timedelta:
+    segundos = BACKOFF_BASE_SEGUNDOS * (2 ** max(tentativas - 1, 0))
+    return timedelta(seconds=min(segundos, BACKOFF_MAX_SEGUNDOS))
+
+
+def _reservar(limite: int, agora) -> list:
+    MiniaturaImagem.objects.filter(status=St.PROCESSANDO, atualizada_em__lt=agora - PROCESSANDO_TIMEOUT).update(
+        status=St.PENDENTE, proxima_tentativa=agora,
+    )
+    with transaction.atomic():
+        ids = list(
+            MiniaturaImagem.objects.select_for_update(skip_locked=True)
+            .filter(status=St.PENDENTE, proxima_tentativa__lte=agora)
+            .order_by("criada_em")
+            .values_list("pk", flat=True)[:limite]
+        )
+        if ids:
+            MiniaturaImagem.objects.filter(pk__in=ids).update(
+                status=St.PROCESSANDO, tentativas=F("tentativas") + 1, atualizada_em=agora,
+            )
+    return list(MiniaturaImagem.objects.filter(pk__in=ids).order_by("criada_em"))
+
+
+def processar_miniatura(m: MiniaturaImagem) -> None:
+    try:
+        dados = _ler_fonte(m)
+        sha = hashlib.sha256(dados).hexdigest()
+        arquivos = _gravar(sha, dados)
+    except Exception as e:
+        logger.exception("Erro ao gerar miniaturas de %s: %s", m.fonte, e)
+        if m.tentativas >= MAX_TENTATIVAS:
+            MiniaturaImagem.objects.filter(pk=m.pk).update(status=St.ERRO, ultimo_erro=str(e))
+        else:
+            MiniaturaImagem.objects.filter(pk=m.pk).update(
+                status=St.PENDENTE, proxima_tentativa=timezone.now() + _backoff(m.tentativas),
+                ultimo_erro=str(e),
+            )
+        return
+    MiniaturaImagem.objects.filter(pk=m.pk).update(
+        status=St.PRONTA, sha256=sha, arquivos=arquivos, ultimo_erro="",
+    )
+    cache.set(_chave(m.fonte), arquivos, CACHE_TTL)
+
+
+def processar_lote(limite: int = 20) -> int:
+    """Gera as miniaturas pendentes de um lote. Retorna quantas foram tratadas."""
+    lote = _reservar(limite, timezone.now())
+    for m in lote:
+        processar_miniatura(m)
+    return len(lote)
+
+
+# ----------------------------------------------------------------------
+# Leitura (templates)
+# ----------------------------------------------------------------------
+def _chave(fonte: str) -> str:
+    return f"miniaturas:v1:{hashlib.sha1(fonte.encode()).hexdigest()}"
+
+
+def invalidar(fonte: str) -> None:
+    cache.delete(_chave(fonte))
+
+
+def arquivos_de(fonte: str) -> dict:
+    """{"largura": {formato: nome}} da fonte; {} enquanto não houver miniatura pronta."""
+    if not fonte:
+        return {}
+    arquivos = cache.get(_chave(fonte))
+    if arquivos is None:
+        arquivos = (MiniaturaImagem.objects.filter(fonte=fonte, status=St.PRONTA)
+                    .values_list("arquivos", flat=True).first()) or {}
+        # pendente: cache curto, o worker sobrescreve ao terminar
+        cache.set(_chave(fonte), arquivos, CACHE_TTL if arquivos else CACHE_TTL_PENDENTE)
+    return arquivos
+
+
+def url_original(valor) -> str:
+    try:
+        return valor.url if valor else ""
+    except Exception:
+        return ""
+
+
+def url_miniatura(valor, largura: int, formato: str = "webp") -> str:
+    """URL da menor miniatura com pelo menos `largura` px (ou a maior que houver); sem miniatura, a original."""
+    arquivos = arquivos_de(fonte_de(valor))
+    if not arquivos:
+        return url_original(valor)
+    larguras = sorted(int(w) for w in arquivos)
+    escolhida = next((w for w in larguras if w >= int(largura)), larguras[-1])
+    nome = arquivos[str(escolhida)].get(formato)
+    return default_storage.url(nome) if nome else url_original(valor)
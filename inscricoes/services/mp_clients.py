@@ -0,0 +1,333 @@
+# inscricoes/services/mp_clients.py
+"""
+Registro de clientes do Mercado Pago por processo.
+
+Cada paróquia (e o dono do sistema) ganha um SDK com uma requests.Session
+persistente (keep-alive), reaproveitada entre requisições: sem novo handshake
+TLS a cada chamada. O registro é invalidado pelos signals de MercadoPagoConfig /
+MercadoPagoOwnerConfig (ver signals.py) e, por segurança, sempre que o token
+guardado não bate com o token atual (outros processos/workers).
+
+Toda chamada passa por HttpClientPersistente.request, que aplica:
+- timeout (conexão, leitura) por operação (TIMEOUTS / settings.MP_TIMEOUTS),
+  no lugar dos 60s padrão do SDK;
+- circuit breaker por operação: após FALHAS_PARA_ABRIR falhas seguidas
+  (rede, timeout, 429/5xx) a operação fica ABERTA por ABERTO_POR segundos e
+  as chamadas falham na hora com MPIndisponivel; depois, uma chamada de teste
+  (meio-aberto) decide se fecha ou reabre;
+- retry com orçamento: só GET ou requisição com x-idempotency-key (o SDK gera
+  uma por chamada), no máximo MAX_RETRIES, dentro do timeout de leitura da
+  operação e enquanto houver saldo (cada chamada deposita ORCAMENTO_RETRY_TAXA,
+  cada retry gasta 1) — em pane geral os retries não multiplicam a carga.
+
+O estado é por processo, como o registro. disponivel() e estatisticas() servem
+às views e ao worker de webhooks para degradar sem bloquear workers.
+"""
+import logging
+import re
+import threading
+import time
+
+import mercadopago
+import requests
+from django.conf import settings
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("django")
+
+CHAVE_DONO = "dono"
+API_MP = "https://api.mercadopago.com"
+POOL_MAXSIZE = 10
+MAX_RETRIES = 2
+STATUS_FALHA = {429, 500, 502, 503, 504}
+
+# (conexão, leitura) em segundos
+TIMEOUT_PADRAO = (3.05, 10)
+TIMEOUTS = {
+    "POST /checkout/preferences": (3.05, 8),
+    "POST /v1/payments": (3.05, 10),
+    "GET /v1/payments/:id": (3.05, 5),
+    "GET /v1/payments/search": (3.05, 15),
+}
+
+FALHAS_PARA_ABRIR = 5
+ABERTO_POR = 30  # segundos
+ORCAMENTO_RETRY_TAXA = 0.1  # ~10% de retries sobre as chamadas
+ORCAMENTO_RETRY_MAX = 10.0
+BACKOFF_RETRY = 0.2  # segundos, dobra a cada tentativa
+
+_lock = threading.Lock()
+_clientes: dict = {}  # chave -> (access_token, SDK)
+_stats = {"hits": 0, "misses": 0, "invalidacoes": 0}
+_latencias: dict = {}  # "GET /v1/payments/:id" -> {"chamadas", "erros", "total_ms", "max_ms"}
+_circuitos: dict = {}  # operação -> _Circuito
+_retries = {"saldo": ORCAMENTO_RETRY_MAX, "feitos": 0, "negados": 0}
+
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+
+class MPIndisponivel(Exception):
+    """Chamada recusada sem ir à rede: circuito da operação aberto."""
+
+    def __init__(self, operacao: str, reabre_em: float):
+        self.operacao = operacao
+        self.reabre_em = max(0.0, reabre_em)
+        super().__init__(f"Mercado Pago indisponível ({operacao}); nova tentativa em {self.reabre_em:.0f}s.")
+
+
+def chave_paroquia(paroquia_id) -> str:
+    return f"paroquia:{paroquia_id}"
+
+
+# ----------------------------------------------------------------------
+# HttpClient com sessão persistente
+# ----------------------------------------------------------------------
+class _Circuito:
+    FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+    def __init__(self):
+        self.estado = self.FECHADO
+        self.falhas_seguidas = 0
+        self.aberto_ate = 0.0
+        self.aberturas = 0
+        self.recusadas = 0
+
+    def permitir(self, agora: float) -> bool:
+        """Chamado sob _lock. No meio-aberto só uma chamada de teste passa."""
+        if self.estado == self.FECHADO:
+            return True
+        if self.estado == self.ABERTO and agora >= self.aberto_ate:
+            self.estado = self.MEIO_ABERTO
+            return True
+        self.recusadas += 1
+        return False
+
+    def registrar(self, falhou: bool, agora: float) -> None:
+        if not falhou:
+            self.estado, self.falhas_seguidas = self.FECHADO, 0
+            return
+        self.falhas_seguidas += 1
+        if self.estado == self.MEIO_ABERTO or self.falhas_seguidas >= FALHAS_PARA_ABRIR:
+            if self.estado != self.ABERTO:
+                self.aberturas += 1
+            self.estado, self.aberto_ate = self.ABERTO, agora + ABERTO_POR
+
+
+def operacao_de(method: str, url: str) -> str:
+    """'GET https://api.../v1/payments/123' → 'GET /v1/payments/:id'."""
+    return f"{method.upper()} {_ID_RE.sub('/:id', requests.utils.urlparse(url).path)}"
+
+
+def timeout_de(operacao: str) -> tuple:
+    return {**TIMEOUTS, **(getattr(settings, "MP_TIMEOUTS", None) or {})}.get(operacao, TIMEOUT_PADRAO)
+
+
+def disponivel(operacao: str) -> bool:
+    """False enquanto o circuito da operação estiver aberto (não consome a chamada de teste)."""
+    with _lock:
+        c = _circuitos.get(operacao)
+        return c is None or c.estado != _Circuito.ABERTO or time.monotonic() >= c.aberto_ate
+
+
+def segundos_ate_reabrir(operacao: str) -> float:
+    with _lock:
+        c = _circuitos.get(operacao)
+        if c is None or c.estado != _Circuito.ABERTO:
+            return 0.0
+        return max(0.0, c.aberto_ate - time.monotonic())
+
+
+def _circuito(operacao: str) -> _Circuito:
+    c = _circuitos.get(operacao)
+    if c is None:
+        c = _circuitos[operacao] = _Circuito()
+    return c
+
+
+def _pode_retentar() -> bool:
+    with _lock:
+        if _retries["saldo"] >= 1:
+            _retries["saldo"] -= 1
+            _retries["feitos"] += 1
+            return True
+        _retries["negados"] += 1
+        return False
+
+
+# ----------------------------------------------------------------------
+# HttpClient com sessão persistente
+# ----------------------------------------------------------------------
+class HttpClientPersistente(HttpClient):
+    """
+    Mesmo contrato do HttpClient do SDK, mas com uma Session por cliente
+    (o original cria e fecha uma Session a cada chamada). Retries, timeouts e
+    circuit breaker ficam aqui (ver docstring do módulo), não no urllib3.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        # vazio = API real; ex.: "http://127.0.0.1:8765" (manage.py simular_mp)
+        base_url = (getattr(settings, "MP_API_BASE_URL", "") or "").rstrip("/")
+        if base_url:
+            # teste de carga/offline: mesma rota no simulador local (utils.mp_simulador)
+            url = url.replace(API_MP, base_url, 1)
+        operacao = operacao_de(method, url)
+        conexao, leitura = timeout_de(operacao)
+        kwargs["timeout"] = (conexao, leitura)
+        headers = kwargs.get("headers") or {}
+        retentavel = method.upper() == "GET" or any(k.lower() == "x-idempotency-key" for k in headers)
+        limite = MAX_RETRIES if maxretries is None else min(maxretries, MAX_RETRIES)
+        prazo = time.monotonic() + leitura
+
+        with _lock:
+            _retries["saldo"] = min(ORCAMENTO_RETRY_MAX, _retries["saldo"] + ORCAMENTO_RETRY_TAXA)
+
+        tentativa = 0
+        while True:
+            api_result, erro = self._chamar(operacao, method, url, **kwargs)
+            if api_result is not None and api_result.status_code not in STATUS_FALHA:
+                break
+            espera = BACKOFF_RETRY * (2 ** tentativa)
+            if (not retentavel or tentativa >= limite or time.monotonic() + espera >= prazo
+                    or not disponivel(operacao) or not _pode_retentar()):
+                break
+            time.sleep(espera)
+            tentativa += 1
+
+        if erro is not None:
+            raise erro
+
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError as e:
+                logger.warning("MP: resposta não-JSON em %s: %s", operacao, e)
+        return response
+
+    def _chamar(self, operacao, method, url, **kwargs):
+        """Uma ida à rede sob o circuit breaker. Retorna (resposta, None) ou (None, exceção de rede)."""
+        with _lock:
+            circuito = _circuito(operacao)
+            permitido = circuito.permitir(time.monotonic())
+            reabre_em = circuito.aberto_ate - time.monotonic()
+        if not permitido:
+            raise MPIndisponivel(operacao, reabre_em)
+
+        inicio = time.perf_counter()
+        api_result, erro, falhou = None, None, True
+        try:
+            api_result = self.session.request(method, url, **kwargs)
+            falhou = api_result.status_code in STATUS_FALHA
+        except requests.RequestException as e:
+            erro = e
+        finally:
+            # qualquer saída (inclusive exceção inesperada) fecha a chamada de teste do meio-aberto
+            _registrar_latencia(operacao, (time.perf_counter() - inicio) * 1000, falhou)
+            with _lock:
+                estava_aberto = circuito.estado == _Circuito.ABERTO
+                circuito.registrar(falhou, time.monotonic())
+                abriu = not estava_aberto and circuito.estado == _Circuito.ABERTO
+            if abriu:
+                logger.warning("MP: circuito aberto para %s por %ss (%s falhas seguidas).",
+                               operacao, ABERTO_POR, circuito.falhas_seguidas)
+        return api_result, erro
+
+    def close(self):
+        self.session.close()
+
+
+def _registrar_latencia(operacao: str, ms: float, erro: bool):
+    with _lock:
+        s = _latencias.setdefault(operacao, {"chamadas": 0, "erros": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["chamadas"] += 1
+        s["erros"] += int(erro)
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+
+
+# ----------------------------------------------------------------------
+# Registro
+# ----------------------------------------------------------------------
+def obter_cliente(chave: str, access_token: str) -> mercadopago.SDK:
+    access_token = (access_token or "").strip()
+    with _lock:
+        item = _clientes.get(chave)
+        if item and item[0] == access_token:
+            _stats["hits"] += 1
+            return item[1]
+        _stats["misses"] += 1
+        antigo = item[1] if item else None
+        sdk = mercadopago.SDK(access_token, http_client=HttpClientPersistente())
+        _clientes[chave] = (access_token, sdk)
+    if antigo is not None:
+        antigo.http_client.close()
+    return sdk
+
+
+def cliente_paroquia(paroquia_id, access_token: str) -> mercadopago.SDK:
+    return obter_cliente(chave_paroquia(paroquia_id), access_token)
+
+
+def cliente_dono(access_token: str) -> mercadopago.SDK:
+    return obter_cliente(CHAVE_DONO, access_token)
+
+
+def invalidar(chave: str) -> None:
+    with _lock:
+        item = _clientes.pop(chave, None)
+        if item:
+            _stats["invalidacoes"] += 1
+    if item:
+        item[1].http_client.close()
+
+
+def limpar() -> None:
+    with _lock:
+        itens = list(_clientes.values())
+        _clientes.clear()
+    for _, sdk in itens:
+        sdk.http_client.close()
+
+
+def reiniciar_circuitos() -> None:
+    """Fecha todos os circuitos e restaura o orçamento de retries (testes/benchmark)."""
+    with _lock:
+        _circuitos.clear()
+        _retries.update(saldo=ORCAMENTO_RETRY_MAX, feitos=0, negados=0)
+
+
+def estatisticas() -> dict:
+    """
+    Contadores do processo atual: hits/misses do registro, latência por
+    operação, estado dos circuitos e uso do orçamento de retries.
+    """
+    agora = time.monotonic()
+    with _lock:
+        latencias = {
+            op: {**s, "media_ms": round(s["total_ms"] / s["chamadas"], 1) if s["chamadas"] else 0.0}
+            for op, s in _latencias.items()
+        }
+        circuitos = {
+            op: {
+                "estado": c.estado,
+                "falhas_seguidas": c.falhas_seguidas,
+                "reabre_em_s": round(max(0.0, c.aberto_ate - agora), 1) if c.estado == _Circuito.ABERTO else 0.0,
+                "aberturas": c.aberturas,
+                "recusadas": c.recusadas,
+            }
+            for op, c in _circuitos.items()
+        }
+        return {
+            **_stats,
+            "clientes": len(_clientes),
+            "latencias": latencias,
+            "circuitos": circuitos,
+            "retries": {**_retries, "saldo": round(_retries["saldo"], 2)},
+        }
@@ -0,0 +1,176 @@
+# inscricoes/services/mp_reconciliacao.py
+"""
+Conciliação em lote dos pagamentos de um evento com o Mercado Pago.
+
+Em vez de consultar inscrição por inscrição, varre /v1/payments/search na
+janela de datas do evento (um dia por consulta, páginas em paralelo num pool
+limitado), casa cada resultado com a Inscricao pelo external_reference e
+grava tudo com bulk_update/bulk_create numa única transação.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Inscricao, InscricaoStatus, Pagamento
+from .financeiro import recalcular_resumos
+from .mp_sync import campos_pagamento, mp_client_by_paroquia
+from .pagamento_confirmacao import confirmar_inscricoes, reverter_confirmacao
+from .pagamento_status import notificar_status
+
+logger = logging.getLogger("django")
+
+PAGE_LIMIT = 100      # máximo aceito pelo /v1/payments/search
+MAX_WORKERS = 4
+FOLGA_DIAS = 2        # pagamentos que chegam depois do fim do evento
+
+# quando há várias tentativas para a mesma inscrição, vale a "melhor"
+_PRIORIDADE = {
+    Pagamento.StatusPagamento.CONFIRMADO: 2,
+    Pagamento.StatusPagamento.PENDENTE: 1,
+    Pagamento.StatusPagamento.CANCELADO: 0,
+}
+_CAMPOS = ["transacao_id", "metodo", "valor", "status", "data_pagamento", "fee_mp", "net_received"]
+
+
+@dataclass
+class ResultadoConciliacao:
+    consultados: int = 0      # pagamentos devolvidos pelo MP na janela
+    casados: int = 0          # inscrições do evento com pagamento no MP
+    criados: int = 0
+    atualizados: int = 0
+    confirmados: int = 0      # inscrições (inclui pares) que passaram a confirmadas
+
+
+def janela_evento(evento):
+    """Da abertura das inscrições até alguns dias depois do fim do evento."""
+    tz = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(evento.inicio_inscricoes, time.min), tz)
+    fim = timezone.make_aware(datetime.combine(evento.data_fim + timedelta(days=FOLGA_DIAS), time.max), tz)
+    return inicio, fim
+
+
+# ----------------------------------------------------------------------
+# Busca no MP
+# ----------------------------------------------------------------------
+def _buscar_pagina(mp, inicio, fim, offset) -> dict:
+    filtros = {
+        "sort": "date_created",
+        "criteria": "asc",
+        "range": "date_created",
+        "begin_date": inicio.isoformat(timespec="milliseconds"),
+        "end_date": fim.isoformat(timespec="milliseconds"),
+        "limit": PAGE_LIMIT,
+        "offset": offset,
+    }
+    resp = mp.payment().search(filtros)
+    if resp.get("status") != 200:
+        raise RuntimeError(f"Busca MP falhou ({resp.get('status')}): {resp.get('response')}")
+    return resp.get("response") or {}
+
+
+def _dias(inicio, fim):
+    """Quebra a janela em dias (o search do MP limita o offset)."""
+    atual = inicio
+    while atual < fim:
+        prox = min(atual + timedelta(days=1), fim)
+        yield atual, prox
+        atual = prox
+
+
+def buscar_pagamentos(mp, inicio, fim, max_workers: int = MAX_WORKERS) -> list:
+    """Todos os pagamentos criados na janela. Chamadas ao MP num pool limitado."""
+    dias = list(_dias(inicio, fim))
+    resultados = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # 1ª página de cada dia → descobre o total de cada um
+        primeiras = list(pool.map(lambda d: _buscar_pagina(mp, d[0], d[1], 0), dias))
+        restantes = []
+        for (ini, fi), pagina in zip(dias, primeiras):
+            resultados.extend(pagina.get("results") or [])
+            total = (pagina.get("paging") or {}).get("total") or 0
+            restantes.extend((ini, fi, off) for off in range(PAGE_LIMIT, total, PAGE_LIMIT))
+        # demais páginas, todas em paralelo
+        for pagina in pool.map(lambda r: _buscar_pagina(mp, *r), restantes):
+            resultados.extend(pagina.get("results") or [])
+    return resultados
+
+
+def _melhor_por_inscricao(pagamentos) -> dict:
+    melhores = {}
+    for p in pagamentos:
+        ref = str(p.get("external_reference") or "")
+        if not ref.isdigit():
+            continue
+        chave = (_PRIORIDADE[campos_pagamento(p)["status"]], p.get("date_last_updated") or p.get("date_created") or "")
+        atual = melhores.get(int(ref))
+        if atual is None or chave > atual[0]:
+            melhores[int(ref)] = (chave, p)
+    return {ref: p for ref, (_, p) in melhores.items()}
+
+
+# ----------------------------------------------------------------------
+# Conciliação
+# ----------------------------------------------------------------------
+def conciliar_evento(evento, *, inicio=None, fim=None, max_workers: int = MAX_WORKERS,
+                     dry_run: bool = False) -> ResultadoConciliacao:
+    res = ResultadoConciliacao()
+    jan_ini, jan_fim = janela_evento(evento)
+    inicio, fim = inicio or jan_ini, fim or jan_fim
+
+    mp = mp_client_by_paroquia(evento.paroquia)
+    pagamentos = buscar_pagamentos(mp, inicio, fim, max_workers=max_workers)
+    res.consultados = len(pagamentos)
+
+    por_inscricao = _melhor_por_inscricao(pagamentos)
+    inscricoes = list(
+        Inscricao.objects.filter(evento=evento, pk__in=list(por_inscricao))
+        .select_related("pagamento")
+    )
+    res.casados = len(inscricoes)
+
+    novos, alterados = [], []
+    confirmar, desconfirmar = set(), set()
+    for ins in inscricoes:
+        campos = campos_pagamento(por_inscricao[ins.pk])
+        pag = getattr(ins, "pagamento", None)
+        if pag is None:
+            novos.append(Pagamento(inscricao=ins, **campos))
+        elif any(getattr(pag, c) != v for c, v in campos.items()):
+            for c, v in campos.items():
+                setattr(pag, c, v)
+            alterados.append(pag)
+
+        # a inscrição é conferida mesmo se o Pagamento já estava certo
+        if campos["status"] == Pagamento.StatusPagamento.CONFIRMADO:
+            if ins.status != InscricaoStatus.PAG_CONFIRMADO:
+                confirmar.add(ins.pk)
+        elif ins.status == InscricaoStatus.PAG_CONFIRMADO:
+            desconfirmar.add(ins.pk)
+
+    res.criados, res.atualizados = len(novos), len(alterados)
+    if dry_run:
+        res.confirmados = len(confirmar)
+        return res
+
+    # bulk_* não dispara post_save: inscrição/par vão pelas mesmas regras do
+    # serviço de confirmação, em UPDATEs de conjunto
+    with transaction.atomic():
+        Pagamento.objects.bulk_create(novos, batch_size=500)
+        Pagamento.objects.bulk_update(alterados, _CAMPOS, batch_size=500)
+        confirmadas = confirmar_inscricoes(confirmar)
+        reverter_confirmacao(desconfirmar)
+        if novos or alterados:
+            recalcular_resumos([evento.pk])
+    res.confirmados = len(confirmadas)
+    # cache de status + push para as telas de espera
+    notificar_status({p.inscricao_id for p in novos + alterados} | set(confirmadas) | desconfirmar)
+
+    logger.info(
+        "Conciliação MP evento %s: %s consultados, %s casados, %s criados, %s atualizados, %s confirmados",
+        evento.pk, res.consultados, res.casados, res.criados, res.atualizados, res.confirmados,
+    )
+    return res
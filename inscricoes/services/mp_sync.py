@@ -0,0 +1,97 @@
+# inscricoes/services/mp_sync.py
+from decimal import Decimal
+
+from django.utils.dateparse import parse_datetime
+
+from ..models import Pagamento, Reembolso
+from .mp_clients import cliente_paroquia
+
+
+def mp_client_by_paroquia(paroquia):
+    cfg = getattr(paroquia, "mp_config", None)
+    if not cfg or not cfg.access_token:
+        raise ValueError("Mercado Pago não configurado para esta paróquia.")
+    return cliente_paroquia(paroquia.pk, cfg.access_token)
+
+
+def buscar_pagamento(mp_client, payment_id) -> dict:
+    return mp_client.payment().get(payment_id)["response"]
+
+
+def sincronizar_pagamento(mp_client, inscricao, payment_id):
+    """
+    Busca o pagamento no MP, garante que o external_reference bate com a inscrição
+    e sincroniza o registro OneToOne Pagamento dessa inscrição.
+    """
+    return aplicar_pagamento(inscricao, buscar_pagamento(mp_client, payment_id))
+
+
+def status_local(status_mp) -> str:
+    """Status do MP → Pagamento.StatusPagamento."""
+    if status_mp == "approved":
+        return Pagamento.StatusPagamento.CONFIRMADO
+    if status_mp in ("pending", "in_process"):
+        return Pagamento.StatusPagamento.PENDENTE
+    return Pagamento.StatusPagamento.CANCELADO
+
+
+def _decimal(valor) -> Decimal:
+    return Decimal(str(valor or 0)).quantize(Decimal("0.01"))
+
+
+def taxas_pagamento(payment: dict) -> dict:
+    """
+    fee_mp: soma de fee_details cobradas do recebedor (fee_payer=collector).
+    net_received: transaction_details.net_received_amount; enquanto o MP não
+    informa (pendente), valor - taxas.
+    """
+    fee = sum(
+        (_decimal(f.get("amount")) for f in payment.get("fee_details") or []
+         if (f.get("fee_payer") or "collector") == "collector"),
+        Decimal("0.00"),
+    )
+    liquido = (payment.get("transaction_details") or {}).get("net_received_amount")
+    if not liquido:
+        liquido = _decimal(payment.get("transaction_amount")) - fee
+    return {"fee_mp": fee, "net_received": _decimal(liquido)}
+
+
+def _reembolso_do_lote(payment_id) -> bool:
+    return (Reembolso.objects
+            .filter(pagamento__transacao_id=str(payment_id or ""))
+            .exclude(status=Reembolso.Status.NEGADO)
+            .exists())
+
+
+def campos_pagamento(payment: dict) -> dict:
+    """Campos do Pagamento local derivados do JSON do MP."""
+    status = status_local(payment.get("status"))
+    if payment.get("status_detail") == "partially_refunded" and _reembolso_do_lote(payment.get("id")):
+        # reembolso com taxa administrativa retida (services.reembolso_lote): segue "approved" no MP.
+        # Devolução parcial feita fora do lote (ex.: troco pelo painel do MP) não cancela o pagamento.
+        status = Pagamento.StatusPagamento.CANCELADO
+    return {
+        "transacao_id": str(payment.get("id") or ""),
+        "metodo": payment.get("payment_method_id", Pagamento.MetodoPagamento.PIX),
+        "valor": _decimal(payment.get("transaction_amount")),
+        "status": status,
+        "data_pagamento": parse_datetime(payment.get("date_approved")) if payment.get("date_approved") else None,
+        **taxas_pagamento(payment),
+    }
+
+
+def aplicar_pagamento(inscricao, payment: dict):
+    """Aplica na inscrição um pagamento já lido da API do MP (sem nova chamada)."""
+    # Segurança: confere vínculo
+    if str(payment.get("external_reference")) != str(inscricao.id):
+        raise ValueError("Pagamento não corresponde à inscrição.")
+
+    # Atualiza sempre o mesmo registro (OneToOne)
+    campos = campos_pagamento(payment)
+    pagamento, _ = Pagamento.objects.get_or_create(inscricao=inscricao, defaults=campos)
+    for campo, valor in campos.items():
+        setattr(pagamento, campo, valor)
+
+    # o post_save do Pagamento confirma a inscrição e o par (services.pagamento_confirmacao)
+    pagamento.save()
+    return payment.get("status")
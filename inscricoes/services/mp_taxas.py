@@ -0,0 +1,102 @@
+# inscricoes/services/mp_taxas.py
+"""
+Backfill de fee_mp / net_received dos pagamentos confirmados antigos.
+
+Os pagamentos sincronizados antes de mp_sync.taxas_pagamento() ficaram com
+taxas zeradas. Aqui cada um é relido no MP (pool limitado de threads, cliente
+persistente da paróquia), os valores vão ao banco com bulk_update e o resumo
+financeiro dos eventos afetados é recalculado — os relatórios não precisam
+consultar o MP.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from ..models import Pagamento
+from .financeiro import recalcular_resumos
+from .mp_sync import buscar_pagamento, mp_client_by_paroquia, taxas_pagamento
+
+logger = logging.getLogger("django")
+
+MAX_WORKERS = 4
+LOTE = 200  # gravação a cada LOTE pagamentos relidos
+
+
+@dataclass
+class ResultadoTaxas:
+    pagamentos: int = 0
+    atualizados: int = 0
+    sem_mudanca: int = 0
+    erros: list = field(default_factory=list)  # [(pagamento_id, mensagem)]
+
+
+def pagamentos_sem_taxa(*, todos=False, eventos=None):
+    qs = (Pagamento.objects
+          .filter(status=Pagamento.StatusPagamento.CONFIRMADO, transacao_id__regex=r"^\d+$")
+          .select_related("inscricao__paroquia__mp_config"))
+    if not todos:
+        qs = qs.filter(fee_mp=0)
+    if eventos is not None:
+        qs = qs.filter(inscricao__evento__in=eventos)
+    return qs.order_by("id")
+
+
+def _gravar(pagamentos) -> None:
+    if not pagamentos:
+        return
+    with transaction.atomic():
+        Pagamento.objects.bulk_update(pagamentos, ["fee_mp", "net_received"], batch_size=LOTE)
+        # bulk_update não passa pelos signals: resumo dos eventos recalculado de uma vez
+        recalcular_resumos({p.inscricao.evento_id for p in pagamentos})
+
+
+def preencher_taxas(*, todos=False, eventos=None, max_workers=MAX_WORKERS,
+                    dry_run=False, progresso=None) -> ResultadoTaxas:
+    """
+    Relê no MP os pagamentos confirmados sem taxa (ou todos, com `todos=True`).
+    `progresso(feitos, total)` é chamado a cada pagamento relido.
+    """
+    res = ResultadoTaxas()
+    pagamentos = list(pagamentos_sem_taxa(todos=todos, eventos=eventos))
+    res.pagamentos = len(pagamentos)
+    if dry_run or not pagamentos:
+        return res
+
+    clientes = {}
+
+    def _cliente(paroquia):
+        if paroquia.pk not in clientes:
+            clientes[paroquia.pk] = mp_client_by_paroquia(paroquia)
+        return clientes[paroquia.pk]
+
+    def _reler(pag):
+        return taxas_pagamento(buscar_pagamento(_cliente(pag.inscricao.paroquia), pag.transacao_id))
+
+    alterados = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futuros = {pool.submit(_reler, p): p for p in pagamentos}
+        for feitos, fut in enumerate(as_completed(futuros), start=1):
+            pag = futuros[fut]
+            try:
+                taxas = fut.result()
+            except Exception as e:
+                res.erros.append((pag.pk, str(e)))
+                logger.warning("Falha ao reler taxas do pagamento %s (%s): %s", pag.pk, pag.transacao_id, e)
+            else:
+                if (pag.fee_mp, pag.net_received) == (taxas["fee_mp"], taxas["net_received"]):
+                    res.sem_mudanca += 1
+                else:
+                    pag.fee_mp, pag.net_received = taxas["fee_mp"], taxas["net_received"]
+                    alterados.append(pag)
+            if len(alterados) >= LOTE:
+                _gravar(alterados)
+                res.atualizados += len(alterados)
+                alterados = []
+            if progresso:
+                progresso(feitos, len(pagamentos))
+
+    _gravar(alterados)
+    res.atualizados += len(alterados)
+    return res
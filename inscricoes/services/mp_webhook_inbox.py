@@ -0,0 +1,239 @@
+# inscricoes/services/mp_webhook_inbox.py
+"""
+Caixa de entrada dos webhooks do Mercado Pago.
+
+mp_webhook só grava a notificação (registrar_notificacao) e responde 200.
+O worker chama processar_lote() em loop: busca o pagamento no MP,
+sincroniza o Pagamento e reagenda com backoff exponencial em caso de falha.
+
+A notification_url de cada pagamento leva a paróquia assinada (?r=...), então
+o worker já sabe qual credencial usar: uma única consulta ao MP por webhook.
+"""
+import logging
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import Inscricao, MercadoPagoConfig, NotificacaoMercadoPago, Paroquia
+from . import mp_clients
+from .mp_clients import MPIndisponivel, cliente_paroquia
+from .mp_sync import aplicar_pagamento, buscar_pagamento, mp_client_by_paroquia, sincronizar_pagamento
+
+logger = logging.getLogger("django")
+
+MAX_TENTATIVAS = 8
+BACKOFF_BASE_SEGUNDOS = 30
+BACKOFF_MAX_SEGUNDOS = 60 * 60
+# linhas presas em "processando" (worker morreu no meio) voltam para a fila
+PROCESSANDO_TIMEOUT = timedelta(minutes=10)
+# circuito desta operação aberto → o worker nem reserva o lote (ver mp_clients)
+OPERACAO_CONSULTA = "GET /v1/payments/:id"
+
+
+ROTA_SALT = "inscricoes.mp_webhook.rota"
+
+
+class NotificacaoDescartada(Exception):
+    """Falha definitiva: não adianta tentar de novo (ex.: sem external_reference)."""
+
+
+# ----------------------------------------------------------------------
+# Rota assinada (paróquia) na notification_url
+# ----------------------------------------------------------------------
+def assinar_rota(paroquia_id) -> str:
+    return signing.Signer(salt=ROTA_SALT).sign(str(paroquia_id))
+
+
+def ler_rota(token) -> int | None:
+    """Devolve o id da paróquia se a assinatura for válida; senão None."""
+    if not token:
+        return None
+    try:
+        return int(signing.Signer(salt=ROTA_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def url_com_rota(webhook_url: str, paroquia_id) -> str:
+    sep = "&" if "?" in webhook_url else "?"
+    return f"{webhook_url}{sep}{urlencode({'r': assinar_rota(paroquia_id)})}"
+
+
+# ----------------------------------------------------------------------
+# Caixa de entrada
+# ----------------------------------------------------------------------
+def registrar_notificacao(payment_id, payload=None, paroquia_id=None) -> NotificacaoMercadoPago:
+    """
+    Grava (ou reabre) a notificação do payment_id. Não chama o MP.
+    Dedupe por payment_id: várias entregas do mesmo pagamento viram uma linha só.
+    """
+    payment_id = str(payment_id)
+    payload = payload or {}
+    agora = timezone.now()
+
+    notif, criada = NotificacaoMercadoPago.objects.get_or_create(
+        payment_id=payment_id,
+        defaults={"payload": payload, "paroquia_rota": paroquia_id, "proxima_tentativa": agora},
+    )
+    if criada:
+        return notif
+
+    if paroquia_id and not notif.paroquia_rota:
+        NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(paroquia_rota=paroquia_id)
+
+    St = NotificacaoMercadoPago.Status
+    # em processamento: só marca para rodar de novo quando terminar
+    NotificacaoMercadoPago.objects.filter(pk=notif.pk, status=St.PROCESSANDO).update(reprocessar=True)
+    NotificacaoMercadoPago.objects.filter(pk=notif.pk).exclude(status=St.PROCESSANDO).update(
+        status=St.PENDENTE,
+        payload=payload,
+        tentativas=0,
+        proxima_tentativa=agora,
+        ultimo_erro="",
+    )
+    return notif
+
+
+def _backoff(tentativas: int) -> timedelta:
+    segundos = BACKOFF_BASE_SEGUNDOS * (2 ** max(tentativas - 1, 0))
+    return timedelta(seconds=min(segundos, BACKOFF_MAX_SEGUNDOS))
+
+
+def _liberar_presas(agora):
+    St = NotificacaoMercadoPago.Status
+    NotificacaoMercadoPago.objects.filter(
+        status=St.PROCESSANDO,
+        atualizada_em__lt=agora - PROCESSANDO_TIMEOUT,
+    ).update(status=St.PENDENTE, proxima_tentativa=agora)
+
+
+def _reservar(limite: int, agora) -> list:
+    """
+    Reserva até `limite` notificações vencidas, na ordem de chegada.
+    Pula inscrições que já têm notificação em processamento em outro worker,
+    para que os pagamentos de uma mesma inscrição sejam aplicados em ordem.
+    """
+    St = NotificacaoMercadoPago.Status
+    with transaction.atomic():
+        em_andamento = (NotificacaoMercadoPago.objects
+                        .filter(status=St.PROCESSANDO, inscricao__isnull=False)
+                        .values("inscricao_id"))
+        ids = list(
+            NotificacaoMercadoPago.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=St.PENDENTE, proxima_tentativa__lte=agora)
+            .exclude(inscricao_id__in=em_andamento)
+            .order_by("recebida_em")
+            .values_list("pk", flat=True)[:limite]
+        )
+        if ids:
+            NotificacaoMercadoPago.objects.filter(pk__in=ids).update(
+                status=St.PROCESSANDO,
+                reprocessar=False,
+                tentativas=F("tentativas") + 1,
+            )
+    return list(NotificacaoMercadoPago.objects.filter(pk__in=ids).order_by("recebida_em"))
+
+
+def _inscricao_da_paroquia(inscricao_id, paroquia_id) -> Inscricao:
+    qs = Inscricao.objects.select_related("paroquia__mp_config")
+    if paroquia_id:
+        qs = qs.filter(paroquia_id=paroquia_id)
+    try:
+        return qs.get(pk=inscricao_id)
+    except (Inscricao.DoesNotExist, ValueError):
+        raise NotificacaoDescartada(f"Inscrição {inscricao_id} não encontrada.")
+
+
+def _sincronizar_notificacao(notif: NotificacaoMercadoPago):
+    """Sincroniza o pagamento da notificação. Retorna (inscricao, status do MP)."""
+    # Caminho normal: paróquia conhecida (rota assinada ou 1º processamento) → 1 chamada.
+    paroquia_id = notif.paroquia_rota
+    if not paroquia_id and notif.inscricao_id:
+        paroquia_id = Inscricao.objects.filter(pk=notif.inscricao_id).values_list("paroquia_id", flat=True).first()
+    paroquia = Paroquia.objects.select_related("mp_config").filter(pk=paroquia_id).first() if paroquia_id else None
+
+    if paroquia:
+        payment = buscar_pagamento(mp_client_by_paroquia(paroquia), notif.payment_id)
+        inscricao_id = payment.get("external_reference")
+        if not inscricao_id:
+            raise NotificacaoDescartada(f"Pagamento {notif.payment_id} sem external_reference.")
+        inscricao = _inscricao_da_paroquia(inscricao_id, paroquia_id)
+        return inscricao, aplicar_pagamento(inscricao, payment)
+
+    # Legado (pagamentos criados antes da rota): qualquer credencial só para
+    # ler o external_reference, depois reconsulta com a credencial da paróquia.
+    cfg_any = MercadoPagoConfig.objects.first()
+    if not cfg_any or not cfg_any.access_token:
+        raise RuntimeError("Nenhuma configuração do MP encontrada.")
+
+    mp_any = cliente_paroquia(cfg_any.paroquia_id, cfg_any.access_token)
+    payment_tmp = mp_any.payment().get(notif.payment_id).get("response", {})
+    inscricao_id = payment_tmp.get("external_reference")
+    if not inscricao_id:
+        raise NotificacaoDescartada(f"Pagamento {notif.payment_id} sem external_reference.")
+    inscricao = _inscricao_da_paroquia(inscricao_id, None)
+    mp = mp_client_by_paroquia(inscricao.paroquia)
+    return inscricao, sincronizar_pagamento(mp, inscricao, notif.payment_id)
+
+
+def processar_notificacao(notif: NotificacaoMercadoPago) -> None:
+    St = NotificacaoMercadoPago.Status
+    agora = timezone.now()
+    try:
+        inscricao, status = _sincronizar_notificacao(notif)
+
+        NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(
+            status=St.PROCESSADA,
+            processada_em=timezone.now(),
+            ultimo_erro="",
+            inscricao=inscricao,
+            paroquia_rota=inscricao.paroquia_id,
+        )
+        logger.info("Webhook OK para pagamento %s (inscrição %s): %s", notif.payment_id, inscricao.pk, status)
+
+    except MPIndisponivel as e:
+        # MP fora: não gasta tentativa, volta quando o circuito puder reabrir
+        logger.warning("Notificação MP %s adiada: %s", notif.payment_id, e)
+        NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(
+            status=St.PENDENTE,
+            tentativas=F("tentativas") - 1,
+            proxima_tentativa=agora + timedelta(seconds=max(e.reabre_em, 1)),
+            ultimo_erro=str(e),
+        )
+
+    except NotificacaoDescartada as e:
+        logger.error("Notificação MP %s descartada: %s", notif.payment_id, e)
+        NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(status=St.ERRO, ultimo_erro=str(e))
+
+    except Exception as e:
+        logger.exception("Erro ao processar notificação MP %s: %s", notif.payment_id, e)
+        if notif.tentativas >= MAX_TENTATIVAS:
+            NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(status=St.ERRO, ultimo_erro=str(e))
+        else:
+            NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(
+                status=St.PENDENTE,
+                proxima_tentativa=agora + _backoff(notif.tentativas),
+                ultimo_erro=str(e),
+            )
+
+    # nova entrega chegou durante o processamento → volta imediatamente para a fila
+    NotificacaoMercadoPago.objects.filter(pk=notif.pk, reprocessar=True).exclude(status=St.PENDENTE).update(
+        status=St.PENDENTE, reprocessar=False, tentativas=0, proxima_tentativa=timezone.now()
+    )
+
+
+def processar_lote(limite: int = 50) -> int:
+    """Processa um lote de notificações vencidas. Retorna quantas foram tratadas."""
+    agora = timezone.now()
+    _liberar_presas(agora)
+    if not mp_clients.disponivel(OPERACAO_CONSULTA):
+        return 0  # circuito aberto: a fila espera, sem reservar nada
+    lote = _reservar(limite, agora)
+    for notif in lote:
+        processar_notificacao(notif)
+    return len(lote)
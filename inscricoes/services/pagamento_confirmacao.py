@@ -0,0 +1,99 @@
+# inscricoes/services/pagamento_confirmacao.py
+"""
+Pagamento → Inscrição → par (casais), num só lugar.
+
+Substitui os dois post_save empilhados (models._sincronizar_pagamento_inscricao,
+que passava por Inscricao.save()/full_clean/mudar_status, e
+signals.espelhar_pagamento_no_par). Tudo por UPDATE em conjunto, numa
+transação e com número fixo de queries:
+
+  confirmação: 1 SELECT (inscrição + par, com lock) + 1 UPDATE
+  reversão:    1 UPDATE
+
+Inscrições canceladas ou em reembolso não são mexidas por um pagamento.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Inscricao, InscricaoStatus, Pagamento
+from .pagamento_status import notificar_status
+
+# pagamento não tira a inscrição desses estados (decisão da paróquia/participante)
+STATUS_PROTEGIDOS = {
+    InscricaoStatus.CANCEL_USUARIO,
+    InscricaoStatus.CANCEL_ADMIN,
+    InscricaoStatus.REEMB_SOL,
+    InscricaoStatus.REEMB_APROV,
+    InscricaoStatus.REEMB_NEG,
+}
+
+
+def _com_pares(ids):
+    """Q das inscrições `ids` e dos respectivos pares (nos dois sentidos do vínculo)."""
+    return (
+        Q(pk__in=ids)
+        | Q(inscricao_pareada_id__in=ids)
+        | Q(pk__in=Inscricao.objects.filter(pk__in=ids, inscricao_pareada__isnull=False)
+                                    .values("inscricao_pareada_id"))
+    )
+
+
+def confirmar_inscricoes(ids) -> list:
+    """Marca as inscrições (e pares) como pagas. Retorna os ids alterados."""
+    ids = list(ids)
+    if not ids:
+        return []
+    with transaction.atomic():
+        alvo = list(
+            Inscricao.objects.select_for_update()
+            .filter(_com_pares(ids))
+            .exclude(status__in=STATUS_PROTEGIDOS | {InscricaoStatus.PAG_CONFIRMADO})
+            .values_list("pk", flat=True)
+        )
+        if alvo:
+            Inscricao.objects.filter(pk__in=alvo).update(
+                status=InscricaoStatus.PAG_CONFIRMADO,
+                foi_selecionado=True,
+                pagamento_confirmado=True,
+                inscricao_concluida=True,
+                inscricao_enviada=True,
+            )
+    return alvo
+
+
+def reverter_confirmacao(ids) -> int:
+    """Pagamento deixou de valer: volta a 'pagamento pendente'. O par não é alterado."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    return Inscricao.objects.filter(pk__in=ids, status=InscricaoStatus.PAG_CONFIRMADO).update(
+        status=InscricaoStatus.PAG_PENDENTE,
+        foi_selecionado=True,
+        pagamento_confirmado=False,
+        inscricao_concluida=False,
+    )
+
+
+def _disparar_confirmacao(inscricao_id) -> None:
+    """Mesmos disparos que mudar_status fazia ao chegar em PAG_CONFIRMADO."""
+    ins = Inscricao.objects.select_related("participante", "evento", "paroquia").filter(pk=inscricao_id).first()
+    if ins:
+        ins.enviar_email_pagamento_confirmado()
+        ins.enviar_whatsapp_pagamento_confirmado()
+
+
+def aplicar_status_pagamento(pagamento: Pagamento) -> None:
+    """Reflete o status do Pagamento na inscrição e no par."""
+    inscricao_id = pagamento.inscricao_id
+    if not inscricao_id:
+        return
+    alterados = []
+    if pagamento.status == Pagamento.StatusPagamento.CONFIRMADO:
+        alterados = confirmar_inscricoes([inscricao_id])
+    else:
+        reverter_confirmacao([inscricao_id])
+
+    if inscricao_id in alterados:
+        transaction.on_commit(lambda: _disparar_confirmacao(inscricao_id))
+    # cache de status + push para as telas de espera (depois do commit)
+    notificar_status({inscricao_id, *alterados})
@@ -0,0 +1,200 @@
+# inscricoes/services/pagamento_expiracao.py
+"""
+Varredura dos pagamentos PENDENTES cujas cobranças já venceram.
+
+PIX (iniciar_pagamento_pix, 30 min) e preferências do Checkout Pro (24 h)
+expiram no MP, mas o Pagamento local ficava PENDENTE para sempre — e o
+polling/relatórios o tratavam como vivo.
+
+1. Candidatos: uma consulta (índices compostos status + pix_expira_em /
+   status + mp_preference_expira_em), só linhas em que TODAS as cobranças
+   conhecidas venceram há mais de FOLGA.
+2. Conferência no MP em pool limitado de threads: pelo transacao_id ou, sem
+   ele, buscando pelo external_reference (pagamento que o webhook perdeu).
+3. Gravação em conjunto, só sobre linhas ainda PENDENTES (lock): aprovados
+   passam pelo serviço de confirmação; vencidos viram CANCELADO num UPDATE.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Pagamento
+from .financeiro import recalcular_resumos
+from .mp_clients import MPIndisponivel
+from .mp_sync import buscar_pagamento, campos_pagamento, mp_client_by_paroquia
+from .pagamento_confirmacao import confirmar_inscricoes
+from .pagamento_status import notificar_status
+
+logger = logging.getLogger("django")
+
+# webhook atrasado ainda pode confirmar uma cobrança recém-vencida
+FOLGA = timedelta(minutes=10)
+LOTE = 200
+MAX_WORKERS = 4
+
+St = Pagamento.StatusPagamento
+_CAMPOS = ["transacao_id", "metodo", "valor", "status", "data_pagamento", "fee_mp", "net_received"]
+
+
+@dataclass
+class ResultadoExpiracao:
+    candidatos: int = 0
+    cancelados: int = 0
+    confirmados: int = 0      # MP aprovou (webhook perdido)
+    mantidos: int = 0         # ainda pendente no MP (ex.: boleto dentro do prazo)
+    erros: list = field(default_factory=list)  # [(pagamento_id, mensagem)]
+
+
+def pendentes_vencidos(agora=None):
+    """Pagamentos PENDENTES sem nenhuma cobrança válida (PIX e preferência vencidos há FOLGA)."""
+    corte = (agora or timezone.now()) - FOLGA
+    return (Pagamento.objects
+            .filter(status=St.PENDENTE)
+            .filter(Q(pix_expira_em__lt=corte) | Q(mp_preference_expira_em__lt=corte))
+            .exclude(pix_expira_em__gte=corte)
+            .exclude(mp_preference_expira_em__gte=corte)
+            .select_related("inscricao__paroquia__mp_config")
+            .order_by("id"))
+
+
+# ----------------------------------------------------------------------
+# Conferência no MP
+# ----------------------------------------------------------------------
+def _buscar_por_referencia(mp, inscricao_id) -> dict | None:
+    """Pagamento do MP para a inscrição (aprovado primeiro, depois o mais recente), ou None."""
+    resp = mp.payment().search({"external_reference": str(inscricao_id), "sort": "date_created",
+                                "criteria": "desc", "limit": 50})
+    if resp.get("status") != 200:
+        raise RuntimeError(f"Busca MP falhou ({resp.get('status')}): {resp.get('response')}")
+    resultados = (resp.get("response") or {}).get("results") or []
+    aprovados = [p for p in resultados if p.get("status") == "approved"]
+    return (aprovados or resultados or [None])[0]
+
+
+def _pagamento_no_mp(mp, pag: Pagamento) -> dict | None:
+    if pag.transacao_id.isdigit():
+        return buscar_pagamento(mp, pag.transacao_id)
+    return _buscar_por_referencia(mp, pag.inscricao_id)
+
+
+def _destino(pag: Pagamento, payment: dict | None, corte) -> dict | None:
+    """
+    Campos a gravar no pagamento, ou None para mantê-lo pendente.
+    Sem pagamento no MP (só a preferência/QR vencidos) → CANCELADO.
+    """
+    if not payment:
+        return {"status": St.CANCELADO}
+    campos = campos_pagamento(payment)
+    if campos["status"] == St.PENDENTE:
+        vence = parse_datetime(payment.get("date_of_expiration") or "")
+        if vence is not None and timezone.is_naive(vence):
+            vence = timezone.make_aware(vence, dt_timezone.utc)
+        if vence is None or vence >= corte:
+            return None  # ainda pode ser pago (ex.: boleto); o webhook resolve
+        # o MP às vezes demora a virar o status; passado o vencimento não há como pagar
+        campos["status"] = St.CANCELADO
+    return campos
+
+
+# ----------------------------------------------------------------------
+# Gravação
+# ----------------------------------------------------------------------
+def _gravar(destinos: dict) -> tuple:
+    """destinos: {pagamento: campos}. Retorna (cancelados, confirmados)."""
+    if not destinos:
+        return 0, 0
+    por_id = {p.pk: (p, c) for p, c in destinos.items()}
+    with transaction.atomic():
+        # só o que continua pendente: um webhook pode ter confirmado nesse meio-tempo
+        ainda_pendentes = set(
+            Pagamento.objects.select_for_update()
+            .filter(pk__in=list(por_id), status=St.PENDENTE)
+            .values_list("pk", flat=True)
+        )
+        so_cancelar, completos = [], []
+        for pk in ainda_pendentes:
+            pag, campos = por_id[pk]
+            if campos.keys() == {"status"}:
+                so_cancelar.append(pk)
+            else:
+                for c, v in campos.items():
+                    setattr(pag, c, v)
+                completos.append(pag)
+
+        # UPDATE/bulk_update não disparam post_save: confirmação e resumo em conjunto
+        Pagamento.objects.filter(pk__in=so_cancelar).update(status=St.CANCELADO)
+        Pagamento.objects.bulk_update(completos, _CAMPOS, batch_size=LOTE)
+        aprovados = [p for p in completos if p.status == St.CONFIRMADO]
+        confirmar_inscricoes({p.inscricao_id for p in aprovados})
+        if aprovados:
+            recalcular_resumos({p.inscricao.evento_id for p in aprovados})
+        notificar_status({por_id[pk][0].inscricao_id for pk in ainda_pendentes})
+
+    cancelados = len(so_cancelar) + sum(p.status == St.CANCELADO for p in completos)
+    return cancelados, len(aprovados)
+
+
+def expirar_pendentes(*, agora=None, max_workers=MAX_WORKERS, dry_run=False, progresso=None) -> ResultadoExpiracao:
+    """
+    Confere no MP os pendentes vencidos e cancela/confirma em conjunto.
+    `progresso(feitos, total)` é chamado a cada pagamento conferido.
+    """
+    agora = agora or timezone.now()
+    corte = agora - FOLGA
+    res = ResultadoExpiracao()
+    pagamentos = list(pendentes_vencidos(agora))
+    res.candidatos = len(pagamentos)
+    if dry_run or not pagamentos:
+        return res
+
+    clientes = {}
+
+    def _cliente(paroquia):
+        if paroquia.pk not in clientes:
+            clientes[paroquia.pk] = mp_client_by_paroquia(paroquia)
+        return clientes[paroquia.pk]
+
+    def _conferir(pag):
+        return _pagamento_no_mp(_cliente(pag.inscricao.paroquia), pag)
+
+    destinos = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futuros = {pool.submit(_conferir, p): p for p in pagamentos}
+        for feitos, fut in enumerate(as_completed(futuros), start=1):
+            pag = futuros[fut]
+            try:
+                campos = _destino(pag, fut.result(), corte)
+            except MPIndisponivel as e:
+                # MP fora: fica para a próxima rodada, sem cancelar às cegas
+                res.erros.append((pag.pk, str(e)))
+                campos = None
+            except Exception as e:
+                res.erros.append((pag.pk, str(e)))
+                logger.warning("Falha ao conferir pagamento pendente %s (%s): %s", pag.pk, pag.transacao_id, e)
+                campos = None
+            else:
+                if campos is None:
+                    res.mantidos += 1
+            if campos is not None:
+                destinos[pag] = campos
+            if len(destinos) >= LOTE:
+                _somar(res, _gravar(destinos))
+                destinos = {}
+            if progresso:
+                progresso(feitos, len(pagamentos))
+
+    _somar(res, _gravar(destinos))
+    logger.info("Expiração de pendentes: %s candidatos, %s cancelados, %s confirmados, %s mantidos, %s erros",
+                res.candidatos, res.cancelados, res.confirmados, res.mantidos, len(res.erros))
+    return res
+
+
+def _somar(res: ResultadoExpiracao, gravados: tuple) -> None:
+    res.cancelados += gravados[0]
+    res.confirmados += gravados[1]
@@ -0,0 +1,109 @@
+# inscricoes/services/pagamento_status.py
+"""
+Status de pagamento exibido nas telas de espera (aguardando.html / pix.html).
+
+- estado_pagamento(): o JSON que o front entende ({"status", "pagamento_confirmado"}).
+- estado_em_cache(): o mesmo estado + "versao", servido do cache (read model);
+  é o que o polling usa, sem tocar no banco.
+- notificar_status(): depois do commit, atualiza o cache e empurra o estado para
+  quem está conectado no WebSocket da inscrição (consumers.StatusPagamentoConsumer).
+"""
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import Inscricao, Pagamento
+
+logger = logging.getLogger("django")
+
+
+def grupo_pagamento(inscricao_id) -> str:
+    return f"pagamento_{inscricao_id}"
+
+
+def status_publico(status_pagamento) -> str:
+    if status_pagamento == Pagamento.StatusPagamento.CONFIRMADO:
+        return "confirmado"
+    if status_pagamento == Pagamento.StatusPagamento.CANCELADO:
+        return "cancelado"
+    return "pendente"
+
+
+def estado_pagamento(inscricao_id) -> dict | None:
+    """Estado atual lido do banco (uma consulta). None se a inscrição não existe."""
+    row = (Inscricao.objects.filter(pk=inscricao_id)
+           .values_list("pagamento_confirmado", "pagamento__status")
+           .first())
+    if row is None:
+        return None
+    confirmado, status = row
+    return {"status": status_publico(status), "pagamento_confirmado": bool(confirmado)}
+
+
+# ----------------------------------------------------------------------
+# Read model em cache
+# ----------------------------------------------------------------------
+# TTL limita o tempo de um estado desatualizado por escritas que não passam
+# pelos saves (ex.: .update() em lote na propagação para o par).
+CACHE_TTL = 10 * 60
+
+
+def _chave(inscricao_id) -> str:
+    return f"pagamento_status:v1:{inscricao_id}"
+
+
+def atualizar_cache(inscricao_id) -> dict | None:
+    """Relê o estado no banco e grava no cache; a versão só muda se o estado mudou."""
+    estado = estado_pagamento(inscricao_id)
+    if estado is None:
+        cache.delete(_chave(inscricao_id))
+        return None
+    anterior = cache.get(_chave(inscricao_id))
+    if anterior and {k: anterior[k] for k in estado} == estado:
+        versao = anterior["versao"]
+    elif anterior:
+        versao = anterior["versao"] + 1
+    else:
+        # sem histórico: base em ms para não repetir um ETag já entregue
+        versao = int(time.time() * 1000)
+    registro = {**estado, "versao": versao}
+    cache.set(_chave(inscricao_id), registro, CACHE_TTL)
+    return registro
+
+
+def estado_em_cache(inscricao_id) -> dict | None:
+    """Estado + versão. Só vai ao banco quando a chave não está no cache."""
+    registro = cache.get(_chave(inscricao_id))
+    if registro is None:
+        registro = atualizar_cache(inscricao_id)
+    return registro
+
+
+# ----------------------------------------------------------------------
+# Notificação (cache + WebSocket)
+# ----------------------------------------------------------------------
+def notificar_status(inscricao_ids) -> None:
+    """Agenda, para depois do commit, a atualização do cache e o push do estado."""
+    ids = [inscricao_ids] if isinstance(inscricao_ids, int) else list(inscricao_ids)
+    if ids:
+        transaction.on_commit(lambda: _enviar(ids))
+
+
+def _enviar(ids) -> None:
+    layer = get_channel_layer()
+    for inscricao_id in ids:
+        registro = atualizar_cache(inscricao_id)
+        if registro is None or layer is None:
+            continue
+        estado = {k: v for k, v in registro.items() if k != "versao"}
+        try:
+            async_to_sync(layer.group_send)(
+                grupo_pagamento(inscricao_id), {"type": "pagamento.status", "estado": estado}
+            )
+        except Exception as e:
+            # push é best-effort: o front volta para o polling se o socket cair
+            logger.warning("Falha ao notificar status da inscrição %s: %s", inscricao_id, e)
@@ -0,0 +1,111 @@
+# inscricoes/services/paginas_publicas.py
+"""
+Páginas públicas do evento (por slug) servidas do cache nos picos de acesso.
+
+- @pagina_publica("nome") guarda o HTML renderizado da view em
+  "paginas:v1:<nome>:<slug>:<versão do evento>.<versão global>:<data>".
+  Cache só para GET anônimo sem mensagens pendentes.
+- Invalidação por versão (signals): salvar EventoAcampamento ou
+  VideoEventoAcampamento troca a versão do slug. Salvar PoliticaPrivacidade
+  ou Paroquia troca a versão global. As entradas antigas só deixam de ser lidas
+  e expiram pelo TTL.
+- CSRF: o HTML guardado leva um marcador no lugar do token. A cada requisição
+  o marcador vira get_token(request), que também garante o cookie do CSRF.
+  Outros valores por requisição (ex.: o relógio do telão) seguem o mesmo
+  caminho via `por_requisicao` e chegam ao template pelo context processor
+  inscricoes.context_processors.pagina_publica.
+"""
+import functools
+import time
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+
+CACHE_TTL = 10 * 60
+PREFIXO = "paginas:v1"
+VERSAO_GLOBAL = f"{PREFIXO}:versao"
+
+
+def _chave_versao(slug: str) -> str:
+    return f"{PREFIXO}:versao:{slug}"
+
+
+def _marcador(nome: str) -> str:
+    # só letras/underscore: passa pelo autoescape sem mudar
+    return f"__pagina_publica_{nome}__"
+
+
+def versoes(slug: str) -> str:
+    chaves = [_chave_versao(slug), VERSAO_GLOBAL]
+    atuais = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in atuais:
+            # versão nova, nunca reaproveita um número já usado (cache reiniciado)
+            cache.add(chave, time.time_ns(), None)
+            atuais[chave] = cache.get(chave)
+    return ".".join(str(atuais[c]) for c in chaves)
+
+
+def invalidar_evento(*slugs) -> None:
+    for slug in filter(None, slugs):
+        cache.set(_chave_versao(slug), time.time_ns(), None)
+
+
+def invalidar_todas() -> None:
+    cache.set(VERSAO_GLOBAL, time.time_ns(), None)
+
+
+def _cacheavel(request) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if getattr(request, "user", None) is not None and request.user.is_authenticated:
+        return False
+    return len(get_messages(request)) == 0  # len() não consome as mensagens
+
+
+def pagina_publica(nome: str, *, por_requisicao: dict | None = None, cacheavel=None):
+    """
+    Cache do HTML da view (assinatura `view(request, slug, ...)`).
+    `por_requisicao`: {variável do template: função(request)} recalculada a cada acesso.
+    `cacheavel(request)`: condição extra da view (ex.: sem etapa em andamento na sessão).
+    """
+    valores = {"csrf_token": get_token, **(por_requisicao or {})}
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, slug, *args, **kwargs):
+            if not _cacheavel(request) or (cacheavel and not cacheavel(request)):
+                request.pagina_publica = {k: f(request) for k, f in valores.items() if k != "csrf_token"}
+                return view(request, slug, *args, **kwargs)
+
+            chave = f"{PREFIXO}:{nome}:{slug}:{versoes(slug)}:{timezone.localdate().isoformat()}"
+            html = cache.get(chave)
+            if html is None:
+                request.pagina_publica = {k: _marcador(k) for k in valores}
+                response = view(request, slug, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return _preencher(response, request, valores)
+                html = response.content.decode(response.charset)
+                cache.set(chave, html, CACHE_TTL)
+                return _preencher(response, request, valores, html)
+
+            response = HttpResponse(html)
+            return _preencher(response, request, valores, html)
+        return wrapper
+    return decorator
+
+
+def _preencher(response, request, valores: dict, html: str | None = None):
+    if html is None:
+        if response.streaming or not response.get("Content-Type", "").startswith("text/html"):
+            return response
+        html = response.content.decode(response.charset)
+    for nome, funcao in valores.items():
+        marcador = _marcador(nome)
+        if marcador in html:
+            html = html.replace(marcador, str(funcao(request)))
+    response.content = html.encode(response.charset)
+    return response
@@ -0,0 +1,56 @@
+# inscricoes/services/politica.py
+"""
+PoliticaPrivacidade (logo, imagens e contatos do sistema) sem consulta por requisição.
+
+- politica_atual(): cópia do processo válida por LOCAL_TTL segundos. Vencida,
+  confere a versão no cache compartilhado e, se mudou, relê a linha (do cache
+  ou do banco).
+- Salvar/excluir a política (signals.invalidar_paginas_publicas) troca a
+  versão: este processo relê na hora, os demais em até LOCAL_TTL.
+- Nos templates chega como `politica` pelo context processor
+  inscricoes.context_processors.politica; a view que passa `politica` no
+  contexto continua tendo prioridade.
+"""
+import time
+
+from django.core.cache import cache
+
+from ..models import PoliticaPrivacidade
+
+PREFIXO = "politica:v1"
+VERSAO = f"{PREFIXO}:versao"
+CACHE_TTL = 24 * 60 * 60
+LOCAL_TTL = 30
+
+_local = {"versao": None, "politica": None, "expira": 0.0}
+
+
+def _versao() -> int:
+    versao = cache.get(VERSAO)
+    if versao is None:
+        cache.add(VERSAO, time.time_ns(), None)
+        versao = cache.get(VERSAO)
+    return versao
+
+
+def politica_atual() -> PoliticaPrivacidade | None:
+    """A política em uso (a mesma que alterar_politica edita) ou None se não houver."""
+    agora = time.monotonic()
+    if agora < _local["expira"]:
+        return _local["politica"]
+
+    versao = _versao()
+    if versao != _local["versao"]:
+        chave = f"{PREFIXO}:{versao}"
+        politica = cache.get(chave)
+        if politica is None:
+            politica = PoliticaPrivacidade.objects.order_by("pk").first() or False
+            cache.set(chave, politica, CACHE_TTL)
+        _local.update(versao=versao, politica=politica or None)
+    _local["expira"] = agora + LOCAL_TTL
+    return _local["politica"]
+
+
+def invalidar() -> None:
+    cache.set(VERSAO, time.time_ns(), None)
+    _local.update(versao=None, politica=None, expira=0.0)
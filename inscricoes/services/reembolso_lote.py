@@ -0,0 +1,268 @@
+# inscricoes/services/reembolso_lote.py
+"""
+Execução em lote dos reembolsos de um evento (Reembolso).
+
+1. Cálculo: uma consulta traz os pagamentos confirmados do evento já com a
+   PoliticaReembolso anotada; valor a devolver, negativas (política/prazo) e
+   taxa administrativa saem daí, sem consulta por inscrição.
+   - SOLICITACAO: só inscrições em REEMB_SOL; aplica permite_reembolso,
+     prazo_solicitacao_dias (contado de Reembolso.solicitado_em) e a taxa.
+   - EVENTO_CANCELADO: todos os pagamentos confirmados, valor integral.
+2. Linhas Reembolso PENDENTES gravadas em lote (upsert por pagamento).
+3. Chamadas ao /refunds do MP num pool limitado, com ritmo máximo
+   (por_segundo) e chave de idempotência (pagamento + valor): repetir o
+   lote nunca devolve duas vezes.
+4. Resultado numa passada só: bulk_update dos Reembolsos, UPDATE dos
+   Pagamentos (CANCELADO) e das inscrições + pares (REEMB_APROV / REEMB_NEG),
+   resumo financeiro recalculado e status notificado.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from mercadopago.config import RequestOptions
+
+from ..models import Inscricao, InscricaoStatus, Pagamento, Reembolso
+from .financeiro import CENTAVO, ZERO, recalcular_resumos
+from .mp_sync import mp_client_by_paroquia
+from .pagamento_confirmacao import _com_pares
+from .pagamento_status import notificar_status
+
+logger = logging.getLogger("django")
+
+MAX_WORKERS = 4
+POR_SEGUNDO = 5.0  # ritmo máximo de chamadas ao /refunds
+LOTE = 200
+
+Motivo = Reembolso.Motivo
+StR = Reembolso.Status
+
+
+@dataclass
+class ResultadoReembolsos:
+    pagamentos: int = 0
+    negados: int = 0
+    concluidos: int = 0
+    total_devolvido: Decimal = ZERO
+    erros: list = field(default_factory=list)  # [(pagamento_id, mensagem)]
+
+
+class _Ritmo:
+    """Espaça as chamadas entre as threads: no máximo `por_segundo`."""
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self.proximo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def aguardar(self) -> None:
+        with self.lock:
+            agora = time.monotonic()
+            vez = max(agora, self.proximo)
+            self.proximo = vez + self.intervalo
+        if vez > agora:
+            time.sleep(vez - agora)
+
+
+# ----------------------------------------------------------------------
+# Cálculo (uma consulta)
+# ----------------------------------------------------------------------
+def calcular_reembolsos(evento, motivo=Motivo.SOLICITACAO, *, agora=None) -> list:
+    """
+    [(pagamento, valor, taxa_percentual, negativa)] dos pagamentos a reembolsar.
+    `negativa` é o texto do motivo quando a política não permite (valor = 0).
+    """
+    agora = agora or timezone.now()
+    politica = "inscricao__evento__politica_reembolso__"
+    qs = (Pagamento.objects
+          .filter(inscricao__evento=evento, status=Pagamento.StatusPagamento.CONFIRMADO)
+          .exclude(reembolso__status=StR.CONCLUIDO)
+          .select_related("inscricao__paroquia__mp_config", "reembolso")
+          .annotate(pol_ativa=F(politica + "ativo"),
+                    pol_permite=F(politica + "permite_reembolso"),
+                    pol_prazo=F(politica + "prazo_solicitacao_dias"),
+                    pol_taxa=F(politica + "taxa_administrativa_percent"))
+          .order_by("id"))
+    if motivo == Motivo.SOLICITACAO:
+        qs = qs.filter(inscricao__status=InscricaoStatus.REEMB_SOL)
+
+    saida = []
+    for pag in qs:
+        valor_pago = Decimal(pag.valor or 0)
+        if motivo == Motivo.EVENTO_CANCELADO:
+            saida.append((pag, valor_pago, ZERO, ""))
+            continue
+        if not (pag.pol_ativa and pag.pol_permite):
+            saida.append((pag, ZERO, ZERO, "Evento não aceita reembolso."))
+            continue
+        solicitado_em = getattr(getattr(pag, "reembolso", None), "solicitado_em", None) or agora
+        limite = evento.data_inicio - timedelta(days=pag.pol_prazo or 0)
+        if timezone.localdate(solicitado_em) > limite:
+            saida.append((pag, ZERO, ZERO, f"Solicitado fora do prazo (até {limite:%d/%m/%Y})."))
+            continue
+        taxa = Decimal(pag.pol_taxa or 0)
+        valor = (valor_pago * (Decimal("100") - taxa) / Decimal("100")).quantize(CENTAVO, ROUND_HALF_UP)
+        if valor <= ZERO:
+            saida.append((pag, ZERO, taxa, "Sem valor a devolver pela política."))
+        else:
+            saida.append((pag, valor, taxa, ""))
+    return saida
+
+
+def preparar_reembolsos(evento, motivo, calculados) -> list:
+    """Upsert das linhas Reembolso (PENDENTE ou NEGADO). Retorna as linhas, na ordem de `calculados`."""
+    linhas = [
+        Reembolso(
+            pagamento=pag, evento=evento, motivo=motivo,
+            status=StR.NEGADO if negativa else StR.PENDENTE,
+            valor_pago=pag.valor, taxa_percentual=taxa, valor=valor,
+            ultimo_erro=negativa, atualizado_em=timezone.now(),
+        )
+        for pag, valor, taxa, negativa in calculados
+    ]
+    # MySQL (ON DUPLICATE KEY UPDATE) não aceita alvo do conflito; lá vale a chave única de pagamento
+    alvo = {"unique_fields": ["pagamento"]} if connection.features.supports_update_conflicts_with_target else {}
+    Reembolso.objects.bulk_create(
+        linhas, batch_size=LOTE, update_conflicts=True, **alvo,
+        update_fields=["motivo", "status", "valor_pago", "taxa_percentual", "valor", "ultimo_erro", "atualizado_em"],
+    )
+    por_pagamento = {
+        r.pagamento_id: r
+        for r in Reembolso.objects.filter(pagamento_id__in=[p.pk for p, *_ in calculados])
+    }
+    linhas = []
+    for pag, *_ in calculados:
+        r = por_pagamento[pag.pk]
+        r.pagamento = pag
+        linhas.append(r)
+    return linhas
+
+
+# ----------------------------------------------------------------------
+# MP
+# ----------------------------------------------------------------------
+def _devolver(sdk, r: Reembolso) -> dict:
+    opcoes = RequestOptions(custom_headers={"x-idempotency-key": f"reembolso-{r.pagamento_id}-{r.valor}"})
+    resp = sdk.refund().create(r.pagamento.transacao_id, {"amount": float(r.valor)}, opcoes)
+    dados = resp.get("response") or {}
+    if resp.get("status") not in (200, 201) or not dados.get("id"):
+        raise RuntimeError(dados.get("message") or f"HTTP {resp.get('status')}")
+    return dados
+
+
+# ----------------------------------------------------------------------
+# Gravação (uma passada)
+# ----------------------------------------------------------------------
+def _gravar(evento, concluidos, falhos, negados) -> None:
+    agora = timezone.now()
+    for r in concluidos + falhos:
+        r.atualizado_em = agora
+    with transaction.atomic():
+        Reembolso.objects.bulk_update(
+            concluidos + falhos,
+            ["status", "mp_refund_id", "ultimo_erro", "tentativas", "processado_em", "atualizado_em"],
+            batch_size=LOTE,
+        )
+        pag_ids = [r.pagamento_id for r in concluidos]
+        insc_ok = [r.pagamento.inscricao_id for r in concluidos]
+        insc_neg = [r.pagamento.inscricao_id for r in negados]
+
+        # UPDATE não passa pelo post_save: resumo recalculado abaixo
+        Pagamento.objects.filter(pk__in=pag_ids).update(status=Pagamento.StatusPagamento.CANCELADO)
+        alterados = []
+        if insc_ok:
+            # o par perde o pagamento junto (a confirmação tinha sido espelhada nele)
+            alvo = (Inscricao.objects.filter(_com_pares(insc_ok))
+                    .exclude(status__in={InscricaoStatus.CANCEL_USUARIO, InscricaoStatus.CANCEL_ADMIN}))
+            alterados = list(alvo.values_list("pk", flat=True))
+            Inscricao.objects.filter(pk__in=alterados).update(
+                status=InscricaoStatus.REEMB_APROV,
+                foi_selecionado=False,
+                pagamento_confirmado=False,
+                inscricao_concluida=False,
+            )
+        if insc_neg:
+            # negado: continua inscrito e pago
+            Inscricao.objects.filter(pk__in=insc_neg, status=InscricaoStatus.REEMB_SOL).update(
+                status=InscricaoStatus.REEMB_NEG,
+            )
+        if pag_ids:
+            recalcular_resumos([evento.pk])
+        notificar_status(set(alterados) | set(insc_ok))
+
+
+def reembolsar_evento(evento, motivo=Motivo.SOLICITACAO, *, max_workers=MAX_WORKERS, por_segundo=POR_SEGUNDO,
+                      dry_run=False, progresso=None) -> ResultadoReembolsos:
+    """
+    Calcula e executa os reembolsos do evento.
+    `progresso(feitos, total, reembolso, erro)` é chamado a cada chamada ao MP concluída.
+    """
+    res = ResultadoReembolsos()
+    calculados = calcular_reembolsos(evento, motivo)
+    res.pagamentos = len(calculados)
+    res.negados = sum(1 for *_, negativa in calculados if negativa)
+    if dry_run or not calculados:
+        res.total_devolvido = sum((v for _, v, _, n in calculados if not n), ZERO)
+        return res
+
+    with transaction.atomic():
+        linhas = preparar_reembolsos(evento, motivo, calculados)
+    negados = [r for r in linhas if r.status == StR.NEGADO]
+    a_devolver = [r for r in linhas if r.status != StR.NEGADO]
+
+    sdk = mp_client_by_paroquia(evento.paroquia) if a_devolver else None
+    ritmo = _Ritmo(por_segundo)
+
+    def _executar(r):
+        ritmo.aguardar()
+        return _devolver(sdk, r)
+
+    concluidos, falhos = [], []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futuros = {pool.submit(_executar, r): r for r in a_devolver}
+        for feitos, fut in enumerate(as_completed(futuros), start=1):
+            r, erro = futuros[fut], None
+            r.tentativas += 1
+            try:
+                dados = fut.result()
+                r.status, r.mp_refund_id, r.ultimo_erro = StR.CONCLUIDO, str(dados["id"]), ""
+                r.processado_em = timezone.now()
+                concluidos.append(r)
+                res.total_devolvido += r.valor
+            except Exception as e:
+                erro = str(e)
+                r.status, r.ultimo_erro = StR.ERRO, erro
+                falhos.append(r)
+                res.erros.append((r.pagamento_id, erro))
+                logger.warning("Falha ao reembolsar pagamento %s (%s): %s", r.pagamento_id, r.pagamento.transacao_id, e)
+            if progresso:
+                progresso(feitos, len(a_devolver), r, erro)
+
+    _gravar(evento, concluidos, falhos, negados)
+    res.concluidos = len(concluidos)
+    logger.info("Reembolsos evento %s (%s): %s concluídos, %s negados, %s erros, R$ %s devolvidos",
+                evento.pk, motivo, res.concluidos, res.negados, len(res.erros), res.total_devolvido)
+    return res
+
+
+def solicitar_reembolso(inscricao) -> Reembolso:
+    """
+    Participante pede o reembolso: PAG_CONFIRMADO → REEMB_SOL, registrando
+    o instante (prazo da política). A devolução sai no próximo lote.
+    """
+    with transaction.atomic():
+        inscricao.mudar_status(InscricaoStatus.REEMB_SOL)
+        pag = inscricao.pagamento
+        reembolso, _ = Reembolso.objects.update_or_create(
+            pagamento=pag,
+            defaults={"evento_id": inscricao.evento_id, "motivo": Motivo.SOLICITACAO, "status": StR.PENDENTE,
+                      "valor_pago": pag.valor, "solicitado_em": timezone.now()},
+        )
+    return reembolso
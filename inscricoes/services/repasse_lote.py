@@ -0,0 +1,198 @@
+# inscricoes/services/repasse_lote.py
+"""
+Geração em lote dos PIX de repasse (conta do DONO).
+
+1. Saldo: uma consulta sobre ResumoFinanceiroEvento (eventos encerrados),
+   com o total já pago em repasses vindo de subconsulta agrupada.
+2. Repasses PENDENTES criados/atualizados em lote, numa transação curta.
+3. Cobranças PIX criadas no MP por um pool limitado de threads, FORA de
+   qualquer transação/lock; cada chamada leva uma chave de idempotência
+   (repasse + geração + valor), então repetir o lote não duplica cobranças.
+   Cobrança vencida é descartada e a geração sobe: a chave nova faz o MP
+   emitir outra em vez de devolver a vencida.
+4. Resultado (com o vencimento informado pelo MP) gravado com bulk_update.
+
+Também usado por views.gerar_pix_repasse_evento (um evento só).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from mercadopago.config import RequestOptions
+
+from ..helpers_mp_owner import mp_owner_client
+from ..models import Repasse, ResumoFinanceiroEvento
+from .financeiro import TAXA_SISTEMA_DEFAULT, financeiro_evento
+
+logger = logging.getLogger("django")
+
+MAX_WORKERS = 4
+ZERO = Decimal("0.00")
+# validade padrão do PIX no MP quando a resposta não traz date_of_expiration
+PIX_VALIDADE_PADRAO = timedelta(hours=24)
+
+
+@dataclass
+class ResultadoRepasses:
+    eventos: int = 0
+    criados: int = 0
+    reaproveitados: int = 0
+    gerados: int = 0
+    erros: list = field(default_factory=list)  # [(repasse_id, mensagem)]
+
+
+def saldos_a_repassar(*, eventos=None, encerrados_ate=None, taxa_percentual=TAXA_SISTEMA_DEFAULT) -> list:
+    """
+    [(resumo, fin, saldo)] dos eventos com repasse em aberto.
+    saldo = taxa do sistema sobre a base - repasses já PAGOS do evento.
+    """
+    pagos = (Repasse.objects
+             .filter(evento_id=OuterRef("evento_id"), status=Repasse.Status.PAGO)
+             .values("evento_id")
+             .annotate(total=Sum("valor_repasse"))
+             .values("total"))
+    resumos = (ResumoFinanceiroEvento.objects
+               .filter(qtd_confirmados__gt=0)
+               .select_related("evento", "paroquia")
+               .annotate(ja_pago=Coalesce(Subquery(pagos), Value(ZERO),
+                                          output_field=DecimalField(max_digits=12, decimal_places=2))))
+    if eventos is not None:
+        resumos = resumos.filter(evento__in=eventos)
+    if encerrados_ate is not None:
+        resumos = resumos.filter(evento__data_fim__lt=encerrados_ate)
+
+    saida = []
+    for r in resumos.order_by("paroquia__nome", "evento__data_fim"):
+        fin = financeiro_evento(r, taxa_percentual)
+        saldo = fin["valor_repasse"] - r.ja_pago
+        if saldo > 0:
+            saida.append((r, fin, saldo))
+    return saida
+
+
+def preparar_repasses(saldos) -> tuple:
+    """Cria/atualiza o Repasse PENDENTE de cada evento. Retorna (repasses, criados)."""
+    por_evento = {
+        rep.evento_id: rep
+        for rep in Repasse.objects.select_for_update().filter(
+            status=Repasse.Status.PENDENTE, evento_id__in=[r.evento_id for r, _, _ in saldos],
+        )
+    }
+    novos, alterados, todos = [], [], []
+    for resumo, fin, saldo in saldos:
+        rep = por_evento.get(resumo.evento_id)
+        if rep is None:
+            rep = Repasse(paroquia_id=resumo.paroquia_id, evento_id=resumo.evento_id, status=Repasse.Status.PENDENTE)
+            novos.append(rep)
+        elif (rep.valor_base, rep.taxa_percentual, rep.valor_repasse) != (fin["base_repasse"], fin["taxa_percent"], saldo):
+            alterados.append(rep)
+        rep.valor_base = fin["base_repasse"]
+        rep.taxa_percentual = fin["taxa_percent"]
+        if rep.valor_repasse != saldo:
+            # valor mudou: a cobrança anterior não vale mais
+            rep.descartar_pix()
+        rep.valor_repasse = saldo
+        rep.evento, rep.paroquia = resumo.evento, resumo.paroquia
+        todos.append(rep)
+
+    Repasse.objects.bulk_create(novos, batch_size=200)
+    for rep in alterados:
+        rep.atualizado_em = timezone.now()
+    Repasse.objects.bulk_update(
+        alterados,
+        ["valor_base", "taxa_percentual", "valor_repasse", "transacao_id", "qr_code_text", "qr_code_base64",
+         "pix_expira_em", "geracao_pix", "atualizado_em"],
+        batch_size=200,
+    )
+    return todos, len(novos)
+
+
+def _corpo_pix(rep: Repasse, pagador_email: str, notification_url: str) -> dict:
+    body = {
+        "transaction_amount": float(rep.valor_repasse),
+        "description": f"Repasse taxa sistema – {rep.evento.nome}",
+        "payment_method_id": "pix",
+        "payer": {"email": pagador_email},
+        "external_reference": f"repasse:{rep.paroquia_id}:{rep.evento_id}",
+    }
+    if notification_url:
+        body["notification_url"] = notification_url
+    return body
+
+
+def _criar_pix(sdk, rep: Repasse, pagador_email: str, notification_url: str) -> dict:
+    chave = f"repasse-{rep.pk}-{rep.geracao_pix}-{rep.valor_repasse}"
+    opcoes = RequestOptions(custom_headers={"x-idempotency-key": chave})
+    resp = sdk.payment().create(_corpo_pix(rep, pagador_email, notification_url), opcoes)
+    dados = resp.get("response") or {}
+    if resp.get("status") not in (200, 201) or not dados.get("id"):
+        raise RuntimeError(dados.get("message") or f"HTTP {resp.get('status')}")
+    return dados
+
+
+def _vencimento(dados: dict):
+    vence = parse_datetime(dados.get("date_of_expiration") or "")
+    if vence is None:
+        return timezone.now() + PIX_VALIDADE_PADRAO
+    return timezone.make_aware(vence, dt_timezone.utc) if timezone.is_naive(vence) else vence
+
+
+def gerar_repasses(*, eventos=None, encerrados_ate=None, taxa_percentual=TAXA_SISTEMA_DEFAULT,
+                   pagador_email=None, max_workers=MAX_WORKERS, dry_run=False, progresso=None) -> ResultadoRepasses:
+    """
+    Gera (ou reaproveita) o PIX de repasse de cada evento com saldo.
+    `progresso(feitos, total, repasse, erro)` é chamado a cada cobrança concluída.
+    """
+    res = ResultadoRepasses()
+    saldos = saldos_a_repassar(eventos=eventos, encerrados_ate=encerrados_ate, taxa_percentual=taxa_percentual)
+    res.eventos = len(saldos)
+    if dry_run or not saldos:
+        return res
+
+    sdk, cfg = mp_owner_client()
+    pagador_email = pagador_email or cfg.email_cobranca or "repasse@dominio.local"
+    notification_url = (cfg.notificacao_webhook_url or "").strip()
+
+    with transaction.atomic():
+        repasses, res.criados = preparar_repasses(saldos)
+
+    # cobrança já gerada para o mesmo valor continua valendo até vencer
+    pendentes = [r for r in repasses if not r.pix_reutilizavel()]
+    res.reaproveitados = len(repasses) - len(pendentes)
+    for rep in pendentes:
+        rep.descartar_pix()
+
+    gerados = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futuros = {pool.submit(_criar_pix, sdk, rep, pagador_email, notification_url): rep for rep in pendentes}
+        for feitos, fut in enumerate(as_completed(futuros), start=1):
+            rep, erro = futuros[fut], None
+            try:
+                dados = fut.result()
+                tx = (dados.get("point_of_interaction") or {}).get("transaction_data") or {}
+                rep.transacao_id = str(dados["id"])
+                rep.qr_code_text = tx.get("qr_code")
+                rep.qr_code_base64 = tx.get("qr_code_base64")
+                rep.pix_expira_em = _vencimento(dados)
+                rep.atualizado_em = timezone.now()
+                gerados.append(rep)
+            except Exception as e:
+                erro = str(e)
+                res.erros.append((rep.pk, erro))
+                logger.warning("Falha ao gerar PIX do repasse %s (%s): %s", rep.pk, rep.evento_id, e)
+            if progresso:
+                progresso(feitos, len(pendentes), rep, erro)
+
+    Repasse.objects.bulk_update(
+        gerados, ["transacao_id", "qr_code_text", "qr_code_base64", "pix_expira_em", "geracao_pix", "atualizado_em"],
+        batch_size=200,
+    )
+    res.gerados = len(gerados)
+    return res
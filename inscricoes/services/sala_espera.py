@@ -0,0 +1,245 @@
+# inscricoes/services/sala_espera.py
+"""
+Sala de espera na abertura das inscrições de eventos concorridos.
+
+Com EventoAcampamento.sala_espera_max_ativos > 0 e dentro do período de
+inscrições, as views do fluxo público passam por @controlar_admissao:
+
+- Quem chega tira uma senha (contador no cache), guardada num cookie assinado.
+- As senhas são chamadas em ordem por um balde de fichas: sala_espera_por_minuto,
+  acumulando no máximo RAJADA_SEGUNDOS de fichas. Enquanto houver
+  sala_espera_max_ativos pessoas admitidas, a fila não anda.
+- Admitido: cookie de admissão, renovado a cada requisição e válido por
+  SESSAO_MINUTOS sem atividade. Cada admitido conta num balde por minuto no
+  cache (ativos = soma dos últimos SESSAO_MINUTOS). Enviar a inscrição
+  (liberar) devolve a vaga antes disso.
+- Quem não foi chamado vai para sala_espera.html, que consulta a posição a cada
+  POLL_SEGUNDOS (views.sala_espera_status, só cache) e segue quando chega a vez.
+
+Sem fila formada, quem chega é admitido direto. O custo para o fluxo normal é
+um punhado de leituras de cache. O estado fica só no cache (Redis em produção,
+compartilhado entre os workers).
+"""
+import functools
+import math
+import time
+import uuid
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import EventoAcampamento, Inscricao
+
+SALT = "inscricoes.sala_espera"
+SESSAO_MINUTOS = 20
+RECONTAR_MINUTOS = 5        # admitido ativo muda de balde para continuar contando
+SENHA_HORAS = 6
+RAJADA_SEGUNDOS = 10
+POLL_SEGUNDOS = 5
+CONFIG_TTL = 30
+MAPA_TTL = 60 * 60
+ESTADO_TTL = 24 * 60 * 60
+
+Config = namedtuple("Config", "evento_id slug max_ativos por_minuto")
+Passe = namedtuple("Passe", "admitido minuto senha posicao espera_segundos")
+
+
+def _k(*partes) -> str:
+    return "sala_espera:v1:" + ":".join(str(p) for p in partes)
+
+
+# ----------------------------------------------------------------------
+# Evento → configuração (cache curto; a view não paga consulta por requisição)
+# ----------------------------------------------------------------------
+def config_evento(evento_id) -> Config | None:
+    """Configuração da sala do evento; None quando não há controle (desligado ou fora do período)."""
+    chave = _k("cfg", evento_id)
+    cfg = cache.get(chave)
+    if cfg is None:
+        ev = (EventoAcampamento.objects.filter(pk=evento_id)
+              .values("slug", "sala_espera_max_ativos", "sala_espera_por_minuto",
+                      "inicio_inscricoes", "fim_inscricoes")
+              .first())
+        hoje = timezone.localdate()
+        if ev and ev["sala_espera_max_ativos"] and ev["inicio_inscricoes"] <= hoje <= ev["fim_inscricoes"]:
+            cfg = (ev["slug"], ev["sala_espera_max_ativos"], ev["sala_espera_por_minuto"] or 1)
+        else:
+            cfg = ()
+        cache.set(chave, cfg, CONFIG_TTL)
+    return Config(str(evento_id), *cfg) if cfg else None
+
+
+def invalidar_config(evento_id) -> None:
+    cache.delete(_k("cfg", evento_id))
+
+
+def _mapear(chave: str, consulta):
+    valor = cache.get(chave)
+    if valor is None:
+        valor = consulta() or ""
+        cache.set(chave, valor, MAPA_TTL)
+    return valor or None
+
+
+def evento_id_por_slug(slug: str):
+    return _mapear(_k("slug", slug), lambda: EventoAcampamento.objects.filter(slug=slug)
+                   .values_list("pk", flat=True).first())
+
+
+def _evento_id(request, chave: str, kwargs: dict):
+    if chave == "slug":
+        return evento_id_por_slug(kwargs["slug"])
+    if chave == "inscricao_id":
+        insc = kwargs["inscricao_id"]
+        return _mapear(_k("insc", insc), lambda: Inscricao.objects.filter(pk=insc)
+                       .values_list("evento_id", flat=True).first())
+    valor = kwargs.get(chave) or request.GET.get(chave)
+    try:
+        return uuid.UUID(str(valor)) if valor else None
+    except ValueError:
+        return None
+
+
+# ----------------------------------------------------------------------
+# Fila (senhas, balde de fichas, ativos)
+# ----------------------------------------------------------------------
+def _incr(chave: str, ttl: int) -> int:
+    cache.add(chave, 0, ttl)
+    try:
+        return cache.incr(chave)
+    except ValueError:  # expirou entre o add e o incr
+        cache.set(chave, 1, ttl)
+        return 1
+
+
+def ativos(cfg: Config, agora: float) -> int:
+    minuto = int(agora // 60)
+    chaves = [_k(cfg.evento_id, "ativos", minuto - i) for i in range(SESSAO_MINUTOS)]
+    return sum(cache.get_many(chaves).values())
+
+
+def _contar(cfg: Config, agora: float) -> int:
+    minuto = int(agora // 60)
+    _incr(_k(cfg.evento_id, "ativos", minuto), (SESSAO_MINUTOS + 1) * 60)
+    return minuto
+
+
+def _descontar(cfg: Config, minuto: int) -> None:
+    try:
+        cache.decr(_k(cfg.evento_id, "ativos", minuto))
+    except ValueError:  # balde já expirou
+        pass
+
+
+def _chamar(cfg: Config, agora: float) -> float:
+    """Até que senha a fila já foi chamada (fracionário: as fichas acumulam entre as consultas)."""
+    taxa = cfg.por_minuto / 60
+    chave = _k(cfg.evento_id, "balde")
+    estado = cache.get(chave) or {"ate": 0.0, "t": agora - RAJADA_SEGUNDOS}
+    emitidas = cache.get(_k(cfg.evento_id, "senhas")) or 0
+    vagas = max(cfg.max_ativos - ativos(cfg, agora), 0)
+    ate = min(
+        estado["ate"] + taxa * max(agora - estado["t"], 0),
+        emitidas + taxa * RAJADA_SEGUNDOS,      # balde cheio: fichas guardadas têm limite
+        math.floor(estado["ate"]) + vagas,      # sem vaga, a fila não anda
+    )
+    ate = max(ate, estado["ate"])
+    # escritas concorrentes partem do mesmo estado e chegam ao mesmo valor: não há fichas em dobro
+    cache.set(chave, {"ate": ate, "t": agora}, ESTADO_TTL)
+    return ate
+
+
+# ----------------------------------------------------------------------
+# Cookies / passe
+# ----------------------------------------------------------------------
+def _cookie(cfg: Config, tipo: str) -> str:
+    return f"sala_{tipo}_{cfg.evento_id.replace('-', '')[:12]}"
+
+
+def _ler(request, cfg: Config, tipo: str, max_age: int):
+    valor = request.get_signed_cookie(_cookie(cfg, tipo), default=None, salt=SALT, max_age=max_age)
+    return int(valor) if valor and valor.isdigit() else None
+
+
+def verificar(request, cfg: Config) -> Passe:
+    """Admite (cookie válido ou senha chamada) ou devolve a posição na fila."""
+    agora = time.time()
+    minuto = _ler(request, cfg, "ok", SESSAO_MINUTOS * 60)
+    if minuto is not None:
+        if int(agora // 60) - minuto >= RECONTAR_MINUTOS:
+            _descontar(cfg, minuto)
+            minuto = _contar(cfg, agora)
+        return Passe(True, minuto, None, 0, 0)
+
+    senha = _ler(request, cfg, "senha", SENHA_HORAS * 60 * 60)
+    if senha is None:
+        senha = _incr(_k(cfg.evento_id, "senhas"), ESTADO_TTL)
+    ate = _chamar(cfg, agora)
+    if senha <= ate:
+        return Passe(True, _contar(cfg, agora), None, 0, 0)
+    posicao = senha - math.floor(ate)
+    return Passe(False, None, senha, posicao, math.ceil(posicao * 60 / cfg.por_minuto))
+
+
+def gravar_cookies(response, request, cfg: Config, passe: Passe) -> None:
+    opcoes = {"salt": SALT, "httponly": True, "samesite": "Lax", "secure": request.is_secure()}
+    if passe.admitido:
+        response.set_signed_cookie(_cookie(cfg, "ok"), str(passe.minuto), max_age=SESSAO_MINUTOS * 60, **opcoes)
+        if _cookie(cfg, "senha") in request.COOKIES:
+            response.delete_cookie(_cookie(cfg, "senha"), samesite="Lax")
+    else:
+        response.set_signed_cookie(_cookie(cfg, "senha"), str(passe.senha), max_age=SENHA_HORAS * 60 * 60, **opcoes)
+
+
+def liberar(request, response, evento_id) -> None:
+    """Inscrição enviada: devolve a vaga e encerra a admissão."""
+    cfg = config_evento(evento_id)
+    if cfg is None:
+        return
+    minuto = _ler(request, cfg, "ok", SESSAO_MINUTOS * 60)
+    if minuto is not None:
+        _descontar(cfg, minuto)
+        response.delete_cookie(_cookie(cfg, "ok"), samesite="Lax")
+    request._sala_espera_liberada = True
+
+
+def url_fila(cfg: Config, proxima: str = "") -> str:
+    url = reverse("inscricoes:sala_espera", args=[cfg.slug])
+    return f"{url}?{urlencode({'next': proxima})}" if proxima else url
+
+
+def controlar_admissao(chave: str, *, json: bool = False):
+    """
+    Põe a view atrás da sala de espera do evento. `chave` diz de onde vem o
+    evento: "slug", "inscricao_id" ou "evento_id" (URL ou querystring).
+    Views JSON recebem 429 com a posição em vez do redirecionamento.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            evento_id = _evento_id(request, chave, kwargs)
+            cfg = config_evento(evento_id) if evento_id else None
+            if cfg is None:
+                return view(request, *args, **kwargs)
+
+            passe = verificar(request, cfg)
+            if passe.admitido:
+                response = view(request, *args, **kwargs)
+            elif json:
+                response = JsonResponse(
+                    {"ok": False, "fila": True, "posicao": passe.posicao,
+                     "espera_segundos": passe.espera_segundos, "fila_url": url_fila(cfg)},
+                    status=429, headers={"Retry-After": str(POLL_SEGUNDOS)},
+                )
+            else:
+                response = redirect(url_fila(cfg, request.get_full_path()))
+            if not getattr(request, "_sala_espera_liberada", False):
+                gravar_cookies(response, request, cfg, passe)
+            return response
+        return wrapper
+    return decorator
@@ -12,10 +12,16 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.core.mail import send_mail
 from django.db import transaction
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_delete, pre_save, post_save
 from django.dispatch import receiver
 
-from .models import Paroquia, EventoAcampamento, Ministerio, Grupo, Pagamento
+from .models import (
+    Paroquia, EventoAcampamento, Ministerio, Grupo, Pagamento,
+    MercadoPagoConfig, MercadoPagoOwnerConfig, ResumoFinanceiroEvento,
+)
+from .services import financeiro, miniaturas, mp_clients, paginas_publicas, politica, sala_espera
+from .services.pagamento_confirmacao import aplicar_status_pagamento
+from .services.pagamento_status import notificar_status
 
 logger = logging.getLogger("django")
 User = get_user_model()  # AUTH_USER_MODEL
@@ -210,8 +216,9 @@ def _memorizar_tipo_antigo(sender, instance: EventoAcampamento, **kwargs):
     """
     if instance.pk:
         try:
-            antigo = sender.objects.only("tipo").get(pk=instance.pk)
+            antigo = sender.objects.only("tipo", "slug").get(pk=instance.pk)
             instance._tipo_antigo = antigo.tipo  # atributo transitório
+            instance._slug_antigo = antigo.slug
         except sender.DoesNotExist:
             instance._tipo_antigo = None
     else:
@@ -240,47 +247,117 @@ def criar_catalogos_globais_para_servos(sender, instance: EventoAcampamento, cre
 
 
 # =========================
-# Pagamento confirmado → espelhar na inscrição e no par
+# Pagamento salvo → inscrição e par (services.pagamento_confirmacao)
+# e resumo financeiro do evento (services.financeiro)
 # =========================
-def _get_par(insc):
-    """Acha a inscrição pareada (casais). Tenta property e relações comuns."""
-    for attr in ("par", "inscricao_pareada", "pareada_por"):
-        try:
-            par = getattr(insc, attr, None)
-            if par and par.evento_id == insc.evento_id:
-                return par
-        except Exception:
-            pass
-    return None
+@receiver(post_save, sender=Pagamento)
+def aplicar_pagamento_na_inscricao(sender, instance: Pagamento, created: bool, **kwargs):
+    """
+    Único receiver de Pagamento: confirma/reverte a inscrição e o par numa
+    transação, atualiza o status em cache e avisa as telas de espera.
+    Na mesma transação (Pagamento.save) soma a variação no resumo financeiro do evento.
+    """
+    aplicar_status_pagamento(instance)
+    antes = getattr(instance, "_financeiro_salvo", financeiro.SEM_CONTRIBUICAO if created else None)
+    financeiro.aplicar_variacao(instance.inscricao_id, antes, instance.contribuicao_financeira())
 
 
-@receiver(post_save, sender=Pagamento)
-def espelhar_pagamento_no_par(sender, instance: Pagamento, created, **kwargs):
+@receiver(post_delete, sender=Pagamento)
+def retirar_pagamento_do_resumo(sender, instance: Pagamento, **kwargs):
+    antes = getattr(instance, "_financeiro_salvo", None)
+    financeiro.aplicar_variacao(instance.inscricao_id, antes, financeiro.SEM_CONTRIBUICAO, reconstruir=False)
+
+
+@receiver(post_save, sender=EventoAcampamento)
+def manter_resumo_financeiro_evento(sender, instance: EventoAcampamento, created: bool, **kwargs):
+    """Linha do resumo nasce com o evento; acompanha troca de paróquia."""
+    if created:
+        ResumoFinanceiroEvento.objects.get_or_create(evento=instance, defaults={"paroquia_id": instance.paroquia_id})
+    else:
+        ResumoFinanceiroEvento.objects.filter(evento=instance).exclude(
+            paroquia_id=instance.paroquia_id
+        ).update(paroquia_id=instance.paroquia_id)
+
+
+@receiver(post_save, sender=EventoAcampamento)
+def invalidar_config_sala_espera(sender, instance: EventoAcampamento, **kwargs):
+    """Limites/período da sala de espera alterados valem já, sem esperar o cache."""
+    sala_espera.invalidar_config(instance.pk)
+
+
+# =========================
+# Páginas públicas em cache (services.paginas_publicas): nova versão a cada alteração
+# =========================
+@receiver(post_save, sender=EventoAcampamento)
+@receiver(post_delete, sender=EventoAcampamento)
+def invalidar_paginas_evento(sender, instance: EventoAcampamento, **kwargs):
+    paginas_publicas.invalidar_evento(instance.slug, getattr(instance, "_slug_antigo", None))
+
+
+@receiver(post_save, sender="inscricoes.VideoEventoAcampamento")
+@receiver(post_delete, sender="inscricoes.VideoEventoAcampamento")
+def invalidar_paginas_video(sender, instance, **kwargs):
+    slug = EventoAcampamento.objects.filter(pk=instance.evento_id).values_list("slug", flat=True).first()
+    paginas_publicas.invalidar_evento(slug)
+
+
+@receiver(post_save, sender="inscricoes.PoliticaPrivacidade")
+@receiver(post_delete, sender="inscricoes.PoliticaPrivacidade")
+@receiver(post_save, sender=Paroquia)
+def invalidar_paginas_publicas(sender, **kwargs):
+    """Logo/política e dados da paróquia aparecem em todas as páginas públicas."""
+    paginas_publicas.invalidar_todas()
+
+
+@receiver(post_save, sender="inscricoes.PoliticaPrivacidade")
+@receiver(post_delete, sender="inscricoes.PoliticaPrivacidade")
+def invalidar_politica(sender, **kwargs):
+    politica.invalidar()
+
+
+@receiver(post_save, sender="inscricoes.Inscricao")
+def push_status_inscricao(sender, instance, created, update_fields=None, **kwargs):
     """
-    Se um Pagamento ficar CONFIRMADO, marca pagamento_confirmado=True na inscrição
-    e também na inscrição pareada (se houver).
+    pagamento_confirmado também compõe o status servido às telas de espera.
+    Só avisa quando status/pagamento_confirmado mudam: saves do admin, das
+    fotos e do merge por CPF não geram push (os serviços em lote chamam
+    notificar_status por conta própria).
     """
-    insc = getattr(instance, "inscricao", None)
-    if not insc:
+    if update_fields is not None and not {"status", "pagamento_confirmado"} & set(update_fields):
         return
+    antes = None if created else getattr(instance, "_status_salvo", None)
+    instance._status_salvo = instance.status_publicado()
+    if not created and antes != instance._status_salvo:
+        notificar_status(instance.pk)
 
-    # Só quando confirmado
-    if instance.status != Pagamento.StatusPagamento.CONFIRMADO:
-        return
 
-    Inscricao = _InscricaoModel()  # resolve o modelo aqui
+# =========================
+# Credenciais do MP alteradas → descarta clientes em cache
+# =========================
+@receiver(post_save, sender=MercadoPagoConfig)
+@receiver(post_delete, sender=MercadoPagoConfig)
+def invalidar_cliente_mp_paroquia(sender, instance: MercadoPagoConfig, **kwargs):
+    mp_clients.invalidar(mp_clients.chave_paroquia(instance.paroquia_id))
 
-    # 1) Garante o flag na própria inscrição
-    if not insc.pagamento_confirmado:
-        Inscricao.objects.filter(pk=insc.pk, pagamento_confirmado=False).update(
-            pagamento_confirmado=True,
-            inscricao_concluida=True,   # remova se não usar
-        )
 
-    # 2) Marca o PAR também (se existir)
-    par = _get_par(insc)
-    if par and not par.pagamento_confirmado:
-        Inscricao.objects.filter(pk=par.pk, pagamento_confirmado=False).update(
-            pagamento_confirmado=True,
-            inscricao_concluida=True,   # remova se não usar
-        )
+@receiver(post_save, sender=MercadoPagoOwnerConfig)
+@receiver(post_delete, sender=MercadoPagoOwnerConfig)
+def invalidar_cliente_mp_dono(sender, instance: MercadoPagoOwnerConfig, **kwargs):
+    mp_clients.invalidar(mp_clients.CHAVE_DONO)
+
+
+# =========================
+# Imagens enviadas → miniaturas (services.miniaturas; geradas pelo worker de fotos)
+# =========================
+def agendar_miniaturas(sender, instance, update_fields=None, **kwargs):
+    campo = dict(miniaturas.CAMPOS)[sender._meta.label]
+    if update_fields is not None and campo not in update_fields:
+        return
+    valor = getattr(instance, campo, None)
+    if valor:
+        origem = f"{sender._meta.label}.{campo}"
+        transaction.on_commit(lambda: miniaturas.agendar(valor, origem))
+
+
+for _label, _campo in miniaturas.CAMPOS:
+    post_save.connect(agendar_miniaturas, sender=_label, dispatch_uid=f"miniaturas:{_label}")
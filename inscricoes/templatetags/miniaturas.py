@@ -0,0 +1,36 @@
+# inscricoes/templatetags/miniaturas.py
+from django import template
+from django.utils.html import format_html
+
+from inscricoes.services.miniaturas import url_miniatura, url_original
+
+register = template.Library()
+
+
+@register.filter
+def miniatura(valor, largura=480):
+    """
+    URL da menor miniatura (WebP) com pelo menos `largura` px; sem miniatura, a original.
+    Uso:
+      {% load miniaturas %}
+      <img src="{{ inscricao.participante.foto|miniatura:240 }}">
+    """
+    if not valor:
+        return ""
+    return url_miniatura(valor, largura)
+
+
+@register.simple_tag
+def imagem_miniatura(valor, largura=480, css_class="", alt=""):
+    """
+    <picture> com WebP e JPEG de reserva, na menor miniatura que cobre `largura`.
+    Uso:
+      {% imagem_miniatura evento.banner 960 "w-full h-40 object-cover" alt="Banner" %}
+    """
+    if not valor or not url_original(valor):
+        return ""
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        url_miniatura(valor, largura), url_miniatura(valor, largura, "jpeg"), alt, css_class,
+    )
@@ -2,24 +2,28 @@
 from django import template
 from django.utils.html import format_html
 from inscricoes.models import SiteImage
+from inscricoes.services.miniaturas import url_miniatura
 
 register = template.Library()
 
 @register.simple_tag
-def site_image(key, css_class="", alt=None):
+def site_image(key, css_class="", alt=None, largura=1280):
     """
     Uso:
       {% load site_images %}
       {% site_image "dashboard" "w-full h-56 object-cover rounded" alt="Painel" %}
+    `largura` escolhe a miniatura (services.miniaturas); sem miniatura, vai a original.
     """
     try:
         obj = SiteImage.objects.get(key=key, ativa=True)
     except SiteImage.DoesNotExist:
         return ""
     try:
-        url = obj.imagem.url
+        url = url_miniatura(obj.imagem, largura) if obj.imagem else ""
     except Exception:
         return ""
+    if not url:
+        return ""
     alt_text = alt or obj.alt_text or obj.titulo or key
     return format_html('<img src="{}" alt="{}" class="{}" loading="lazy"/>',
                        url, alt_text, css_class)
@@ -1,3 +1,1417 @@
-from django.test import TestCase
+import importlib
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from cloudinary import CloudinaryResource
+from django.apps import apps as django_apps
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_started
+from django.core.management.base import CommandError
+from django.db import DatabaseError, close_old_connections, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .management.utils import evento_por_slug_ou_id
+from .models import (
+    ArquivoFoto, Comunicado, EventoAcampamento, Inscricao, InscricaoCasais, InscricaoStatus, MiniaturaImagem,
+    MercadoPagoConfig, NotificacaoMercadoPago, Pagamento, Paroquia, Participante,
+    PoliticaPrivacidade, PoliticaReembolso, Reembolso, Repasse, ResumoFinanceiroEvento, User,
+)
+from .services import miniaturas, mp_clients, mp_webhook_inbox, politica
+from .services.financeiro import recalcular_resumos
+from .services.fotos import processar_lote, registrar_foto, vincular_foto
+from .services.importacao_inscricoes import importar_inscricoes
+from .services.mp_reconciliacao import PAGE_LIMIT, conciliar_evento
+from .services.mp_sync import campos_pagamento, taxas_pagamento
+from .services.mp_taxas import preencher_taxas
+from .services.pagamento_expiracao import FOLGA, _destino, _gravar, pendentes_vencidos
+from .services.pagamento_status import atualizar_cache, estado_em_cache, notificar_status
+from .services.reembolso_lote import calcular_reembolsos, preparar_reembolsos, reembolsar_evento
+from .services.repasse_lote import gerar_repasses
+from .utils.benchmark_pagamentos import _Medidor, comparar, resumo_amostras
+from .utils.mp_simulador import ConfigSimulador, EstadoSimulador, SimuladorMP
+
+
+def _participante(n: int) -> Participante:
+    return Participante.objects.create(
+        nome=f"Participante {n}", cpf=f"000.000.000-{n:02d}", telefone="+5563999990000",
+        email=f"p{n}@example.com", CEP="77000-000", endereco="Rua A", numero="1",
+        bairro="Centro", cidade="Palmas", estado="TO",
+    )
+
+
+def _evento(**kw) -> EventoAcampamento:
+    """Evento com inscrições abertas hoje e início daqui a 30 dias; `kw` sobrescreve os campos."""
+    hoje = date.today()
+    dados = {
+        "nome": "Acampamento Sênior", "tipo": "senior",
+        "data_inicio": hoje + timedelta(days=30), "data_fim": hoje + timedelta(days=32),
+        "inicio_inscricoes": hoje, "fim_inscricoes": hoje + timedelta(days=20),
+        "valor_inscricao": Decimal("150.00"),
+    }
+    dados.update(kw)
+    if dados.get("paroquia") is None:
+        dados["paroquia"] = Paroquia.objects.create(nome="Paróquia Teste")
+    return EventoAcampamento.objects.create(**dados)
+
+
+class ConfirmacaoPagamentoTests(TestCase):
+    """services.pagamento_confirmacao: Pagamento → Inscrição → par, com orçamento de queries."""
+
+    # SAVEPOINT (Pagamento.save) + SELECT ... FOR UPDATE do Pagamento + UPDATE do Pagamento
+    # + SAVEPOINT + SELECT ... FOR UPDATE (inscrição + par) + UPDATE + RELEASE
+    # + SELECT do evento + UPDATE do resumo financeiro + RELEASE
+    ORCAMENTO_CONFIRMACAO = 10
+    # SAVEPOINT + SELECT ... FOR UPDATE + UPDATE do Pagamento + UPDATE da inscrição
+    # + SELECT do evento + UPDATE do resumo + RELEASE
+    ORCAMENTO_REVERSAO = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento(nome="Encontro de Casais", tipo="casais")
+        cls.paroquia = cls.evento.paroquia
+
+    def setUp(self):
+        self.ele = Inscricao.objects.create(
+            participante=_participante(1), evento=self.evento, paroquia=self.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        self.ela = Inscricao.objects.create(
+            participante=_participante(2), evento=self.evento, paroquia=self.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        Inscricao.objects.filter(pk=self.ele.pk).update(inscricao_pareada=self.ela)
+        self.pagamento = Pagamento.objects.create(
+            inscricao=self.ele, valor=Decimal("150.00"), status=Pagamento.StatusPagamento.PENDENTE,
+        )
+
+    def _confirmar(self):
+        self.pagamento.status = Pagamento.StatusPagamento.CONFIRMADO
+        self.pagamento.save()
+
+    def test_confirmacao_propaga_para_o_par_dentro_do_orcamento(self):
+        with self.assertNumQueries(self.ORCAMENTO_CONFIRMACAO):
+            self._confirmar()
+
+        for ins in (self.ele, self.ela):
+            ins.refresh_from_db()
+            self.assertEqual(ins.status, InscricaoStatus.PAG_CONFIRMADO)
+            self.assertTrue(ins.pagamento_confirmado)
+            self.assertTrue(ins.inscricao_concluida)
+
+    def test_par_no_sentido_inverso_do_vinculo(self):
+        Pagamento.objects.filter(pk=self.pagamento.pk).delete()
+        pagamento_dela = Pagamento.objects.create(
+            inscricao=self.ela, valor=Decimal("150.00"), status=Pagamento.StatusPagamento.PENDENTE,
+        )
+        pagamento_dela.status = Pagamento.StatusPagamento.CONFIRMADO
+        with self.assertNumQueries(self.ORCAMENTO_CONFIRMACAO):
+            pagamento_dela.save()
+
+        self.ele.refresh_from_db()
+        self.assertEqual(self.ele.status, InscricaoStatus.PAG_CONFIRMADO)
+
+    def test_reversao_so_afeta_a_propria_inscricao(self):
+        self._confirmar()
+        self.pagamento.status = Pagamento.StatusPagamento.CANCELADO
+        with self.assertNumQueries(self.ORCAMENTO_REVERSAO):
+            self.pagamento.save()
+
+        self.ele.refresh_from_db()
+        self.ela.refresh_from_db()
+        self.assertEqual(self.ele.status, InscricaoStatus.PAG_PENDENTE)
+        self.assertFalse(self.ele.pagamento_confirmado)
+        self.assertEqual(self.ela.status, InscricaoStatus.PAG_CONFIRMADO)
+
+    def test_nao_mexe_em_inscricao_em_reembolso(self):
+        Inscricao.objects.filter(pk=self.ele.pk).update(status=InscricaoStatus.REEMB_SOL)
+        self._confirmar()
+
+        self.ele.refresh_from_db()
+        self.assertEqual(self.ele.status, InscricaoStatus.REEMB_SOL)
+
+    def test_resumo_financeiro_acompanha_o_pagamento(self):
+        self.pagamento.fee_mp = Decimal("5.00")
+        self._confirmar()
+        resumo = ResumoFinanceiroEvento.objects.get(evento=self.evento)
+        self.assertEqual((resumo.qtd_confirmados, resumo.bruto, resumo.taxas_mp, resumo.liquido),
+                         (1, Decimal("150.00"), Decimal("5.00"), Decimal("145.00")))
+
+        self.pagamento.status = Pagamento.StatusPagamento.CANCELADO
+        self.pagamento.save()
+        resumo.refresh_from_db()
+        self.assertEqual((resumo.qtd_confirmados, resumo.bruto), (0, Decimal("0.00")))
+
+    def test_variacao_atualiza_a_linha_sem_subconsulta_com_limit(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._confirmar()
+        updates = [q["sql"] for q in ctx.captured_queries
+                   if q["sql"].startswith('UPDATE "inscricoes_resumofinanceiroevento"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("LIMIT", updates[0])  # MySQL: LIMIT dentro de IN dá erro 1235
+        self.assertEqual(ResumoFinanceiroEvento.objects.get(evento=self.evento).qtd_confirmados, 1)
+
+    def test_confirmacao_concorrente_nao_soma_duas_vezes(self):
+        outro_processo = Pagamento.objects.get(pk=self.pagamento.pk)  # também leu "pendente"
+        self._confirmar()
+        outro_processo.status = Pagamento.StatusPagamento.CONFIRMADO
+        outro_processo.save()
+        resumo = ResumoFinanceiroEvento.objects.get(evento=self.evento)
+        self.assertEqual((resumo.qtd_confirmados, resumo.bruto), (1, Decimal("150.00")))
+
+    def test_recalculo_bate_com_o_incremental(self):
+        self._confirmar()
+        incremental = ResumoFinanceiroEvento.objects.get(evento=self.evento)
+        ResumoFinanceiroEvento.objects.all().delete()
+        recalcular_resumos()
+        recalculado = ResumoFinanceiroEvento.objects.get(evento=self.evento)
+        self.assertEqual((recalculado.qtd_confirmados, recalculado.bruto, recalculado.liquido),
+                         (incremental.qtd_confirmados, incremental.bruto, incremental.liquido))
+
+    def test_recalculo_sobrescreve_linha_existente(self):
+        self._confirmar()
+        ResumoFinanceiroEvento.objects.filter(evento=self.evento).update(qtd_confirmados=99)
+        recalcular_resumos([self.evento.pk])
+        self.assertEqual(ResumoFinanceiroEvento.objects.get(evento=self.evento).qtd_confirmados, 1)
+
+    def test_recalculo_sem_alvo_de_conflito_no_mysql(self):
+        with mock.patch.object(connection.features, "supports_update_conflicts_with_target", False), \
+                mock.patch.object(ResumoFinanceiroEvento.objects, "bulk_create") as bulk:
+            recalcular_resumos([self.evento.pk])
+        self.assertTrue(bulk.call_args.kwargs["update_conflicts"])
+        self.assertNotIn("unique_fields", bulk.call_args.kwargs)
+
+    def test_pendente_vencido_so_sem_cobranca_valida(self):
+        agora = timezone.now()
+        Pagamento.objects.filter(pk=self.pagamento.pk).update(
+            pix_expira_em=agora - timedelta(hours=1), mp_preference_expira_em=agora + timedelta(hours=1),
+        )
+        outro = Pagamento.objects.create(
+            inscricao=self.ela, valor=Decimal("150.00"), pix_expira_em=agora - timedelta(hours=1),
+        )
+        with self.assertNumQueries(1):
+            vencidos = list(pendentes_vencidos(agora))
+        self.assertEqual(vencidos, [outro])  # o do par ainda tem preferência válida
+
+
+class ExpiracaoPendentesTests(TestCase):
+    """services.pagamento_expiracao: só cancela o que o MP não aceita mais e o que ainda está pendente."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+
+    def setUp(self):
+        self.agora = timezone.now()
+        self.corte = self.agora - FOLGA
+        inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=self.evento, paroquia=self.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        self.pagamento = Pagamento.objects.create(
+            inscricao=inscricao, valor=Decimal("150.00"), transacao_id="777",
+            pix_expira_em=self.agora - timedelta(hours=1),
+        )
+
+    def _boleto(self, vence_em):
+        return {"id": 777, "status": "pending", "payment_method_id": "bolbradesco",
+                "transaction_amount": 150, "date_of_expiration": vence_em.isoformat()}
+
+    def test_boleto_dentro_do_prazo_continua_pendente(self):
+        self.assertIsNone(_destino(self.pagamento, self._boleto(self.agora + timedelta(days=2)), self.corte))
+        vencido = _destino(self.pagamento, self._boleto(self.agora - timedelta(days=1)), self.corte)
+        self.assertEqual(vencido["status"], Pagamento.StatusPagamento.CANCELADO)
+
+    def test_sem_pagamento_no_mp_cancela_e_aprovado_confirma(self):
+        self.assertEqual(_destino(self.pagamento, None, self.corte), {"status": Pagamento.StatusPagamento.CANCELADO})
+        aprovado = _destino(self.pagamento, {"id": 777, "status": "approved", "transaction_amount": 150}, self.corte)
+        self.assertEqual(aprovado["status"], Pagamento.StatusPagamento.CONFIRMADO)
+
+    def test_confirmado_pelo_webhook_nao_e_cancelado(self):
+        # o webhook confirma enquanto a varredura conferia no MP (self.pagamento ficou com "pendente")
+        Pagamento.objects.filter(pk=self.pagamento.pk).update(
+            status=Pagamento.StatusPagamento.CONFIRMADO,
+        )
+        self.assertEqual(_gravar({self.pagamento: {"status": Pagamento.StatusPagamento.CANCELADO}}), (0, 0))
+        self.pagamento.refresh_from_db()
+        self.assertEqual(self.pagamento.status, Pagamento.StatusPagamento.CONFIRMADO)
+
+
+class CircuitoMercadoPagoTests(SimpleTestCase):
+    """services.mp_clients: circuit breaker e retries do HttpClientPersistente."""
+
+    URL = "https://api.mercadopago.com/v1/payments/123"
+
+    def setUp(self):
+        mp_clients.reiniciar_circuitos()
+        self.addCleanup(mp_clients.reiniciar_circuitos)
+        self.cliente = mp_clients.HttpClientPersistente()
+        self.addCleanup(self.cliente.close)
+
+    def _respostas(self, *status):
+        return [mock.Mock(status_code=s, content=b"{}", json=lambda: {}) for s in status]
+
+    def test_circuito_abre_e_recusa_sem_ir_a_rede(self):
+        falhas = self._respostas(*[500] * mp_clients.FALHAS_PARA_ABRIR)
+        with mock.patch.object(self.cliente.session, "request", side_effect=falhas) as req:
+            for _ in falhas:
+                self.assertEqual(self.cliente.request("POST", "https://api.mercadopago.com/v1/payments")["status"], 500)
+            with self.assertRaises(mp_clients.MPIndisponivel):
+                self.cliente.request("POST", "https://api.mercadopago.com/v1/payments")
+        self.assertEqual(req.call_count, mp_clients.FALHAS_PARA_ABRIR)
+        self.assertFalse(mp_clients.disponivel("POST /v1/payments"))
+        self.assertTrue(mp_clients.disponivel("GET /v1/payments/:id"))
+
+    def test_get_retenta_dentro_do_orcamento(self):
+        with mock.patch("inscricoes.services.mp_clients.time.sleep"), \
+                mock.patch.object(self.cliente.session, "request", side_effect=self._respostas(503, 200)) as req:
+            resp = self.cliente.request("GET", self.URL)
+        self.assertEqual(resp["status"], 200)
+        self.assertEqual(req.call_count, 2)
+        self.assertEqual(req.call_args.kwargs["timeout"], mp_clients.TIMEOUTS["GET /v1/payments/:id"])
+        self.assertEqual(mp_clients.estatisticas()["retries"]["feitos"], 1)
+
+    def test_meio_aberto_fecha_com_sucesso(self):
+        falhas = self._respostas(*[502] * mp_clients.FALHAS_PARA_ABRIR)
+        with mock.patch.object(self.cliente.session, "request", side_effect=falhas):
+            for _ in falhas:
+                self.cliente.request("POST", "https://api.mercadopago.com/v1/payments")
+        circuito = mp_clients._circuitos["POST /v1/payments"]
+        circuito.aberto_ate = 0  # janela vencida
+        with mock.patch.object(self.cliente.session, "request", side_effect=self._respostas(201)):
+            self.assertEqual(self.cliente.request("POST", "https://api.mercadopago.com/v1/payments")["status"], 201)
+        self.assertEqual(mp_clients.estatisticas()["circuitos"]["POST /v1/payments"]["estado"], "fechado")
+
+
+class RegistroClientesMercadoPagoTests(TestCase):
+    """services.mp_clients: um SDK por paróquia/token, invalidado quando a configuração muda."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.paroquia = Paroquia.objects.create(nome="Paróquia Teste")
+
+    def setUp(self):
+        mp_clients.limpar()
+        self.addCleanup(mp_clients.limpar)
+
+    def _contadores(self):
+        stats = mp_clients.estatisticas()
+        return {k: stats[k] for k in ("hits", "misses", "invalidacoes", "clientes")}
+
+    def test_mesmo_token_reaproveita_o_cliente(self):
+        antes = self._contadores()
+        sdk = mp_clients.cliente_paroquia(self.paroquia.pk, "TEST-a")
+        self.assertIs(mp_clients.cliente_paroquia(self.paroquia.pk, " TEST-a "), sdk)
+        self.assertIsNot(mp_clients.cliente_dono("TEST-a"), sdk)
+
+        depois = self._contadores()
+        self.assertEqual((depois["hits"] - antes["hits"], depois["misses"] - antes["misses"]), (1, 2))
+        self.assertEqual(depois["clientes"], 2)
+
+    def test_token_novo_troca_o_cliente_e_fecha_o_antigo(self):
+        antigo = mp_clients.cliente_paroquia(self.paroquia.pk, "TEST-a")
+        with mock.patch.object(antigo.http_client, "close") as fechar:
+            novo = mp_clients.cliente_paroquia(self.paroquia.pk, "TEST-b")
+        self.assertIsNot(novo, antigo)
+        fechar.assert_called_once()
+        self.assertIs(mp_clients.cliente_paroquia(self.paroquia.pk, "TEST-b"), novo)
+
+    def test_salvar_configuracao_invalida_o_cliente(self):
+        cfg = MercadoPagoConfig.objects.create(paroquia=self.paroquia, access_token="TEST-a", public_key="pk")
+        sdk = mp_clients.cliente_paroquia(self.paroquia.pk, cfg.access_token)
+        antes = self._contadores()
+
+        cfg.public_key = "pk-2"
+        cfg.save()
+        depois = self._contadores()
+        self.assertEqual((depois["invalidacoes"] - antes["invalidacoes"], depois["clientes"]), (1, 0))
+        self.assertIsNot(mp_clients.cliente_paroquia(self.paroquia.pk, cfg.access_token), sdk)
+
+
+class CpfParticipanteTests(TestCase):
+    """Participante.cpf_digitos + objects.por_cpf: qualquer formato, uma busca no índice."""
+
+    def test_busca_com_e_sem_mascara(self):
+        p = _participante(7)  # "000.000.000-07"
+        self.assertEqual(p.cpf_digitos, "00000000007")
+        with self.assertNumQueries(1):
+            self.assertEqual(Participante.objects.por_cpf("00000000007").get(), p)
+        self.assertEqual(Participante.objects.por_cpf(" 000.000.000-07 ").first(), p)
+        self.assertFalse(Participante.objects.por_cpf("").exists())
+
+    def test_mesmo_cpf_em_outro_formato_nao_valida(self):
+        _participante(8)
+        outro = Participante(nome="Outro", cpf="00000000008", telefone="+5563999990000",
+                             email="o@example.com", CEP="77000-000", endereco="Rua A", numero="1",
+                             bairro="Centro", cidade="Palmas", estado="TO")
+        with self.assertRaises(ValidationError):
+            outro.full_clean()
+
+    def test_cpf_fora_do_padrao_fica_sem_indice(self):
+        p = _participante(9)
+        Participante.objects.filter(pk=p.pk).update(cpf="1234567890123")
+        p.refresh_from_db()
+        p.save()
+        self.assertIsNone(Participante.objects.get(pk=p.pk).cpf_digitos)
+        self.assertFalse(Participante.objects.por_cpf("1234567890123").exists())
+
+    def test_backfill_da_migracao_ignora_cpf_fora_do_padrao(self):
+        migracao = importlib.import_module("inscricoes.migrations.0012_participante_cpf_digitos")
+        longo, normal = _participante(10), _participante(11)
+        Participante.objects.filter(pk=longo.pk).update(cpf="1234567890123", cpf_digitos=None)
+        Participante.objects.filter(pk=normal.pk).update(cpf_digitos=None)
+
+        migracao.unificar_por_cpf(django_apps, None)
+        digitos = Participante.objects.filter(pk__in=[longo.pk, normal.pk]).values_list("pk", "cpf_digitos")
+        self.assertEqual(dict(digitos), {longo.pk: None, normal.pk: "00000000011"})
+
+
+class ApiInscricaoTests(TestCase):
+    """views.api_inscricao: todas as etapas numa requisição, numa transação."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        cls.url = reverse("inscricoes:api_inscricao", args=[cls.evento.slug])
+
+    def _dados(self, **extra):
+        dados = {
+            "participante": {"nome": "maria silva", "cpf": "123.456.789-09",
+                             "telefone": "63999990000", "email": "maria@example.com"},
+            "endereco": {"CEP": "77000-000", "endereco": "rua a", "numero": "1", "bairro": "centro",
+                         "cidade": "palmas", "estado": "TO"},
+            "personalizado": {"data_nascimento": "2000-01-01", "tamanho_camisa": "M"},
+            "contato": {"responsavel_1_nome": "joão", "responsavel_1_telefone": "63999990001",
+                        "responsavel_1_grau_parentesco": "pai", "contato_emergencia_nome": "ana",
+                        "contato_emergencia_telefone": "63999990002",
+                        "contato_emergencia_grau_parentesco": "mae"},
+            "saude": {"altura": "1.70", "peso": "60", "pressao_alta": "nao", "diabetes": "nao",
+                      "problema_saude": "nao", "medicamento_controlado": "nao", "mobilidade_reduzida": "nao",
+                      "alergia_alimento": "nao", "alergia_medicamento": "nao", "tipo_sanguineo": "NS"},
+            "consentimento_envio": True,
+        }
+        dados.update(extra)
+        return dados
+
+    def _foto(self):
+        buf = BytesIO()
+        Image.new("RGB", (4, 4)).save(buf, "PNG")
+        return SimpleUploadedFile("foto.png", buf.getvalue(), content_type="image/png")
+
+    def test_erros_por_etapa_sem_gravar_nada(self):
+        dados = self._dados(consentimento_envio=False)
+        dados["contato"].pop("contato_emergencia_nome")
+        resp = self.client.post(self.url, json.dumps(dados), content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        erros = resp.json()["erros"]
+        self.assertIn("contato_emergencia_nome", erros["contato"])
+        self.assertIn("foto", erros["saude"])
+        self.assertIn("__all__", erros["saude"])
+        self.assertFalse(Participante.objects.exists())
+
+    def test_inscricao_completa_numa_requisicao(self):
+        with mock.patch("cloudinary.models.uploader.upload_resource",
+                        return_value=CloudinaryResource("participantes/foto")):
+            resp = self.client.post(self.url, {"dados": json.dumps(self._dados()), "saude-foto": self._foto()})
+        self.assertEqual(resp.status_code, 201, resp.content)
+
+        insc = Inscricao.objects.select_related("participante", "inscricaosenior").get(pk=resp.json()["inscricao_id"])
+        self.assertTrue(insc.inscricao_enviada)
+        self.assertEqual(insc.participante.cpf_digitos, "12345678909")
+        self.assertEqual((insc.participante.cidade, insc.contato_emergencia_nome), ("Palmas", "Ana"))
+        self.assertEqual(insc.inscricaosenior.altura, 1.70)
+        self.assertEqual(resp.json()["next_url"], reverse("inscricoes:ver_inscricao", args=[insc.pk]))
+
+
+class ImportacaoInscricoesTests(TestCase):
+    """services.importacao_inscricoes: upsert em lote com relatório de erros por linha."""
+
+    CSV = (
+        "Nome;CPF;Celular;UF;Data de Nascimento;Batizado;Contato Nome;Contato Telefone;Contato Parentesco\n"
+        "ana souza;123.456.789-09;63999990000;to;04/03/1985;Sim;joão;63988887777;Pai\n"
+        "bia;98765432100;63999990001;TO;1990-02-01;;;;\n"
+        "sem cpf;;;;01/01/2000;;;;\n"
+        "data ruim;11122233344;;XX;01/01/2000;talvez;;;\n"
+        "ana de novo;12345678909;;;31/12/1985;;;;\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+
+    def _importar(self, texto=None, **kw):
+        arquivo = SimpleUploadedFile("campistas.csv", (texto or self.CSV).encode("utf-8"))
+        return importar_inscricoes(self.evento, arquivo, **kw)
+
+    def test_upsert_e_erros_por_linha(self):
+        existente = _participante(9)
+        res = self._importar(self.CSV.replace("98765432100", existente.cpf))
+        self.assertEqual([(e.linha, e.coluna) for e in res.erros], [(2, "cpf"), (4, "cpf"), (5, "estado")])
+        self.assertEqual((res.inscricoes_novas, res.participantes_novos), (2, 1))
+
+        ana = Participante.objects.por_cpf("12345678909").get()
+        self.assertEqual(ana.nome, "Ana De Novo")  # a última linha com o CPF prevalece
+        insc = Inscricao.objects.select_related("inscricaosenior").get(participante=ana, evento=self.evento)
+        self.assertEqual(insc.inscricaosenior.data_nascimento, date(1985, 12, 31))
+        existente.refresh_from_db()
+        self.assertEqual((existente.nome, existente.cidade), ("Bia", "Palmas"))  # vazio não apaga
+
+        res = self._importar()
+        self.assertEqual((res.inscricoes_novas, res.inscricoes_atualizadas), (1, 1))  # bia nova, ana de novo
+        self.assertEqual(Inscricao.objects.filter(evento=self.evento).count(), 3)
+
+    def test_contato_e_dry_run(self):
+        res = self._importar(dry_run=True)
+        self.assertEqual(len(res.erros), 3)
+        self.assertFalse(Participante.objects.exists())
+
+        self._importar(self.CSV.replace("ana de novo;12345678909", "ana de novo;12345678910"))
+        insc = Inscricao.objects.get(participante__cpf_digitos="12345678909")
+        self.assertEqual(list(insc.contatos.values_list("nome", "grau_parentesco")), [("João", "pai")])
+        self.assertEqual((insc.contato_emergencia_nome, insc.inscricaosenior.batizado), ("João", "sim"))
+
+
+class FotosCasaisTests(TestCase):
+    """services.fotos: um arquivo por conteúdo, processado pelo worker e aplicado às duas inscrições."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento(nome="Encontro de Casais", tipo="casais")
+        cls.paroquia = cls.evento.paroquia
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.inscricoes = []
+        for n in (1, 2):
+            insc = Inscricao.objects.create(participante=_participante(n), evento=self.evento, paroquia=self.paroquia)
+            InscricaoCasais.objects.create(inscricao=insc, paroquia=self.paroquia, data_nascimento=date(1990, 1, n))
+            self.inscricoes.append(insc)
+
+    def _foto(self, cor="red"):
+        buf = BytesIO()
+        Image.new("RGB", (2400, 1200), cor).save(buf, "PNG")
+        return SimpleUploadedFile("casal.png", buf.getvalue(), content_type="image/png")
+
+    def test_mesmo_conteudo_um_arquivo(self):
+        foto = registrar_foto(self._foto())
+        self.assertEqual(registrar_foto(self._foto()).pk, foto.pk)
+        self.assertNotEqual(registrar_foto(self._foto("blue")).pk, foto.pk)
+        self.assertEqual(ArquivoFoto.objects.count(), 2)
+
+    def test_worker_aplica_nos_quatro_lugares(self):
+        foto = registrar_foto(self._foto())
+        vincular_foto(foto, self.inscricoes)
+        self.assertFalse(InscricaoCasais.objects.exclude(foto_casal="").exclude(foto_casal=None).exists())
+
+        with mock.patch("inscricoes.services.fotos.uploader.upload_resource",
+                        return_value=CloudinaryResource("fotos/abc", version=1, format="jpg",
+                                                        type="upload", resource_type="image")) as upload:
+            self.assertEqual(processar_lote(), 1)
+        upload.assert_called_once()
+
+        foto.refresh_from_db()
+        self.assertEqual(foto.status, ArquivoFoto.Status.PRONTA)
+        self.assertFalse(foto.original)
+        with foto.imagem.open("rb") as fh, Image.open(fh) as img:
+            self.assertEqual(img.size, (1600, 800))
+        casais = set(InscricaoCasais.objects.filter(inscricao__in=self.inscricoes).values_list("foto_casal", flat=True))
+        self.assertEqual(casais, {foto.imagem.name})
+        fotos = {p.foto.get_prep_value() for p in Participante.objects.filter(inscricao__in=self.inscricoes)}
+        self.assertEqual(fotos, {foto.cloudinary_ref})
+        # miniaturas dos dois campos saem dos mesmos bytes, sem baixar do Cloudinary
+        self.assertEqual(
+            set(MiniaturaImagem.objects.filter(status=MiniaturaImagem.Status.PRONTA).values_list("fonte", flat=True)),
+            {foto.imagem.name, foto.cloudinary_ref},
+        )
+
+        # reenvio do mesmo arquivo depois de pronto: aplica na hora, sem passar pelo worker
+        outra = Inscricao.objects.create(participante=_participante(3), evento=self.evento, paroquia=self.paroquia)
+        InscricaoCasais.objects.create(inscricao=outra, paroquia=self.paroquia, data_nascimento=date(1990, 1, 3))
+        vincular_foto(registrar_foto(self._foto()), [outra])
+        self.assertEqual(InscricaoCasais.objects.get(inscricao=outra).foto_casal.name, foto.imagem.name)
+
+
+class MiniaturasTests(TestCase):
+    """services.miniaturas: agendadas no upload, geradas pelo worker, escolhidas pela largura."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.paroquia = Paroquia.objects.create(nome="Paróquia Teste")
+        cache.clear()
+
+    def _png(self, largura, altura):
+        buf = BytesIO()
+        Image.new("RGB", (largura, altura), "green").save(buf, "PNG")
+        return SimpleUploadedFile("capa.png", buf.getvalue(), content_type="image/png")
+
+    def test_larguras_limitadas_pela_original(self):
+        dados = self._png(300, 150).read()
+        saida = miniaturas.renderizar(dados)
+        self.assertEqual(sorted(saida), [96, 240, 300])
+        with Image.open(BytesIO(saida[96]["webp"])) as img:
+            self.assertEqual((img.format, img.size), ("WEBP", (96, 48)))
+
+    def test_upload_agenda_e_template_escolhe_a_menor_que_cobre(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            c = Comunicado.objects.create(paroquia=self.paroquia, titulo="Aviso", texto="...",
+                                          capa=self._png(2000, 1000))
+        self.assertEqual(miniaturas.url_miniatura(c.capa, 200), c.capa.url)  # pendente: a original
+
+        self.assertEqual(miniaturas.processar_lote(), 1)
+        m = MiniaturaImagem.objects.get(fonte=c.capa.name)
+        self.assertEqual(sorted(m.arquivos, key=int), ["96", "240", "480", "960", "1600"])
+        self.assertTrue(miniaturas.url_miniatura(c.capa, 200).endswith("/240.webp"))
+        self.assertTrue(miniaturas.url_miniatura(c.capa, 5000, "jpeg").endswith("/1600.jpeg"))
+
+        # salvar de novo sem trocar a imagem não reagenda
+        with self.captureOnCommitCallbacks(execute=True):
+            c.save()
+        self.assertEqual(MiniaturaImagem.objects.count(), 1)
+        self.assertEqual(miniaturas.processar_lote(), 0)
+
+
+class SalaEsperaTests(TestCase):
+    """services.sala_espera: senhas chamadas pelo balde de fichas, limitadas pelos admitidos ativos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento(sala_espera_max_ativos=2, sala_espera_por_minuto=6)  # 1 ficha a cada 10s
+        cls.url = reverse("inscricoes:inscricao_inicial", args=[cls.evento.slug])
+        cls.status_url = reverse("inscricoes:sala_espera_status", args=[cls.evento.slug])
+
+    def setUp(self):
+        cache.clear()
+        relogio = mock.patch("inscricoes.services.sala_espera.time")
+        self.relogio = relogio.start()
+        self.addCleanup(relogio.stop)
+        self.agora = 1_000_000.0
+
+    def _passar(self, segundos):
+        self.agora += segundos
+        self.relogio.time.return_value = self.agora
+
+    def test_fila_anda_pelo_balde_e_para_sem_vaga(self):
+        self._passar(0)
+        ana, bia, caio = self.client_class(), self.client_class(), self.client_class()
+
+        self.assertEqual(ana.get(self.url).status_code, 200)
+        resp = bia.get(self.url)
+        self.assertRedirects(resp, reverse("inscricoes:sala_espera", args=[self.evento.slug]) + f"?next={self.url}",
+                             fetch_redirect_response=False)
+        self.assertContains(bia.get(resp["Location"]), 'id="posicao">1<')
+        self.assertEqual(bia.get(self.status_url).json()["posicao"], 1)
+
+        self._passar(10)
+        self.assertTrue(bia.get(self.status_url).json()["admitido"])
+        self.assertEqual(bia.get(self.url).status_code, 200)  # cookie de admissão
+
+        # duas admitidas = limite: mesmo com fichas acumuladas, a fila não anda
+        self._passar(60)
+        self.assertEqual(caio.get(self.url).status_code, 302)
+        self.assertFalse(caio.get(self.status_url).json()["admitido"])
+
+        # sem atividade, as admissões expiram e a vez chega
+        self._passar(21 * 60)
+        self.assertTrue(caio.get(self.status_url).json()["admitido"])
+
+    def test_json_recebe_429_e_evento_sem_limite_passa_direto(self):
+        self._passar(0)
+        api = reverse("inscricoes:api_inscricao", args=[self.evento.slug])
+        self.client_class().get(self.url)
+        resp = self.client.post(api, "{}", content_type="application/json")
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.json()["posicao"], 1)
+
+        EventoAcampamento.objects.filter(pk=self.evento.pk).update(sala_espera_max_ativos=0)
+        self.evento.refresh_from_db()
+        self.evento.save()  # o receiver descarta a configuração em cache
+        self.assertEqual(self.client.post(api, "{}", content_type="application/json").status_code, 400)
+
+
+class PaginasPublicasTests(TestCase):
+    """services.paginas_publicas: HTML por slug em cache, nova versão a cada save, CSRF por requisição."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cache_por_slug_e_invalidacao_no_save(self):
+        url = reverse("inscricoes:inscricao_evento_publico", args=[self.evento.slug])
+        self.assertContains(self.client.get(url), "Acampamento Sênior")
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), "Acampamento Sênior")
+
+        self.evento.nome = "Acampamento Renovado"
+        self.evento.save()
+        self.assertContains(self.client.get(url), "Acampamento Renovado")
+
+        # telão: relógio do servidor preenchido a cada acesso, mesmo servido do cache
+        telao = reverse("inscricoes:painel_sorteio", args=[self.evento.slug])
+        self.client.get(telao)
+        html = self.client.get(telao).content.decode()
+        self.assertNotIn("__pagina_publica_", html)
+        self.assertIn(f'const initISO = "{timezone.localdate().isoformat()}T', html)
+
+    def test_formulario_em_cache_com_csrf_de_cada_um(self):
+        url = reverse("inscricoes:inscricao_inicial", args=[self.evento.slug])
+        self.client.get(url)  # aquece o cache
+
+        cliente = self.client_class(enforce_csrf_checks=True)
+        resp = cliente.get(url)
+        html = resp.content.decode()
+        self.assertNotIn("__pagina_publica_", html)
+        token = html.split('name="csrfmiddlewaretoken" value="', 1)[1].split('"', 1)[0]
+        resp = cliente.post(url, {"csrfmiddlewaretoken": token, "nome": ""})
+        self.assertEqual(resp.status_code, 200)  # form inválido de volta, não 403
+
+
+class PoliticaCacheTests(TestCase):
+    """services.politica: cópia local + cache compartilhado, renovados ao salvar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.politica = PoliticaPrivacidade.objects.create(texto="Versão 1")
+
+    def setUp(self):
+        cache.clear()
+        politica.invalidar()
+
+    def test_consulta_uma_vez_e_renova_no_save(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(politica.politica_atual().texto, "Versão 1")
+        with self.assertNumQueries(0):
+            politica.politica_atual()
+            # outro processo (sem cópia local) lê do cache compartilhado
+            politica._local.update(versao=None, expira=0.0)
+            self.assertEqual(politica.politica_atual().texto, "Versão 1")
+
+        self.politica.texto = "Versão 2"
+        self.politica.save()
+        self.assertEqual(politica.politica_atual().texto, "Versão 2")
+
+    def test_context_processor(self):
+        response = self.client.get(reverse("login"))
+        self.assertEqual(response.context["politica"].texto, "Versão 1")
+
+
+class ReembolsoLoteTests(TestCase):
+    """services.reembolso_lote: política e prazo, taxa, gravação do lote e nada devolvido duas vezes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento(nome="Encontro de Casais", tipo="casais")
+        cls.politica = PoliticaReembolso.objects.create(
+            evento=cls.evento, prazo_solicitacao_dias=7, taxa_administrativa_percent=Decimal("3.33"),
+        )
+
+    def setUp(self):
+        paroquia = self.evento.paroquia
+        self.ele, self.ela = (
+            Inscricao.objects.create(participante=_participante(n), evento=self.evento, paroquia=paroquia,
+                                     status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True)
+            for n in (1, 2)
+        )
+        Inscricao.objects.filter(pk=self.ele.pk).update(inscricao_pareada=self.ela)
+        self.pagamento = Pagamento.objects.create(
+            inscricao=self.ele, valor=Decimal("150.00"), transacao_id="555",
+            status=Pagamento.StatusPagamento.CONFIRMADO,
+        )
+        Inscricao.objects.filter(pk=self.ele.pk).update(status=InscricaoStatus.REEMB_SOL)
+        self.reembolso = Reembolso.objects.create(pagamento=self.pagamento, evento=self.evento,
+                                                  valor_pago=self.pagamento.valor)
+
+    def _negativa(self):
+        [(_, valor, _, negativa)] = calcular_reembolsos(self.evento)
+        self.assertEqual(valor, Decimal("0.00"))
+        return negativa
+
+    def test_taxa_arredonda_para_o_centavo(self):
+        # 150,00 × 96,67% = 145,005
+        self.assertEqual(calcular_reembolsos(self.evento),
+                         [(self.pagamento, Decimal("145.01"), Decimal("3.33"), "")])
+
+    def test_politica_nao_permite(self):
+        PoliticaReembolso.objects.filter(pk=self.politica.pk).update(permite_reembolso=False)
+        self.assertEqual(self._negativa(), "Evento não aceita reembolso.")
+
+    def test_fora_do_prazo(self):
+        # limite: 7 dias antes do início (daqui a 30 dias)
+        Reembolso.objects.filter(pk=self.reembolso.pk).update(solicitado_em=timezone.now() + timedelta(days=24))
+        self.assertIn("fora do prazo", self._negativa())
+
+    def test_upsert_sem_alvo_de_conflito_no_mysql(self):
+        with mock.patch.object(connection.features, "supports_update_conflicts_with_target", False), \
+                mock.patch.object(Reembolso.objects, "bulk_create") as bulk:
+            preparar_reembolsos(self.evento, Reembolso.Motivo.SOLICITACAO, calcular_reembolsos(self.evento))
+        self.assertNotIn("unique_fields", bulk.call_args.kwargs)
+
+    def test_lote_devolve_uma_vez_e_libera_o_par(self):
+        sdk = mock.Mock()
+        sdk.refund.return_value.create.return_value = {"status": 201, "response": {"id": 987}}
+        with mock.patch("inscricoes.services.reembolso_lote.mp_client_by_paroquia", return_value=sdk):
+            res = reembolsar_evento(self.evento, por_segundo=0)
+            de_novo = reembolsar_evento(self.evento, por_segundo=0)
+
+        self.assertEqual((res.concluidos, res.total_devolvido, res.erros), (1, Decimal("145.01"), []))
+        self.assertEqual(de_novo.pagamentos, 0)
+        criar = sdk.refund.return_value.create
+        self.assertEqual(criar.call_count, 1)
+        self.assertEqual(criar.call_args.args[:2], ("555", {"amount": 145.01}))
+        self.assertEqual(criar.call_args.args[2].custom_headers["x-idempotency-key"],
+                         f"reembolso-{self.pagamento.pk}-145.01")
+
+        self.reembolso.refresh_from_db()
+        self.assertEqual((self.reembolso.status, self.reembolso.mp_refund_id), (Reembolso.Status.CONCLUIDO, "987"))
+        self.pagamento.refresh_from_db()
+        self.assertEqual(self.pagamento.status, Pagamento.StatusPagamento.CANCELADO)
+        for ins in (self.ele, self.ela):
+            ins.refresh_from_db()
+            self.assertEqual(ins.status, InscricaoStatus.REEMB_APROV)
+            self.assertFalse(ins.pagamento_confirmado)
+        self.assertEqual(ResumoFinanceiroEvento.objects.get(evento=self.evento).qtd_confirmados, 0)
+
+    def test_devolucao_parcial_so_cancela_quando_e_do_lote(self):
+        def status(payment_id):
+            return campos_pagamento({"id": payment_id, "status": "approved",
+                                     "status_detail": "partially_refunded", "transaction_amount": 150})["status"]
+
+        self.assertEqual(status(555), Pagamento.StatusPagamento.CANCELADO)
+        # troco devolvido pelo painel do MP: o participante pagou
+        self.assertEqual(status(556), Pagamento.StatusPagamento.CONFIRMADO)
+        Reembolso.objects.filter(pk=self.reembolso.pk).update(status=Reembolso.Status.NEGADO)
+        self.assertEqual(status(555), Pagamento.StatusPagamento.CONFIRMADO)
+
+
+class RepasseLoteTests(TestCase):
+    """services.repasse_lote: PIX do repasse reaproveitado até vencer; vencido sai com chave nova."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        ResumoFinanceiroEvento.objects.filter(evento=cls.evento).update(
+            qtd_confirmados=10, bruto=Decimal("1500.00"), taxas_mp=Decimal("50.00"), liquido=Decimal("1450.00"),
+        )
+
+    def setUp(self):
+        self.sdk = mock.Mock()
+        self.sdk.payment.return_value.create.side_effect = self._cobranca
+        cfg = mock.Mock(email_cobranca="dono@example.com", notificacao_webhook_url="")
+        patcher = mock.patch("inscricoes.services.repasse_lote.mp_owner_client", return_value=(self.sdk, cfg))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cobranca(self, body, opcoes):
+        n = self.sdk.payment.return_value.create.call_count
+        return {"status": 201, "response": {
+            "id": 9000 + n, "date_of_expiration": (timezone.now() + timedelta(hours=24)).isoformat(),
+            "point_of_interaction": {"transaction_data": {"qr_code": f"qr-{n}", "qr_code_base64": "b64"}},
+        }}
+
+    def _chaves(self):
+        return [c.args[1].custom_headers["x-idempotency-key"]
+                for c in self.sdk.payment.return_value.create.call_args_list]
+
+    def test_reaproveita_ate_vencer(self):
+        res = gerar_repasses(eventos=[self.evento], max_workers=1)
+        self.assertEqual((res.criados, res.gerados), (1, 1))
+        rep = Repasse.objects.get(evento=self.evento)
+        self.assertEqual(rep.transacao_id, "9001")
+        self.assertGreater(rep.pix_expira_em, timezone.now() + timedelta(hours=23))
+
+        res = gerar_repasses(eventos=[self.evento], max_workers=1)
+        self.assertEqual((res.reaproveitados, res.gerados), (1, 0))
+
+        Repasse.objects.filter(pk=rep.pk).update(pix_expira_em=timezone.now() - timedelta(minutes=1))
+        res = gerar_repasses(eventos=[self.evento], max_workers=1)
+        self.assertEqual((res.reaproveitados, res.gerados), (0, 1))
+        rep.refresh_from_db()
+        self.assertEqual((rep.transacao_id, rep.qr_code_text, rep.geracao_pix), ("9002", "qr-2", 1))
+        self.assertEqual(self._chaves(), [f"repasse-{rep.pk}-0-{rep.valor_repasse}",
+                                          f"repasse-{rep.pk}-1-{rep.valor_repasse}"])
+
+    def test_view_separa_configuracao_do_dono_de_outras_falhas(self):
+        admin = User.objects.create_user(username="admin", password="x", tipo_usuario="admin_paroquia",
+                                         paroquia=self.evento.paroquia)
+        self.client.force_login(admin)
+        url = reverse("inscricoes:gerar_pix_repasse_evento", args=[self.evento.pk])
+
+        def mensagens(resp):
+            return [str(m) for m in get_messages(resp.wsgi_request)]
+
+        with mock.patch("inscricoes.views.mp_owner_client", side_effect=RuntimeError("sem token")):
+            resp = self.client.get(url)
+        self.assertEqual(mensagens(resp), ["Configuração do Mercado Pago (DONO) ausente/inválida: sem token"])
+
+        with mock.patch("inscricoes.views.mp_owner_client"), \
+                mock.patch("inscricoes.views.gerar_repasses", side_effect=DatabaseError("deadlock")), \
+                self.assertLogs(level="ERROR"):
+            resp = self.client.get(url)
+        # a mensagem anterior não foi exibida (redirect sem seguir): fica na fila
+        self.assertEqual(mensagens(resp)[-1], "Não foi possível gerar o PIX de repasse. Tente novamente.")
+
+
+class EventoPorSlugOuIdTests(TestCase):
+    """management.utils.evento_por_slug_ou_id: argumento dos comandos por slug ou UUID."""
+
+    def test_slug_id_e_inexistente(self):
+        evento = _evento()
+        self.assertEqual(evento_por_slug_ou_id(evento.slug), evento)
+        self.assertEqual(evento_por_slug_ou_id(str(evento.pk)), evento)
+        for ref in ("nao-existe", "00000000-0000-0000-0000-000000000000"):
+            with self.assertRaisesMessage(CommandError, f"Evento não encontrado: {ref}"):
+                evento_por_slug_ou_id(ref)
+
+
+class PushStatusInscricaoTests(TestCase):
+    """signals.push_status_inscricao: push só quando o estado publicado muda."""
+
+    def setUp(self):
+        evento = _evento()
+        self.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=evento, paroquia=evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        patcher = mock.patch("inscricoes.signals.notificar_status")
+        self.notificar = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_save_sem_mudanca_de_status_nao_notifica(self):
+        insc = Inscricao.objects.get(pk=self.inscricao.pk)
+        insc.contato_emergencia_nome = "Ana"
+        insc.save()
+        insc.save(update_fields=["contato_emergencia_nome"])
+        self.notificar.assert_not_called()
+
+    def test_mudanca_de_status_notifica_uma_vez(self):
+        insc = Inscricao.objects.get(pk=self.inscricao.pk)
+        insc.mudar_status(InscricaoStatus.PAG_CONFIRMADO)
+        insc.save()
+        self.notificar.assert_called_once_with(insc.pk)
+
+
+class PushStatusPagamentoTests(TestCase):
+    """services.pagamento_status.notificar_status: cache + push no grupo da inscrição, só depois do commit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        evento = _evento()
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=evento, paroquia=evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("inscricoes.services.pagamento_status.get_channel_layer")
+        self.layer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.layer.group_send = mock.AsyncMock()
+
+    def test_pagamento_confirmado_empurra_o_estado_depois_do_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Pagamento.objects.create(
+                inscricao=self.inscricao, valor=Decimal("150.00"), status=Pagamento.StatusPagamento.CONFIRMADO,
+            )
+            self.layer.group_send.assert_not_called()
+
+        self.layer.group_send.assert_awaited_with(f"pagamento_{self.inscricao.pk}", {
+            "type": "pagamento.status", "estado": {"status": "confirmado", "pagamento_confirmado": True},
+        })
+        self.assertEqual(estado_em_cache(self.inscricao.pk)["status"], "confirmado")
+
+    def test_falha_no_channel_layer_nao_derruba_o_save(self):
+        self.layer.group_send.side_effect = RuntimeError("redis fora")
+        with self.captureOnCommitCallbacks(execute=True):
+            notificar_status(self.inscricao.pk)
+        self.layer.group_send.assert_awaited_once()
+        self.assertEqual(estado_em_cache(self.inscricao.pk)["status"], "pendente")
+
+
+class StatusPagamentoPollingTests(TestCase):
+    """views.status_pagamento: polling servido do read model em cache, com ETag e 304."""
+
+    @classmethod
+    def setUpTestData(cls):
+        evento = _evento()
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=evento, paroquia=evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        cls.url = reverse("inscricoes:status_pagamento", args=[cls.inscricao.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_if_none_match_responde_304_sem_banco(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.json(), {"status": "pendente", "pagamento_confirmado": False})
+        etag = resp["ETag"]
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((resp.status_code, resp["ETag"]), (304, etag))
+
+    def test_etag_so_muda_quando_o_estado_muda(self):
+        etag = self.client.get(self.url)["ETag"]
+        atualizar_cache(self.inscricao.pk)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Inscricao.objects.filter(pk=self.inscricao.pk).update(pagamento_confirmado=True)
+        atualizar_cache(self.inscricao.pk)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertTrue(resp.json()["pagamento_confirmado"])
+
+    def test_inscricao_inexistente_404(self):
+        url = reverse("inscricoes:status_pagamento", args=[self.inscricao.pk + 1000])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CaixaWebhookMercadoPagoTests(TestCase):
+    """services.mp_webhook_inbox: mp_webhook só grava; o worker sincroniza com dedupe e backoff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=cls.evento, paroquia=cls.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+
+    def setUp(self):
+        mp_clients.reiniciar_circuitos()
+        self.addCleanup(mp_clients.reiniciar_circuitos)
+
+    def _sincronizar(self, **kw):
+        return mock.patch("inscricoes.services.mp_webhook_inbox._sincronizar_notificacao", **kw)
+
+    def test_webhook_grava_uma_linha_por_pagamento(self):
+        url = reverse("inscricoes:mp_webhook")
+        for _ in range(2):
+            resp = self.client.post(url, json.dumps({"data": {"id": "123"}}), content_type="application/json")
+            self.assertEqual(resp.status_code, 200)
+        notif = NotificacaoMercadoPago.objects.get()
+        self.assertEqual((notif.payment_id, notif.status), ("123", NotificacaoMercadoPago.Status.PENDENTE))
+
+    def test_entrega_durante_processamento_reabre_depois(self):
+        notif = mp_webhook_inbox.registrar_notificacao("123")
+        NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(status=NotificacaoMercadoPago.Status.PROCESSANDO)
+        mp_webhook_inbox.registrar_notificacao("123", {"action": "payment.updated"})
+        notif.refresh_from_db()
+        self.assertEqual((notif.status, notif.reprocessar),
+                         (NotificacaoMercadoPago.Status.PROCESSANDO, True))
+
+        notif.tentativas = 1
+        with self._sincronizar(return_value=(self.inscricao, "approved")):
+            mp_webhook_inbox.processar_notificacao(notif)
+        notif.refresh_from_db()
+        self.assertEqual((notif.status, notif.reprocessar, notif.inscricao_id),
+                         (NotificacaoMercadoPago.Status.PENDENTE, False, self.inscricao.pk))
+
+    def test_falha_reagenda_com_backoff_e_desiste(self):
+        notif = mp_webhook_inbox.registrar_notificacao("123")
+        with self._sincronizar(side_effect=RuntimeError("HTTP 500")):
+            self.assertEqual(mp_webhook_inbox.processar_lote(), 1)
+            notif.refresh_from_db()
+            self.assertEqual((notif.status, notif.tentativas), (NotificacaoMercadoPago.Status.PENDENTE, 1))
+            self.assertGreater(notif.proxima_tentativa,
+                               timezone.now() + timedelta(seconds=mp_webhook_inbox.BACKOFF_BASE_SEGUNDOS - 5))
+            self.assertEqual(mp_webhook_inbox.processar_lote(), 0)  # ainda não venceu
+
+            NotificacaoMercadoPago.objects.filter(pk=notif.pk).update(
+                tentativas=mp_webhook_inbox.MAX_TENTATIVAS - 1, proxima_tentativa=timezone.now(),
+            )
+            mp_webhook_inbox.processar_lote()
+        notif.refresh_from_db()
+        self.assertEqual((notif.status, notif.ultimo_erro), (NotificacaoMercadoPago.Status.ERRO, "HTTP 500"))
+
+    def test_descartada_nao_retenta(self):
+        notif = mp_webhook_inbox.registrar_notificacao("123")
+        erro = mp_webhook_inbox.NotificacaoDescartada("sem external_reference")
+        with self._sincronizar(side_effect=erro):
+            mp_webhook_inbox.processar_lote()
+        notif.refresh_from_db()
+        self.assertEqual((notif.status, notif.tentativas), (NotificacaoMercadoPago.Status.ERRO, 1))
+
+
+class RotaWebhookMercadoPagoTests(TestCase):
+    """notification_url com a paróquia assinada (?r=): uma consulta ao MP com a credencial certa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        cls.outra = Paroquia.objects.create(nome="Outra Paróquia")
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=cls.evento, paroquia=cls.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+
+    def _payment(self):
+        return {"id": 555, "status": "approved", "external_reference": str(self.inscricao.pk),
+                "transaction_amount": 150, "payment_method_id": "pix"}
+
+    def _processar(self, paroquia_id):
+        notif = mp_webhook_inbox.registrar_notificacao("555", paroquia_id=paroquia_id)
+        notif.tentativas = 1
+        with mock.patch("inscricoes.services.mp_webhook_inbox.mp_client_by_paroquia") as cliente, \
+                mock.patch("inscricoes.services.mp_webhook_inbox.buscar_pagamento",
+                           return_value=self._payment()) as buscar:
+            mp_webhook_inbox.processar_notificacao(notif)
+        notif.refresh_from_db()
+        return notif, cliente, buscar
+
+    def test_assinatura(self):
+        url = mp_webhook_inbox.url_com_rota("https://exemplo.com/mp/webhook/?x=1", 42)
+        token = parse_qs(urlsplit(url).query)["r"][0]
+        self.assertTrue(url.startswith("https://exemplo.com/mp/webhook/?x=1&r="))
+        self.assertEqual(mp_webhook_inbox.ler_rota(token), 42)
+        self.assertIsNone(mp_webhook_inbox.ler_rota(token.replace("42", "43")))
+        self.assertIsNone(mp_webhook_inbox.ler_rota(""))
+
+    def test_webhook_guarda_so_rota_valida(self):
+        url = reverse("inscricoes:mp_webhook")
+        corpo = json.dumps({"data": {"id": "555"}})
+        token = mp_webhook_inbox.assinar_rota(self.evento.paroquia_id)
+        self.client.post(f"{url}?r={token}", corpo, content_type="application/json")
+        self.client.post(f"{url}?r=1:falsa", json.dumps({"data": {"id": "556"}}), content_type="application/json")
+        self.assertEqual(dict(NotificacaoMercadoPago.objects.values_list("payment_id", "paroquia_rota")),
+                         {"555": self.evento.paroquia_id, "556": None})
+
+    def test_rota_sincroniza_com_uma_consulta(self):
+        notif, cliente, buscar = self._processar(self.evento.paroquia_id)
+        self.assertEqual(notif.status, NotificacaoMercadoPago.Status.PROCESSADA)
+        self.assertEqual(cliente.call_args.args[0].pk, self.evento.paroquia_id)
+        buscar.assert_called_once_with(cliente.return_value, "555")
+        self.inscricao.refresh_from_db()
+        self.assertEqual(self.inscricao.status, InscricaoStatus.PAG_CONFIRMADO)
+
+    def test_inscricao_de_outra_paroquia_e_descartada(self):
+        notif, _, _ = self._processar(self.outra.pk)
+        self.assertEqual(notif.status, NotificacaoMercadoPago.Status.ERRO)
+        self.assertFalse(Pagamento.objects.exists())
+
+
+class ConciliacaoMercadoPagoTests(TestCase):
+    """services.mp_reconciliacao: busca paginada no MP e gravação em lote do evento."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        cls.outro = _evento(nome="Outro Evento", paroquia=cls.evento.paroquia)
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=cls.evento, paroquia=cls.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        cls.de_outro_evento = Inscricao.objects.create(
+            participante=_participante(2), evento=cls.outro, paroquia=cls.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+
+    def _mp(self, resultados, total=None):
+        mp = mock.Mock()
+        mp.payment.return_value.search.return_value = {
+            "status": 200, "response": {"results": resultados, "paging": {"total": total or len(resultados)}},
+        }
+        return mp
+
+    def _conciliar(self, mp, **kw):
+        inicio = timezone.now() - timedelta(hours=12)  # janela de um dia: uma busca por página
+        with mock.patch("inscricoes.services.mp_reconciliacao.mp_client_by_paroquia", return_value=mp):
+            return conciliar_evento(self.evento, inicio=inicio, fim=inicio + timedelta(days=1), max_workers=1, **kw)
+
+    def _payment(self, id_, status, inscricao, atualizado="2025-01-01T10:00:00.000-03:00"):
+        return {"id": id_, "status": status, "external_reference": str(inscricao.pk), "transaction_amount": 150,
+                "payment_method_id": "pix", "date_last_updated": atualizado,
+                "fee_details": [{"amount": 1.5, "fee_payer": "collector"}]}
+
+    def test_aprovado_prevalece_e_confirma_em_lote(self):
+        mp = self._mp([
+            self._payment(1, "rejected", self.inscricao, "2025-01-01T11:00:00.000-03:00"),
+            self._payment(2, "approved", self.inscricao),
+            self._payment(3, "approved", self.de_outro_evento),
+            {"id": 4, "status": "approved", "external_reference": "repasse:1:2"},
+        ])
+        res = self._conciliar(mp)
+        self.assertEqual((res.consultados, res.casados, res.criados, res.confirmados), (4, 1, 1, 1))
+
+        pag = Pagamento.objects.get(inscricao=self.inscricao)
+        self.assertEqual((pag.transacao_id, pag.status, pag.fee_mp),
+                         ("2", Pagamento.StatusPagamento.CONFIRMADO, Decimal("1.50")))
+        self.inscricao.refresh_from_db()
+        self.assertEqual(self.inscricao.status, InscricaoStatus.PAG_CONFIRMADO)
+        self.assertFalse(Pagamento.objects.filter(inscricao=self.de_outro_evento).exists())
+        self.assertEqual(ResumoFinanceiroEvento.objects.get(evento=self.evento).bruto, Decimal("150.00"))
+
+        # de novo: nada a mudar
+        res = self._conciliar(mp)
+        self.assertEqual((res.criados, res.atualizados, res.confirmados), (0, 0, 0))
+
+    def test_paginas_e_dry_run(self):
+        mp = self._mp([self._payment(2, "approved", self.inscricao)], total=PAGE_LIMIT + 1)
+        res = self._conciliar(mp, dry_run=True)
+        offsets = sorted(c.args[0]["offset"] for c in mp.payment.return_value.search.call_args_list)
+        self.assertEqual(offsets, [0, PAGE_LIMIT])
+        self.assertEqual((res.criados, res.confirmados), (1, 1))
+        self.assertFalse(Pagamento.objects.exists())
+
+
+class TaxasMercadoPagoTests(TestCase):
+    """mp_sync.taxas_pagamento e o backfill services.mp_taxas.preencher_taxas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        cls.pagamentos = [
+            Pagamento.objects.create(
+                inscricao=Inscricao.objects.create(
+                    participante=_participante(n), evento=cls.evento, paroquia=cls.evento.paroquia,
+                    status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+                ),
+                valor=Decimal("150.00"), status=Pagamento.StatusPagamento.CONFIRMADO, transacao_id=str(1000 + n),
+            )
+            for n in (1, 2)
+        ]
+
+    def setUp(self):
+        patcher = mock.patch("inscricoes.services.mp_taxas.mp_client_by_paroquia")
+        self.cliente = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("inscricoes.services.mp_taxas.buscar_pagamento")
+        self.buscar = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _payment(self, transacao_id):
+        return {
+            "id": int(transacao_id), "transaction_amount": 150,
+            "fee_details": [{"amount": 1.49, "fee_payer": "collector"}, {"amount": 3, "fee_payer": "payer"}],
+            "transaction_details": {"net_received_amount": 148.51},
+        }
+
+    def test_taxas_so_do_recebedor_e_liquido_estimado_enquanto_pendente(self):
+        self.assertEqual(taxas_pagamento(self._payment("1")),
+                         {"fee_mp": Decimal("1.49"), "net_received": Decimal("148.51")})
+        pendente = {"transaction_amount": 150, "fee_details": [{"amount": 1.49}], "transaction_details": {}}
+        self.assertEqual(taxas_pagamento(pendente),
+                         {"fee_mp": Decimal("1.49"), "net_received": Decimal("148.51")})
+
+    def test_backfill_grava_taxas_e_recalcula_o_resumo(self):
+        def buscar(cliente, transacao_id):
+            if transacao_id == "1002":
+                raise RuntimeError("timeout")
+            return self._payment(transacao_id)
+
+        self.buscar.side_effect = buscar
+        res = preencher_taxas(max_workers=2)
+
+        self.assertEqual((res.pagamentos, res.atualizados, res.sem_mudanca), (2, 1, 0))
+        self.assertEqual(res.erros, [(self.pagamentos[1].pk, "timeout")])
+        self.cliente.assert_called_once()
+        pag = Pagamento.objects.get(pk=self.pagamentos[0].pk)
+        self.assertEqual((pag.fee_mp, pag.net_received), (Decimal("1.49"), Decimal("148.51")))
+        self.assertEqual(ResumoFinanceiroEvento.objects.get(evento=self.evento).taxas_mp, Decimal("1.49"))
+
+        # próxima passada: só o que ainda está sem taxa
+        self.assertEqual(preencher_taxas(dry_run=True).pagamentos, 1)
+
+    def test_dry_run_nao_consulta_o_mp(self):
+        res = preencher_taxas(dry_run=True)
+        self.assertEqual((res.pagamentos, res.atualizados), (2, 0))
+        self.buscar.assert_not_called()
+
+
+class PixReusoTests(TestCase):
+    """views.iniciar_pagamento_pix: cobrança PIX válida servida do banco, sem nova chamada ao MP."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        MercadoPagoConfig.objects.create(paroquia=cls.evento.paroquia, access_token="TEST-token", public_key="pk")
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=cls.evento, paroquia=cls.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        cls.url = reverse("inscricoes:iniciar_pagamento_pix", args=[cls.inscricao.pk])
+
+    def setUp(self):
+        patcher = mock.patch("inscricoes.views.cliente_paroquia")
+        self.cliente = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.criar = self.cliente.return_value.payment.return_value.create
+        self.criar.return_value = {"status": 201, "response": {
+            "id": 888, "point_of_interaction": {"transaction_data": {
+                "qr_code": "qr-novo", "qr_code_base64": "b64-novo", "ticket_url": "https://mp/ticket"}},
+        }}
+
+    def _pix(self, expira_em):
+        return Pagamento.objects.create(
+            inscricao=self.inscricao, valor=self.evento.valor_inscricao, transacao_id="777",
+            pix_qr_code="qr-guardado", pix_qr_code_base64="b64", pix_expira_em=expira_em,
+        )
+
+    def test_cobranca_valida_nao_chama_o_mp(self):
+        self._pix(timezone.now() + timedelta(minutes=20))
+        self.assertContains(self.client.get(self.url), "qr-guardado")
+        self.cliente.assert_not_called()
+
+    def test_cobranca_perto_de_vencer_gera_outra_e_guarda(self):
+        self._pix(timezone.now() + Pagamento.PIX_MARGEM_REUSO - timedelta(seconds=30))
+        self.assertContains(self.client.get(self.url), "qr-novo")
+        pag = Pagamento.objects.get(inscricao=self.inscricao)
+        self.assertEqual((pag.transacao_id, pag.pix_qr_code), ("888", "qr-novo"))
+        self.assertGreater(pag.pix_expira_em, timezone.now() + timedelta(minutes=25))
+
+        self.assertContains(self.client.get(self.url), "qr-novo")
+        self.assertEqual(self.criar.call_count, 1)
+
+    def test_valor_diferente_nao_reaproveita(self):
+        pag = self._pix(timezone.now() + timedelta(minutes=20))
+        self.assertTrue(pag.pix_reutilizavel(self.evento.valor_inscricao))
+        self.assertFalse(pag.pix_reutilizavel(self.evento.valor_inscricao + 1))
+
+
+class PreferenciaReusoTests(TestCase):
+    """views.iniciar_pagamento: preferência do Checkout Pro reaproveitada enquanto valor e pagador valem."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = _evento()
+        MercadoPagoConfig.objects.create(paroquia=cls.evento.paroquia, access_token="TEST-token", public_key="pk")
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=cls.evento, paroquia=cls.evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        cls.url = reverse("inscricoes:iniciar_pagamento", args=[cls.inscricao.pk])
+
+    def setUp(self):
+        patcher = mock.patch("inscricoes.views.cliente_paroquia")
+        self.criar = patcher.start().return_value.preference.return_value.create
+        self.addCleanup(patcher.stop)
+        self.criar.side_effect = lambda dados: {"response": {
+            "id": f"pref-{self.criar.call_count}", "init_point": f"https://mp/checkout/{self.criar.call_count}",
+        }}
+
+    def test_segunda_tentativa_vai_direto_ao_checkout(self):
+        for _ in range(2):
+            self.assertRedirects(self.client.get(self.url), "https://mp/checkout/1", fetch_redirect_response=False)
+        self.assertEqual(self.criar.call_count, 1)
+
+        pag = Pagamento.objects.get(inscricao=self.inscricao)
+        self.assertEqual((pag.mp_preference_id, pag.mp_preference_email), ("pref-1", "p1@example.com"))
+        self.assertGreater(pag.mp_preference_expira_em, timezone.now() + timedelta(hours=23))
+        self.assertIn("r=", self.criar.call_args.args[0]["notification_url"])
+
+    def test_pagador_ou_validade_mudou_cria_outra(self):
+        self.client.get(self.url)
+        Participante.objects.filter(pk=self.inscricao.participante_id).update(email="novo@example.com")
+        self.assertRedirects(self.client.get(self.url), "https://mp/checkout/2", fetch_redirect_response=False)
+
+        Pagamento.objects.filter(inscricao=self.inscricao).update(
+            mp_preference_expira_em=timezone.now() + Pagamento.PREFERENCIA_MARGEM_REUSO - timedelta(minutes=1),
+        )
+        self.assertRedirects(self.client.get(self.url), "https://mp/checkout/3", fetch_redirect_response=False)
+
+
+class SimuladorMercadoPagoTests(SimpleTestCase):
+    """utils.mp_simulador: a API simulada atende o SDK via MP_API_BASE_URL."""
+
+    def setUp(self):
+        self.servidor = SimuladorMP(("127.0.0.1", 0))
+        self.servidor.iniciar_em_thread()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        mp_clients.limpar()
+        mp_clients.reiniciar_circuitos()
+        self.addCleanup(mp_clients.limpar)
+
+    def test_sdk_cria_e_busca_pagamento_no_simulador(self):
+        with override_settings(MP_API_BASE_URL=self.servidor.url):
+            sdk = mp_clients.cliente_dono("TEST-token")
+            criado = sdk.payment().create({
+                "transaction_amount": 150, "payment_method_id": "pix", "external_reference": "42",
+            })
+            self.assertEqual(criado["status"], 201)
+            pag = criado["response"]
+            self.assertEqual(pag["status"], "pending")
+            self.assertIn("qr_code", pag["point_of_interaction"]["transaction_data"])
+
+            achados = sdk.payment().search({"external_reference": "42"})["response"]
+        self.assertEqual([p["id"] for p in achados["results"]], [pag["id"]])
+        self.assertEqual(self.servidor.estado.contadores["requisicoes"], 2)
+
+    def test_aprovacao_gera_taxa_e_reembolso_respeita_idempotencia(self):
+        estado = EstadoSimulador(ConfigSimulador())
+        pid = estado.criar_pagamento({"transaction_amount": 100, "payment_method_id": "pix"}, "http://sim")["id"]
+        pag = estado.mudar_status(pid, "approved")
+        self.assertEqual(pag["fee_details"][0]["amount"], 0.99)
+        self.assertEqual(pag["transaction_details"]["net_received_amount"], 99.01)
+
+        primeiro = estado.reembolsar(pid, {"amount": 40}, chave="reemb-1")
+        self.assertEqual(estado.reembolsar(pid, {"amount": 40}, chave="reemb-1"), primeiro)
+        self.assertEqual((pag["status_detail"], estado.contadores["reembolsos"]), ("partially_refunded", 1))
+
+
+class BenchmarkPagamentosTests(TestCase):
+    """utils.benchmark_pagamentos: medição por rota e comparação entre rodadas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        evento = _evento()
+        cls.inscricao = Inscricao.objects.create(
+            participante=_participante(1), evento=evento, paroquia=evento.paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+        # como o test client: o handler WSGI não pode fechar a conexão da transação do teste
+        request_started.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+
+    def test_medidor_conta_queries_e_status_por_rota(self):
+        medidor = _Medidor(WSGIHandler())
+        url = reverse("inscricoes:status_pagamento", args=[self.inscricao.pk])
+        for _ in range(2):
+            medidor(RequestFactory().get(url).environ, lambda status, headers, exc_info=None: None)
+
+        rota = medidor.relatorio()["status_pagamento"]
+        self.assertEqual(rota["status_http"], {"200": 2})
+        self.assertEqual((rota["queries"]["n"], rota["queries"]["max"], rota["queries"]["p50"]), (2, 1, 0))
+
+    def test_percentis_e_comparacao(self):
+        self.assertEqual(resumo_amostras(range(1, 101))["p95"], 95)
+        self.assertEqual(resumo_amostras([]), {"n": 0})
+
+        anterior = {"rotas": {"status_pagamento": {"latencia_ms": {"p95": 10.0}, "queries": {"p95": 2}}},
+                    "lag_webhook_confirmacao_ms": {"p95": 500.0}}
+        atual = {"rotas": {"status_pagamento": {"latencia_ms": {"p95": 7.5}, "queries": {"p95": 0}},
+                           "nova_rota": {"latencia_ms": {"p95": 1.0}, "queries": {"p95": 1}}},
+                 "lag_webhook_confirmacao_ms": {"n": 0}}
+        self.assertEqual(comparar(atual, anterior), [
+            "status_pagamento latencia_ms p95: 10.0 → 7.5 (-2.50)",
+            "status_pagamento queries p95: 2 → 0 (-2.00)",
+        ])
@@ -102,6 +102,8 @@ urlpatterns = [
 
     # Inscrição (público e administrativo)
     path("evento/<slug:slug>/inscricao/", views.inscricao_inicial, name="inscricao_inicial"),
+    path("evento/<slug:slug>/fila/", views.sala_espera, name="sala_espera"),
+    path("evento/<slug:slug>/fila/status/", views.sala_espera_status, name="sala_espera_status"),
     path("inscricao/<int:pk>/", views.ver_inscricao, name="ver_inscricao"),
     path("inscricao/<slug:slug>/", views.inscricao_evento_publico, name="inscricao_evento_publico"),
     path("inscricao/<int:pk>/editar/", views.editar_inscricao, name="editar_inscricao"),
@@ -134,6 +136,7 @@ urlpatterns = [
     path("formulario/<int:inscricao_id>/", views.formulario_personalizado, name="formulario_personalizado"),
     path("formulario-contato/<int:inscricao_id>/", views.formulario_contato, name="formulario_contato"),
     path("formulario-saude/<int:inscricao_id>/", views.formulario_saude, name="formulario_saude"),
+    path("api/evento/<slug:slug>/inscricao/", views.api_inscricao, name="api_inscricao"),
 
     # Pagamentos (MP)
     path("inscricao/<int:inscricao_id>/pagar/", iniciar_pagamento, name="iniciar_pagamento"),
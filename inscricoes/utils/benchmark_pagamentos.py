@@ -0,0 +1,324 @@
+# inscricoes/utils/benchmark_pagamentos.py
+"""
+Benchmark ponta a ponta do fluxo de pagamento, contra o simulador do MP.
+
+Sobe, no mesmo processo:
+  - a aplicação num servidor WSGI com threads (como o LiveServerTestCase);
+  - o simulador do Mercado Pago (utils.mp_simulador);
+  - um worker drenando a caixa de entrada dos webhooks (processar_lote).
+
+N participantes concorrentes fazem:
+  aguardando_pagamento → iniciar_pagamento_pix → (rajada de aprovações no
+  simulador = rajada de webhooks) → polling de status_pagamento (com ETag)
+  até ver "confirmado".
+
+Mede, por rota: latência no servidor (p50/p95/p99) e queries por requisição;
+e o atraso entre o envio do webhook e o participante ver a confirmação.
+Os dados (paróquia/evento/inscrições) são criados para a rodada e apagados
+no fim.
+"""
+import json
+import logging
+import math
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import requests
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.db import connection
+from django.test.testcases import QuietWSGIRequestHandler
+from django.test.utils import override_settings
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+
+from ..models import (
+    EventoAcampamento, Inscricao, InscricaoStatus, MercadoPagoConfig, Paroquia, Participante, User,
+)
+from ..services import mp_clients
+from ..services.mp_webhook_inbox import processar_lote
+from .mp_simulador import ConfigSimulador, SimuladorMP
+
+logger = logging.getLogger("django")
+
+
+# ----------------------------------------------------------------------
+# Métricas
+# ----------------------------------------------------------------------
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    k = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[k]
+
+
+def resumo_amostras(valores) -> dict:
+    v = sorted(valores)
+    if not v:
+        return {"n": 0}
+    return {
+        "n": len(v),
+        "media": round(statistics.fmean(v), 2),
+        "p50": round(_percentil(v, 50), 2),
+        "p95": round(_percentil(v, 95), 2),
+        "p99": round(_percentil(v, 99), 2),
+        "max": round(v[-1], 2),
+    }
+
+
+class _Medidor:
+    """WSGI wrapper: tempo e nº de queries de cada requisição, por nome de rota."""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.amostras: dict = {}  # rota -> {"ms": [], "queries": [], "status": {}}
+
+    def __call__(self, environ, start_response):
+        try:
+            rota = resolve(environ.get("PATH_INFO", "")).url_name or "?"
+        except Resolver404:
+            rota = "404"
+        status_http = {}
+
+        def _start(status, headers, exc_info=None):
+            status_http["codigo"] = status.split(" ", 1)[0]
+            return start_response(status, headers, exc_info)
+
+        queries = [0]
+
+        def _contar(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(_contar):
+            corpo = b"".join(self.app(environ, _start))
+        ms = (time.perf_counter() - inicio) * 1000
+
+        with self.lock:
+            a = self.amostras.setdefault(rota, {"ms": [], "queries": [], "status": {}})
+            a["ms"].append(ms)
+            a["queries"].append(queries[0])
+            cod = status_http.get("codigo", "?")
+            a["status"][cod] = a["status"].get(cod, 0) + 1
+        return [corpo]
+
+    def relatorio(self) -> dict:
+        with self.lock:
+            return {
+                rota: {
+                    "latencia_ms": resumo_amostras(a["ms"]),
+                    "queries": resumo_amostras(a["queries"]),
+                    "status_http": dict(sorted(a["status"].items())),
+                }
+                for rota, a in sorted(self.amostras.items())
+            }
+
+
+# ----------------------------------------------------------------------
+# Dados da rodada
+# ----------------------------------------------------------------------
+def _criar_dados(n: int, valor: Decimal):
+    marca = uuid.uuid4().hex[:8]
+    hoje = date.today()
+    # sem e-mail: o signal de Paroquia não dispara credenciais
+    paroquia = Paroquia.objects.create(nome=f"Benchmark pagamentos {marca}")
+    MercadoPagoConfig.objects.create(paroquia=paroquia, access_token=f"TEST-benchmark-{marca}")
+    evento = EventoAcampamento.objects.create(
+        nome=f"Benchmark {marca}", tipo="casais", paroquia=paroquia,
+        data_inicio=hoje + timedelta(days=30), data_fim=hoje + timedelta(days=32),
+        inicio_inscricoes=hoje, fim_inscricoes=hoje + timedelta(days=20),
+        valor_inscricao=valor,
+    )
+    base = int(uuid.uuid4().int % 10**6) * 10**4
+    ids = []
+    for i in range(n):
+        p = Participante.objects.create(
+            nome=f"Participante {i}", cpf=f"{base + i:011d}", telefone="+5563999990000",
+            email=f"bench{marca}{i}@example.com", CEP="77000-000", endereco="Rua A", numero="1",
+            bairro="Centro", cidade="Palmas", estado="TO",
+        )
+        ins = Inscricao.objects.create(
+            participante=p, evento=evento, paroquia=paroquia,
+            status=InscricaoStatus.PAG_PENDENTE, foi_selecionado=True,
+        )
+        ids.append(ins.pk)
+    return paroquia, evento, ids
+
+
+def _apagar_dados(paroquia, evento):
+    part_ids = list(Inscricao.objects.filter(evento=evento).values_list("participante_id", flat=True))
+    evento.delete()
+    Participante.objects.filter(pk__in=part_ids).delete()
+    User.objects.filter(paroquia=paroquia).delete()
+    paroquia.delete()
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+# ----------------------------------------------------------------------
+# Rodada
+# ----------------------------------------------------------------------
+def executar(*, participantes=50, concorrencia=20, intervalo_poll_ms=250, timeout_confirmacao=60.0,
+             latencia_mp_ms=80.0, jitter_mp_ms=20.0, taxa_erro_mp=0.0, atraso_webhook_ms=0.0,
+             workers_webhook=1, manter_dados=False, progresso=None) -> dict:
+    log = progresso or (lambda msg: None)
+    medidor = _Medidor(WSGIHandler())
+    app = ThreadedWSGIServer(("127.0.0.1", 0), QuietWSGIRequestHandler)
+    app.set_app(medidor)
+    app_url = f"http://127.0.0.1:{app.server_address[1]}"
+    sim = SimuladorMP(("127.0.0.1", 0), ConfigSimulador(
+        latencia_ms=latencia_mp_ms, jitter_ms=jitter_mp_ms, taxa_erro=taxa_erro_mp,
+        atraso_webhook_ms=atraso_webhook_ms,
+    ))
+
+    with override_settings(MP_API_BASE_URL=sim.url, SITE_URL=app_url,
+                           ALLOWED_HOSTS=["127.0.0.1", "localhost", "testserver"]):
+        mp_clients.limpar()
+        mp_clients.reiniciar_circuitos()
+        paroquia, evento, ids = _criar_dados(participantes, Decimal("150.00"))
+        log(f"{participantes} inscrição(ões) criadas no evento {evento.nome}")
+        threading.Thread(target=app.serve_forever, daemon=True).start()
+        sim.iniciar_em_thread()
+
+        parar = threading.Event()
+
+        def _worker():
+            while not parar.is_set():
+                try:
+                    if not processar_lote(50):
+                        time.sleep(0.05)
+                except Exception as e:
+                    logger.warning("Benchmark: worker de webhooks falhou: %s", e)
+                    time.sleep(0.2)
+                finally:
+                    connection.close()
+
+        workers = [threading.Thread(target=_worker, daemon=True) for _ in range(max(1, workers_webhook))]
+        for w in workers:
+            w.start()
+
+        sessoes = {i: requests.Session() for i in ids}
+        erros = {"checkout": 0, "pix": 0}
+        erros_lock = threading.Lock()
+        payment_ids: dict = {}
+        inicio_total = time.perf_counter()
+        try:
+            # 1) checkout + PIX
+            def _iniciar(ins_id):
+                s = sessoes[ins_id]
+                r = s.get(app_url + reverse("inscricoes:aguardando_pagamento", args=[ins_id]), allow_redirects=False)
+                falhas = ["checkout"] if r.status_code != 200 else []
+                r = s.get(app_url + reverse("inscricoes:iniciar_pagamento_pix", args=[ins_id]), allow_redirects=False)
+                falhas += ["pix"] if r.status_code != 200 else []
+                with erros_lock:
+                    for etapa in falhas:
+                        erros[etapa] += 1
+
+            with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+                list(pool.map(_iniciar, ids))
+            with sim.estado.lock:
+                for pid, pag in sim.estado.pagamentos.items():
+                    if pag["payment_method_id"] == "pix" and pag["status"] == "pending":
+                        payment_ids[int(pag["external_reference"])] = pid
+            log(f"checkout/PIX: {len(payment_ids)} cobrança(s) PIX no simulador")
+
+            # 2) rajada: todos pagam ao mesmo tempo → rajada de webhooks
+            with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+                list(pool.map(lambda pid: sim.estado.mudar_status(pid, "approved"), payment_ids.values()))
+            log("rajada de aprovações enviada")
+
+            # 3) polling até confirmar
+            lags, nao_confirmados = [], []
+
+            def _aguardar(ins_id):
+                s, etag = sessoes[ins_id], ""
+                url = app_url + reverse("inscricoes:status_pagamento", args=[ins_id])
+                limite = time.time() + timeout_confirmacao
+                while time.time() < limite:
+                    r = s.get(url, headers={"If-None-Match": etag} if etag else {})
+                    etag = r.headers.get("ETag", etag)
+                    if r.status_code == 200 and r.json().get("pagamento_confirmado"):
+                        enviado = sim.estado.webhooks_enviados.get(payment_ids.get(ins_id))
+                        if enviado:
+                            lags.append((time.time() - enviado) * 1000)
+                        return
+                    time.sleep(intervalo_poll_ms / 1000)
+                nao_confirmados.append(ins_id)
+
+            with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+                list(pool.map(_aguardar, [i for i in ids if i in payment_ids]))
+            duracao = time.perf_counter() - inicio_total
+        finally:
+            parar.set()
+            for w in workers:
+                w.join(timeout=5)
+            app.shutdown()
+            app.server_close()
+            sim.shutdown()
+            sim.server_close()
+            for s in sessoes.values():
+                s.close()
+            if not manter_dados:
+                _apagar_dados(paroquia, evento)
+            mp_clients.limpar()
+
+    with sim.estado.lock:
+        contadores = dict(sim.estado.contadores)
+
+    return {
+        "commit": _commit_atual(),
+        "quando": timezone.now().isoformat(),
+        "config": {
+            "participantes": participantes, "concorrencia": concorrencia,
+            "intervalo_poll_ms": intervalo_poll_ms, "latencia_mp_ms": latencia_mp_ms,
+            "jitter_mp_ms": jitter_mp_ms, "taxa_erro_mp": taxa_erro_mp,
+            "atraso_webhook_ms": atraso_webhook_ms, "workers_webhook": workers_webhook,
+            "banco": connection.vendor,
+        },
+        "duracao_s": round(duracao, 2),
+        "confirmados": len(lags),
+        "nao_confirmados": len(nao_confirmados),
+        "erros": erros,
+        "rotas": medidor.relatorio(),
+        # inclui a resolução do polling (intervalo_poll_ms)
+        "lag_webhook_confirmacao_ms": resumo_amostras(lags),
+        "simulador": contadores,
+        "mp_clients": mp_clients.estatisticas(),
+    }
+
+
+def comparar(atual: dict, anterior: dict) -> list:
+    """Linhas 'rota: p95 antes → agora' (latência e queries) + lag do webhook."""
+    linhas = []
+    for rota, m in atual["rotas"].items():
+        ant = anterior.get("rotas", {}).get(rota)
+        if not ant:
+            continue
+        for metrica in ("latencia_ms", "queries"):
+            a, b = ant[metrica].get("p95"), m[metrica].get("p95")
+            if a is not None and b is not None:
+                linhas.append(f"{rota} {metrica} p95: {a} → {b} ({b - a:+.2f})")
+    a = anterior.get("lag_webhook_confirmacao_ms", {}).get("p95")
+    b = atual["lag_webhook_confirmacao_ms"].get("p95")
+    if a is not None and b is not None:
+        linhas.append(f"lag webhook→confirmação p95: {a} → {b} ({b - a:+.2f})")
+    return linhas
+
+
+def salvar(resultado: dict, caminho: str) -> None:
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,15 @@
+# inscricoes/utils/cpf.py
+import re
+
+
+def cpf_digitos(raw) -> str:
+    """
+    Só os dígitos do CPF ('123.456.789-09' → '12345678909').
+    Forma canônica gravada em Participante.cpf_digitos (índice único).
+    """
+    return re.sub(r'\D', '', str(raw or ''))
+
+
+def formatar_cpf(digitos: str) -> str:
+    d = cpf_digitos(digitos)
+    return f"{d[0:3]}.{d[3:6]}.{d[6:9]}-{d[9:11]}" if len(d) == 11 else d
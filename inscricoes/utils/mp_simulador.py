@@ -0,0 +1,405 @@
+# inscricoes/utils/mp_simulador.py
+"""
+Simulador local da API do Mercado Pago (teste de carga / desenvolvimento offline).
+
+Implementa o que o SDK `mercadopago` usa no projeto:
+
+  POST /checkout/preferences            GET /checkout/preferences/<id>
+  POST /v1/payments                     GET|PUT /v1/payments/<id>
+  GET  /v1/payments/search              POST /v1/payments/<id>/refunds
+
+e algumas rotas próprias (prefixo /__simulador):
+
+  GET  /checkout/<pref_id>                          página "pagar" do Checkout Pro
+  POST /__simulador/preferencias/<pref_id>/pagar     paga a preferência (approved)
+  POST /__simulador/pagamentos/<id>/<status>         muda o status (approved, rejected, ...)
+  GET  /__simulador/estado                           contadores
+
+Latência (média + jitter) e erros (HTTP 500/429 por sorteio) são configuráveis.
+Toda mudança de status dispara o webhook para a notification_url do pagamento
+(ou para `webhook_url`, se informado), como o MP faz.
+
+Para apontar a aplicação para o simulador: MP_API_BASE_URL=http://127.0.0.1:8765
+(ver services.mp_clients). Uso: `manage.py simular_mp --help`.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger("django")
+
+TAXA_PIX = Decimal("0.0099")
+TAXA_CARTAO = Decimal("0.0498")
+
+
+@dataclass
+class ConfigSimulador:
+    latencia_ms: float = 0.0
+    jitter_ms: float = 0.0
+    taxa_erro: float = 0.0            # fração das chamadas que responde 500
+    taxa_limite: float = 0.0          # fração que responde 429
+    aprovar_pix_apos: float | None = None  # segundos até um PIX pendente ser pago sozinho
+    webhook_url: str = ""             # substitui a notification_url dos pagamentos
+    atraso_webhook_ms: float = 0.0
+
+
+def _agora() -> str:
+    return datetime.now(timezone(timedelta(hours=-3))).isoformat(timespec="milliseconds")
+
+
+class EstadoSimulador:
+    """Preferências e pagamentos em memória (thread-safe)."""
+
+    def __init__(self, config: ConfigSimulador):
+        self.config = config
+        self.lock = threading.Lock()
+        self.preferencias: dict = {}
+        self.pagamentos: dict = {}
+        # ids não se repetem entre execuções (a caixa de entrada é única por payment_id)
+        self.proximo_id = int(time.time() * 1000)
+        self.contadores = {"requisicoes": 0, "erros_injetados": 0, "webhooks": 0, "webhooks_falhos": 0,
+                           "reembolsos": 0}
+        self.reembolsos_por_chave: dict = {}  # x-idempotency-key -> refund
+        # payment_id -> instante (time.time()) do último webhook disparado
+        self.webhooks_enviados: dict = {}
+
+    # ------------------------------------------------------------------
+    def criar_preferencia(self, dados: dict, base_url: str) -> dict:
+        pref_id = f"sim-{uuid.uuid4().hex[:16]}"
+        pref = {
+            **dados,
+            "id": pref_id,
+            "date_created": _agora(),
+            "init_point": f"{base_url}/checkout/{pref_id}",
+            "sandbox_init_point": f"{base_url}/checkout/{pref_id}",
+        }
+        with self.lock:
+            self.preferencias[pref_id] = pref
+        return pref
+
+    def criar_pagamento(self, dados: dict, base_url: str, status: str | None = None) -> dict:
+        metodo = dados.get("payment_method_id") or "pix"
+        valor = Decimal(str(dados.get("transaction_amount") or 0))
+        with self.lock:
+            self.proximo_id += 1
+            pid = self.proximo_id
+        pix = metodo == "pix"
+        status = status or ("pending" if pix else "approved")
+        pag = {
+            "id": pid,
+            "status": status,
+            "status_detail": "pending_waiting_transfer" if status == "pending" else "accredited",
+            "payment_method_id": metodo,
+            "payment_type_id": "bank_transfer" if pix else "credit_card",
+            "transaction_amount": float(valor),
+            "description": dados.get("description", ""),
+            "external_reference": dados.get("external_reference"),
+            "metadata": dados.get("metadata") or {},
+            "notification_url": dados.get("notification_url"),
+            "payer": dados.get("payer") or {},
+            "date_created": _agora(),
+            "date_of_expiration": dados.get("date_of_expiration"),
+            "date_approved": None,
+            "fee_details": [],
+            "transaction_details": {"net_received_amount": 0, "total_paid_amount": float(valor)},
+            "refunds": [],
+        }
+        if pix:
+            qr = f"00020126SIMULADOR{pid}5204000053039865406{valor}5802BR"
+            pag["point_of_interaction"] = {"transaction_data": {
+                "qr_code": qr,
+                "qr_code_base64": "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==",
+                "ticket_url": f"{base_url}/checkout/pix/{pid}",
+            }}
+        with self.lock:
+            self.pagamentos[pid] = pag
+        if status == "approved":
+            self._aprovar(pag)
+        self.notificar(pid)
+        if pix and status == "pending" and self.config.aprovar_pix_apos is not None:
+            threading.Timer(self.config.aprovar_pix_apos, self.mudar_status, args=(pid, "approved")).start()
+        return pag
+
+    def _aprovar(self, pag: dict) -> None:
+        valor = Decimal(str(pag["transaction_amount"]))
+        taxa = (valor * (TAXA_PIX if pag["payment_method_id"] == "pix" else TAXA_CARTAO)).quantize(Decimal("0.01"))
+        pag["date_approved"] = _agora()
+        pag["status_detail"] = "accredited"
+        pag["fee_details"] = [{"type": "mercadopago_fee", "amount": float(taxa), "fee_payer": "collector"}]
+        pag["transaction_details"]["net_received_amount"] = float(valor - taxa)
+
+    def mudar_status(self, pid: int, status: str) -> dict | None:
+        with self.lock:
+            pag = self.pagamentos.get(pid)
+            if pag is None or pag["status"] == status:
+                return pag
+            pag["status"] = status
+            if status == "approved":
+                self._aprovar(pag)
+            elif status != "pending":
+                pag["status_detail"] = status
+        self.notificar(pid)
+        return pag
+
+    def reembolsar(self, pid: int, dados: dict, chave: str = "") -> dict | None:
+        with self.lock:
+            pag = self.pagamentos.get(pid)
+            if pag is None:
+                return None
+            if chave and chave in self.reembolsos_por_chave:
+                return self.reembolsos_por_chave[chave]  # mesma chave de idempotência: mesmo refund
+            valor = dados.get("amount") or pag["transaction_amount"]
+            self.proximo_id += 1
+            refund = {"id": self.proximo_id, "payment_id": pid, "amount": valor,
+                      "status": "approved", "date_created": _agora()}
+            pag["refunds"].append(refund)
+            reembolsado = sum(r["amount"] for r in pag["refunds"])
+            if reembolsado >= pag["transaction_amount"]:
+                pag["status"] = pag["status_detail"] = "refunded"
+            else:
+                pag["status_detail"] = "partially_refunded"
+            pag["transaction_amount_refunded"] = reembolsado
+            if chave:
+                self.reembolsos_por_chave[chave] = refund
+            self.contadores["reembolsos"] += 1
+        self.notificar(pid)
+        return refund
+
+    def pagar_preferencia(self, pref_id: str, base_url: str) -> dict | None:
+        with self.lock:
+            pref = self.preferencias.get(pref_id)
+        if pref is None:
+            return None
+        itens = pref.get("items") or []
+        valor = sum(Decimal(str(i.get("unit_price") or 0)) * int(i.get("quantity") or 1) for i in itens)
+        return self.criar_pagamento({
+            "transaction_amount": float(valor),
+            "payment_method_id": "visa",
+            "description": (itens[0].get("title") if itens else "") or "",
+            "external_reference": pref.get("external_reference"),
+            "metadata": pref.get("metadata"),
+            "notification_url": pref.get("notification_url"),
+            "payer": pref.get("payer"),
+        }, base_url, status="approved")
+
+    def buscar(self, filtros: dict) -> dict:
+        offset = int(filtros.get("offset") or 0)
+        limit = min(int(filtros.get("limit") or 30), 100)
+        ini, fim = filtros.get("begin_date"), filtros.get("end_date")
+        with self.lock:
+            itens = list(self.pagamentos.values())
+        if filtros.get("external_reference"):
+            itens = [p for p in itens if str(p["external_reference"]) == filtros["external_reference"]]
+        if filtros.get("status"):
+            itens = [p for p in itens if p["status"] == filtros["status"]]
+        # datas em ISO com o mesmo fuso: comparação textual basta para o simulador
+        if ini and "NOW" not in ini:
+            itens = [p for p in itens if p["date_created"] >= ini]
+        if fim and "NOW" not in fim:
+            itens = [p for p in itens if p["date_created"] <= fim]
+        itens.sort(key=lambda p: p["date_created"])
+        return {"results": itens[offset:offset + limit],
+                "paging": {"total": len(itens), "limit": limit, "offset": offset}}
+
+    # ------------------------------------------------------------------
+    def notificar(self, pid: int) -> None:
+        with self.lock:
+            pag = self.pagamentos.get(pid)
+            url = self.config.webhook_url or (pag or {}).get("notification_url")
+        if not url:
+            return
+        threading.Thread(target=self._enviar_webhook, args=(url, pid), daemon=True).start()
+
+    def _enviar_webhook(self, url: str, pid: int) -> None:
+        if self.config.atraso_webhook_ms:
+            time.sleep(self.config.atraso_webhook_ms / 1000)
+        corpo = json.dumps({"action": "payment.updated", "type": "payment", "data": {"id": str(pid)}}).encode()
+        req = urllib.request.Request(url, data=corpo, method="POST", headers={"Content-Type": "application/json"})
+        with self.lock:
+            self.webhooks_enviados[pid] = time.time()
+        try:
+            urllib.request.urlopen(req, timeout=10).close()
+            ok = True
+        except Exception as e:
+            ok = False
+            logger.warning("Simulador MP: webhook %s falhou: %s", url, e)
+        with self.lock:
+            self.contadores["webhooks" if ok else "webhooks_falhos"] += 1
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+_ROTAS = [
+    ("POST", re.compile(r"^/checkout/preferences$"), "criar_preferencia"),
+    ("GET", re.compile(r"^/checkout/preferences/(?P<id>[\w-]+)$"), "ler_preferencia"),
+    ("GET", re.compile(r"^/checkout/(?P<id>sim-\w+)$"), "pagina_checkout"),
+    ("POST", re.compile(r"^/v1/payments$"), "criar_pagamento"),
+    ("GET", re.compile(r"^/v1/payments/search$"), "buscar_pagamentos"),
+    ("GET", re.compile(r"^/v1/payments/(?P<id>\d+)$"), "ler_pagamento"),
+    ("PUT", re.compile(r"^/v1/payments/(?P<id>\d+)$"), "atualizar_pagamento"),
+    ("POST", re.compile(r"^/v1/payments/(?P<id>\d+)/refunds$"), "reembolsar"),
+    ("POST", re.compile(r"^/__simulador/preferencias/(?P<id>[\w-]+)/pagar$"), "pagar_preferencia"),
+    ("POST", re.compile(r"^/__simulador/pagamentos/(?P<id>\d+)/(?P<status>\w+)$"), "mudar_status"),
+    ("GET", re.compile(r"^/__simulador/estado$"), "estado"),
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "SimuladorMP/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, como a API real
+
+    @property
+    def estado(self) -> EstadoSimulador:
+        return self.server.estado
+
+    @property
+    def base_url(self) -> str:
+        host, porta = self.server.server_address[:2]
+        return f"http://{self.headers.get('Host') or f'{host}:{porta}'}"
+
+    def log_message(self, fmt, *args):  # silencioso; contadores em /__simulador/estado
+        pass
+
+    def _json(self, status: int, corpo) -> None:
+        dados = json.dumps(corpo, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _corpo(self) -> dict:
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        if not tamanho:
+            return {}
+        try:
+            return json.loads(self.rfile.read(tamanho) or b"{}")
+        except ValueError:
+            return {}
+
+    def _despachar(self, metodo: str) -> None:
+        url = urlparse(self.path)
+        corpo = self._corpo() if metodo in ("POST", "PUT") else {}
+        cfg = self.estado.config
+        with self.estado.lock:
+            self.estado.contadores["requisicoes"] += 1
+
+        simulada = not url.path.startswith(("/__simulador", "/checkout/sim-"))
+        if simulada:
+            if cfg.latencia_ms or cfg.jitter_ms:
+                time.sleep(max(0.0, random.gauss(cfg.latencia_ms, cfg.jitter_ms)) / 1000)
+            sorteio = random.random()
+            if sorteio < cfg.taxa_erro + cfg.taxa_limite:
+                with self.estado.lock:
+                    self.estado.contadores["erros_injetados"] += 1
+                if sorteio < cfg.taxa_erro:
+                    return self._json(500, {"message": "internal_error (simulado)", "status": 500})
+                return self._json(429, {"message": "too_many_requests (simulado)", "status": 429})
+
+        for m, padrao, nome in _ROTAS:
+            achou = padrao.match(url.path)
+            if m == metodo and achou:
+                filtros = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                return getattr(self, f"_r_{nome}")(corpo=corpo, filtros=filtros, **achou.groupdict())
+        self._json(404, {"message": "not_found", "status": 404})
+
+    def do_GET(self):
+        self._despachar("GET")
+
+    def do_POST(self):
+        self._despachar("POST")
+
+    def do_PUT(self):
+        self._despachar("PUT")
+
+    # ------------------------------------------------------------------
+    def _r_criar_preferencia(self, corpo, **_):
+        self._json(201, self.estado.criar_preferencia(corpo, self.base_url))
+
+    def _r_ler_preferencia(self, id, **_):
+        pref = self.estado.preferencias.get(id)
+        self._json(200, pref) if pref else self._json(404, {"message": "not_found", "status": 404})
+
+    def _r_pagina_checkout(self, id, **_):
+        html = (f"<html><body><h3>Simulador MP</h3><form method='post' "
+                f"action='/__simulador/preferencias/{id}/pagar'><button>Pagar</button></form></body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(html)))
+        self.end_headers()
+        self.wfile.write(html)
+
+    def _r_criar_pagamento(self, corpo, **_):
+        if not corpo.get("transaction_amount"):
+            return self._json(400, {"message": "transaction_amount is required", "status": 400})
+        self._json(201, self.estado.criar_pagamento(corpo, self.base_url))
+
+    def _r_ler_pagamento(self, id, **_):
+        pag = self.estado.pagamentos.get(int(id))
+        self._json(200, pag) if pag else self._json(404, {"message": "Payment not found", "status": 404})
+
+    def _r_atualizar_pagamento(self, id, corpo, **_):
+        pag = self.estado.mudar_status(int(id), corpo["status"]) if corpo.get("status") else self.estado.pagamentos.get(int(id))
+        self._json(200, pag) if pag else self._json(404, {"message": "Payment not found", "status": 404})
+
+    def _r_buscar_pagamentos(self, filtros, **_):
+        self._json(200, self.estado.buscar(filtros))
+
+    def _r_reembolsar(self, id, corpo, **_):
+        refund = self.estado.reembolsar(int(id), corpo, self.headers.get("x-idempotency-key") or "")
+        self._json(201, refund) if refund else self._json(404, {"message": "Payment not found", "status": 404})
+
+    def _r_pagar_preferencia(self, id, **_):
+        pag = self.estado.pagar_preferencia(id, self.base_url)
+        if pag is None:
+            return self._json(404, {"message": "not_found", "status": 404})
+        pref = self.estado.preferencias[id]
+        sucesso = (pref.get("back_urls") or {}).get("success")
+        if sucesso and "application/json" not in (self.headers.get("Accept") or ""):
+            self.send_response(303)
+            self.send_header("Location", f"{sucesso}?payment_id={pag['id']}&status=approved")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._json(201, pag)
+
+    def _r_mudar_status(self, id, status, **_):
+        pag = self.estado.mudar_status(int(id), status)
+        self._json(200, pag) if pag else self._json(404, {"message": "Payment not found", "status": 404})
+
+    def _r_estado(self, **_):
+        with self.estado.lock:
+            por_status = {}
+            for p in self.estado.pagamentos.values():
+                por_status[p["status"]] = por_status.get(p["status"], 0) + 1
+            self._json(200, {**self.estado.contadores, "preferencias": len(self.estado.preferencias),
+                             "pagamentos": por_status})
+
+
+class SimuladorMP(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco=("127.0.0.1", 8765), config: ConfigSimulador | None = None):
+        super().__init__(endereco, _Handler)
+        self.estado = EstadoSimulador(config or ConfigSimulador())
+
+    @property
+    def url(self) -> str:
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar_em_thread(self) -> threading.Thread:
+        t = threading.Thread(target=self.serve_forever, daemon=True)
+        t.start()
+        return t
@@ -4,7 +4,6 @@ import csv
 import json
 import logging
 from uuid import UUID
-from uuid import uuid4, UUID
 from django.core.files.storage import default_storage
 from io import BytesIO
 from types import SimpleNamespace
@@ -24,7 +23,7 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.exceptions import FieldDoesNotExist, PermissionDenied
+from django.core.exceptions import PermissionDenied
 from django.db import transaction, IntegrityError
 from django.db.models import Q, Sum, Count
 from django.http import Http404, HttpResponse, JsonResponse, FileResponse
@@ -33,13 +32,13 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils import timezone as dj_tz
 from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.core.exceptions import ValidationError
 from .models import Inscricao, EventoAcampamento, InscricaoStatus
 from django.db.models import Prefetch, Count, Q
 from decimal import Decimal
-from django.core.files.base import ContentFile
 import re
 from datetime import date, datetime
 import uuid
@@ -53,12 +52,25 @@ from django.utils.dateparse import parse_date, parse_datetime
 from .models import EventoAcampamento, Participante, Inscricao, InscricaoCasais
 from .forms import ParticipanteInicialForm, InscricaoCasaisForm
 # ——— Terceiros
-import mercadopago
 import qrcode
 from django.forms import modelform_factory
 
 # ——— App (helpers, models, forms)
 from .helpers_mp_owner import mp_owner_client
+from .services import inscricao_completa
+from .services.fotos import registrar_foto, vincular_foto
+from .services.financeiro import TAXA_SISTEMA_DEFAULT, financeiro_evento, recalcular_resumos, resumo_evento
+from .services.miniaturas import url_miniatura
+from .services.paginas_publicas import pagina_publica
+from .services.politica import politica_atual
+from .services.mp_clients import MPIndisponivel, cliente_paroquia
+from .services.mp_sync import mp_client_by_paroquia, sincronizar_pagamento
+from .services.mp_webhook_inbox import ler_rota, registrar_notificacao, url_com_rota
+from .services.pagamento_status import estado_em_cache
+from .services.repasse_lote import gerar_repasses
+from .services.sala_espera import (
+    POLL_SEGUNDOS, config_evento, controlar_admissao, evento_id_por_slug, gravar_cookies, liberar, verificar,
+)
 
 from .models import (
     MercadoPagoConfig,
@@ -83,12 +95,14 @@ from .models import (
     InscricaoEvento,
     InscricaoRetiro,
     Repasse,
+    ResumoFinanceiroEvento,
     MercadoPagoOwnerConfig,
     BaseInscricao,
     Ministerio,
     Grupo,
     AlocacaoGrupo,
-    AlocacaoMinisterio
+    AlocacaoMinisterio,
+    ArquivoFoto,
 )
 
 from .forms import (
@@ -705,6 +719,7 @@ def evento_deletar(request, pk):
     return render(request, "inscricoes/evento_confirm_delete.html", {"obj": evento, "tipo": "Evento"})
 
 
+@pagina_publica("evento_publico")
 def inscricao_evento_publico(request, slug):
     evento = get_object_or_404(EventoAcampamento, slug=slug)
     # Aqui você pode colocar lógica para mostrar o formulário de inscrição, dados do evento, etc.
@@ -716,6 +731,7 @@ def inscricao_evento_publico(request, slug):
 from .models import PoliticaPrivacidade
 
 
+from .utils.cpf import cpf_digitos
 from .utils.eventos import tipo_efetivo_evento
 
 def ver_inscricao(request, pk):
@@ -737,7 +753,7 @@ def ver_inscricao(request, pk):
     else:
         inscricao_status = 1
 
-    politica = PoliticaPrivacidade.objects.first()
+    politica = politica_atual()
 
     # --- tipo efetivo cobre "servos vinculado a casais" ---
     tipo_efetivo = tipo_efetivo_evento(inscricao.evento)
@@ -968,10 +984,8 @@ def incluir_pagamento(request, inscricao_id):
                 pagamento.comprovante = comprovante
                 pagamento.save()
 
-            # Marca a inscrição como pagamento confirmado
-            if not inscricao.pagamento_confirmado:
-                inscricao.pagamento_confirmado = True
-                inscricao.save()
+            # inscrição (e par) são confirmados pelo post_save do Pagamento
+            # (services.pagamento_confirmacao)
 
             messages.success(request, 'Pagamento incluído com sucesso!')
             return redirect('inscricoes:evento_participantes', evento_id=inscricao.evento.id)
@@ -994,17 +1008,21 @@ def incluir_pagamento(request, inscricao_id):
         'pagamento': Pagamento.objects.filter(inscricao=inscricao).first(),
     })
 
+def _inscricao_inicial_cacheavel(request) -> bool:
+    # só a página "em branco": sem retomada (querystring) nem etapa de endereço na sessão
+    return not request.GET and "participante_id" not in request.session
+
+
+@controlar_admissao("slug")
+@pagina_publica("inscricao_inicial", cacheavel=_inscricao_inicial_cacheavel)
 def inscricao_inicial(request, slug):
     import re
 
     def _digits(s: str | None) -> str:
         return re.sub(r'\D', '', s or '')
 
-    def _fmt_cpf(d: str) -> str:
-        return f"{d[0:3]}.{d[3:6]}.{d[6:9]}-{d[9:11]}" if len(d) == 11 else d
-
     evento = get_object_or_404(EventoAcampamento, slug=slug)
-    politica = PoliticaPrivacidade.objects.first()
+    politica = politica_atual()
     hoje = dj_tz.localdate()
 
     # Usa o tipo efetivo (pode “virar” casais quando servos vinculado a casais)
@@ -1046,8 +1064,8 @@ def inscricao_inicial(request, slug):
 
             # -------- Participante 1 --------
             p1, _ = Participante.objects.get_or_create(
-                cpf=cpf1,
-                defaults={'nome': nome1, 'cidade': cidade}
+                cpf_digitos=cpf1,
+                defaults={'cpf': cpf1, 'nome': nome1, 'cidade': cidade}
             )
             mudou1 = False
             if nome1 and (p1.nome or '').strip() != nome1:
@@ -1077,8 +1095,8 @@ def inscricao_inicial(request, slug):
             # -------- Participante 2 (opcional) --------
             if cpf2:
                 p2, created2 = Participante.objects.get_or_create(
-                    cpf=cpf2,
-                    defaults={'nome': nome2, 'cidade': cidade}
+                    cpf_digitos=cpf2,
+                    defaults={'cpf': cpf2, 'nome': nome2, 'cidade': cidade}
                 )
                 mudou2 = False
                 if nome2 and (p2.nome or '').strip() != nome2:
@@ -1166,8 +1184,9 @@ def inscricao_inicial(request, slug):
     if request.method == 'POST' and inicial_form.is_valid():
         cpf = _digits(inicial_form.cleaned_data['cpf'])
         participante, created = Participante.objects.get_or_create(
-            cpf=cpf,
+            cpf_digitos=cpf,
             defaults={
+                'cpf': cpf,
                 'nome': inicial_form.cleaned_data['nome'],
                 'email': inicial_form.cleaned_data['email'],
                 'telefone': inicial_form.cleaned_data['telefone']
@@ -1209,9 +1228,6 @@ from .models import Participante, Inscricao
 def _digits(s: str | None) -> str:
     return re.sub(r'\D', '', s or '')
 
-def _fmt_cpf(d: str) -> str:
-    return f"{d[0:3]}.{d[3:6]}.{d[6:9]}-{d[9:11]}" if len(d) == 11 else d
-
 @require_GET
 def ajax_buscar_conjuge(request):
     """
@@ -1226,10 +1242,7 @@ def ajax_buscar_conjuge(request):
     if len(cpf) != 11:
         return JsonResponse({'ok': False, 'erro': 'cpf_invalido'})
 
-    # tenta achar participante por CPF em ambas formas (com/sem máscara)
-    possiveis_cpfs = {_fmt_cpf(cpf), cpf}
-
-    p = Participante.objects.filter(cpf__in=possiveis_cpfs).first()
+    p = Participante.objects.por_cpf(cpf).first()
     if not p:
         # não tem cadastro ainda — ok (não bloqueia)
         return JsonResponse({'ok': True, 'nome': None, 'participante_id': None, 'inscricao_id': None})
@@ -1244,13 +1257,12 @@ def ajax_buscar_conjuge(request):
     return JsonResponse(payload)
 
 
+@controlar_admissao("evento_id", json=True)
 def buscar_participante_ajax(request):
-    cpf = (request.GET.get('cpf') or '').replace('.', '').replace('-', '')
     evento_id = request.GET.get('evento_id')
 
-    try:
-        participante = Participante.objects.get(cpf=cpf)
-    except Participante.DoesNotExist:
+    participante = Participante.objects.por_cpf(request.GET.get('cpf')).first()
+    if participante is None:
         return JsonResponse({'ja_inscrito': False})
 
     # Tenta achar a inscrição deste evento
@@ -1288,11 +1300,12 @@ def buscar_participante_ajax(request):
 
 
 
+@controlar_admissao("inscricao_id")
 def formulario_personalizado(request, inscricao_id):
     # Obtém a inscrição, evento e política de privacidade
     inscricao = get_object_or_404(Inscricao, id=inscricao_id)
     evento = inscricao.evento
-    politica = PoliticaPrivacidade.objects.first()
+    politica = politica_atual()
 
     # Mapeia tipo de evento → (FormClass, atributo OneToOne na Inscricao)
     form_map = {
@@ -1393,13 +1406,14 @@ from .models import Inscricao, PoliticaPrivacidade, Filho
 from .forms import ContatoForm, FilhoForm
 
 
+@controlar_admissao("inscricao_id")
 def formulario_contato(request, inscricao_id):
     # Recupera a inscrição
     inscricao = get_object_or_404(Inscricao, id=inscricao_id)
 
     # Evento e política
     evento = inscricao.evento
-    politica = PoliticaPrivacidade.objects.first()
+    politica = politica_atual()
 
     # Só cria formset de filhos se for evento de casais
     filhos_formset = None
@@ -1478,11 +1492,12 @@ def formulario_contato(request, inscricao_id):
 
 
 
+@controlar_admissao("inscricao_id")
 def formulario_saude(request, inscricao_id):
     inscricao = get_object_or_404(Inscricao, id=inscricao_id)
     evento = inscricao.evento
     participante = inscricao.participante
-    politica = PoliticaPrivacidade.objects.first()
+    politica = politica_atual()
 
     # Mapeia tipo → modelo correto da BaseInscricao (inclui novos tipos)
     model_map = {
@@ -1553,7 +1568,9 @@ def formulario_saude(request, inscricao_id):
                 inscricao.save(update_fields=['inscricao_enviada'])
 
             messages.success(request, "Dados de saúde enviados com sucesso.")
-            return redirect('inscricoes:ver_inscricao', pk=inscricao.id)
+            resp = redirect('inscricoes:ver_inscricao', pk=inscricao.id)
+            liberar(request, resp, inscricao.evento_id)  # vaga da sala de espera volta para a fila
+            return resp
         else:
             # Debug opcional
             print("Erros no DadosSaudeForm:", form_saude.errors)
@@ -1570,6 +1587,100 @@ def formulario_saude(request, inscricao_id):
 
 
 
+def _destino_sala_espera(request, evento) -> str:
+    destino = request.GET.get("next") or ""
+    if not url_has_allowed_host_and_scheme(destino, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        destino = reverse("inscricoes:inscricao_inicial", args=[evento.slug])
+    return destino
+
+
+@never_cache
+def sala_espera(request, slug):
+    """Fila da abertura das inscrições (services.sala_espera); segue para `next` quando chega a vez."""
+    evento = get_object_or_404(EventoAcampamento, slug=slug)
+    destino = _destino_sala_espera(request, evento)
+    cfg = config_evento(evento.pk)
+    if cfg is None:
+        return redirect(destino)
+
+    passe = verificar(request, cfg)
+    if passe.admitido:
+        resp = redirect(destino)
+    else:
+        resp = render(request, "inscricoes/sala_espera.html", {
+            "evento": evento,
+            "passe": passe,
+            "destino": destino,
+            "status_url": reverse("inscricoes:sala_espera_status", args=[evento.slug]),
+            "poll_segundos": POLL_SEGUNDOS,
+        })
+    gravar_cookies(resp, request, cfg, passe)
+    return resp
+
+
+@never_cache
+@require_GET
+def sala_espera_status(request, slug):
+    """Polling da sala de espera: só cache, sem tocar no banco."""
+    evento_id = evento_id_por_slug(slug)
+    cfg = config_evento(evento_id) if evento_id else None
+    if cfg is None:
+        return JsonResponse({"admitido": True})
+    passe = verificar(request, cfg)
+    resp = JsonResponse({"admitido": passe.admitido, "posicao": passe.posicao,
+                         "espera_segundos": passe.espera_segundos})
+    gravar_cookies(resp, request, cfg, passe)
+    return resp
+
+
+@require_POST
+@controlar_admissao("slug", json=True)
+def api_inscricao(request, slug):
+    """
+    Inscrição completa numa requisição só (todas as etapas do fluxo HTML).
+    Corpo JSON {"participante": {...}, "endereco": {...}, "personalizado": {...},
+    "contato": {...}, "saude": {...}, "consentimento_envio": true} ou multipart
+    com o mesmo JSON no campo "dados" e os arquivos com prefixo ("saude-foto").
+    Erros: 400 com {"erros": {etapa: {campo: [mensagens]}}}; nada é gravado.
+    """
+    evento = get_object_or_404(EventoAcampamento, slug=slug)
+    hoje = dj_tz.localdate()
+    if hoje < evento.inicio_inscricoes or hoje > evento.fim_inscricoes:
+        return JsonResponse({"ok": False, "erro": "Inscrições encerradas."}, status=403)
+    if not inscricao_completa.aceita_api(evento):
+        url = reverse("inscricoes:inscricao_inicial", args=[evento.slug])
+        return JsonResponse({"ok": False, "erro": "Use o formulário da página.", "next_url": url}, status=400)
+
+    try:
+        if request.content_type == "application/json":
+            dados = json.loads(request.body or "{}")
+        else:
+            dados = json.loads(request.POST.get("dados") or "{}")
+    except ValueError:
+        return JsonResponse({"ok": False, "erro": "JSON inválido."}, status=400)
+    if not isinstance(dados, dict):
+        return JsonResponse({"ok": False, "erro": "JSON inválido."}, status=400)
+
+    res = inscricao_completa.enviar_inscricao(
+        evento, dados, request.FILES,
+        consentimento=dados.get("consentimento_envio") in (True, "sim"),
+        request=request,
+    )
+    if res.erros:
+        return JsonResponse({"ok": False, "erros": res.erros}, status=400)
+
+    prog = _proxima_etapa_forms(res.inscricao)
+    resp = JsonResponse({
+        "ok": True,
+        "inscricao_id": res.inscricao.id,
+        "criada": res.criada,
+        "next_url": prog["next_url"],
+    }, status=201 if res.criada else 200)
+    liberar(request, resp, evento.pk)
+    return resp
+
+
 def preencher_dados_contato(request, inscricao_id):
     inscricao = get_object_or_404(Inscricao, id=inscricao_id)
     participante = inscricao.participante  # Associe ao participante da inscrição
@@ -1591,7 +1702,7 @@ def preencher_dados_contato(request, inscricao_id):
 def form_inscricao(request):
     if request.method == "POST":
         cpf = request.POST.get("cpf")
-        participante, criado = Participante.objects.get_or_create(cpf=cpf)
+        participante, criado = Participante.objects.get_or_create(cpf_digitos=cpf_digitos(cpf), defaults={"cpf": cpf})
         participante.nome = request.POST.get("nome")
         participante.email = request.POST.get("email")
         participante.telefone = request.POST.get("telefone")
@@ -1975,6 +2086,7 @@ def download_logs(request):
         return HttpResponse("Arquivo de log não encontrado.", status=404)
     
 @require_GET
+@pagina_publica("video_evento")
 def pagina_video_evento(request, slug):
     evento = get_object_or_404(EventoAcampamento, slug=slug)
     # Se houver relação OneToOne chamada "video"
@@ -2032,7 +2144,7 @@ def verificar_selecao(request, evento_id):
     cpf = request.GET.get('cpf', '').strip()
     if cpf:
         try:
-            participante = Participante.objects.get(cpf=cpf)
+            participante = Participante.objects.por_cpf(cpf).get()
             inscricao = Inscricao.objects.get(
                 evento=evento,
                 participante=participante
@@ -2083,7 +2195,7 @@ def mp_config(request):
     else:
         form = MercadoPagoConfigForm(instance=config)
 
-    politica = PoliticaPrivacidade.objects.first()
+    politica = politica_atual()
 
     return render(
         request,
@@ -2097,43 +2209,40 @@ def mp_config(request):
 
 # ===== Helpers ===============================================================
 
-def _mp_client_by_paroquia(paroquia):
-    cfg = getattr(paroquia, "mp_config", None)
-    if not cfg or not cfg.access_token:
-        raise ValueError("Mercado Pago não configurado para esta paróquia.")
-    return mercadopago.SDK(cfg.access_token.strip())
+_mp_client_by_paroquia = mp_client_by_paroquia
+_sincronizar_pagamento = sincronizar_pagamento
 
-def _sincronizar_pagamento(mp_client, inscricao, payment_id):
-    """
-    Busca o pagamento no MP, garante que o external_reference bate com a inscrição
-    e sincroniza o registro OneToOne Pagamento dessa inscrição.
-    """
-    payment = mp_client.payment().get(payment_id)["response"]
-
-    # Segurança: confere vínculo
-    if str(payment.get("external_reference")) != str(inscricao.id):
-        raise ValueError("Pagamento não corresponde à inscrição.")
-
-    # Atualiza sempre o mesmo registro (OneToOne)
-    pagamento, _ = Pagamento.objects.get_or_create(inscricao=inscricao)
-    pagamento.transacao_id = str(payment.get("id") or "")
-    pagamento.metodo = payment.get("payment_method_id", Pagamento.MetodoPagamento.PIX)
-    pagamento.valor = payment.get("transaction_amount", 0) or 0
-
-    status = payment.get("status")
-    if status == "approved":
-        pagamento.status = Pagamento.StatusPagamento.CONFIRMADO
-        inscricao.pagamento_confirmado = True
-        inscricao.inscricao_concluida = True
-        inscricao.save(update_fields=["pagamento_confirmado", "inscricao_concluida"])
-    elif status in ("pending", "in_process"):
-        pagamento.status = Pagamento.StatusPagamento.PENDENTE
-    else:
-        pagamento.status = Pagamento.StatusPagamento.CANCELADO
+# circuito do MP aberto (services.mp_clients): resposta imediata, sem prender o worker
+MSG_MP_INDISPONIVEL = "O Mercado Pago está instável no momento. Tente novamente em alguns minutos."
+
+
+def _preferencia_valida(inscricao):
+    """Pagamento com preferência do Checkout Pro reaproveitável (mesmo valor e pagador), ou None."""
+    pgto = Pagamento.objects.filter(inscricao=inscricao).first()
+    if pgto and pgto.preferencia_reutilizavel(inscricao.evento.valor_inscricao, inscricao.participante.email):
+        return pgto
+    return None
 
-    pagamento.data_pagamento = parse_datetime(payment.get("date_approved")) if payment.get("date_approved") else None
-    pagamento.save()
-    return status
+
+def _validade_preferencia():
+    return (dj_tz.now() + Pagamento.PREFERENCIA_VALIDADE).replace(microsecond=0)
+
+
+def _guardar_preferencia(inscricao, resp, init_point, expira_em):
+    """Cria/atualiza o pagamento pendente (auditoria) guardando a preferência para reuso."""
+    Pagamento.objects.update_or_create(
+        inscricao=inscricao,
+        defaults={
+            "valor": inscricao.evento.valor_inscricao,
+            "status": Pagamento.StatusPagamento.PENDENTE,
+            "metodo": Pagamento.MetodoPagamento.PIX,  # o método real vem no webhook
+            "mp_preference_id": str(resp.get("id") or ""),
+            "mp_init_point": init_point,
+            "mp_preference_valor": inscricao.evento.valor_inscricao,
+            "mp_preference_email": inscricao.participante.email or "",
+            "mp_preference_expira_em": expira_em,
+        },
+    )
 
 
 # ===== Iniciar pagamento =====================================================
@@ -2150,6 +2259,11 @@ def iniciar_pagamento(request, inscricao_id):
         messages.info(request, "Pagamento já confirmado para esta inscrição.")
         return redirect("inscricoes:ver_inscricao", inscricao.id)
 
+    # Preferência anterior ainda vale → vai direto ao checkout, sem chamar o MP
+    pgto = _preferencia_valida(inscricao)
+    if pgto:
+        return redirect(pgto.mp_init_point)
+
     # Config da Paróquia
     try:
         config = inscricao.paroquia.mp_config
@@ -2162,7 +2276,7 @@ def iniciar_pagamento(request, inscricao_id):
         messages.error(request, "Pagamento não configurado. Entre em contato com a organização.")
         return redirect("inscricoes:pagina_de_contato")
 
-    sdk = mercadopago.SDK(access_token)
+    sdk = cliente_paroquia(inscricao.paroquia_id, access_token)
 
     # URLs baseadas no request (local)…
     sucesso_url = request.build_absolute_uri(reverse("inscricoes:mp_success", args=[inscricao.id]))
@@ -2177,6 +2291,9 @@ def iniciar_pagamento(request, inscricao_id):
         falha_url   = urljoin(site_domain, reverse("inscricoes:mp_failure", args=[inscricao.id]))
         pend_url    = urljoin(site_domain, reverse("inscricoes:mp_pending", args=[inscricao.id]))
         webhook_url = urljoin(site_domain, reverse("inscricoes:mp_webhook"))
+    # paróquia assinada na URL: o worker já sabe qual credencial usar
+    webhook_url = url_com_rota(webhook_url, inscricao.paroquia_id)
+    expira_em = _validade_preferencia()
 
     pref_data = {
         "items": [{
@@ -2189,13 +2306,15 @@ def iniciar_pagamento(request, inscricao_id):
         "external_reference": str(inscricao.id),
         "back_urls": {"success": sucesso_url, "failure": falha_url, "pending": pend_url},
         "notification_url": webhook_url,
+        "expires": True,
+        "expiration_date_to": expira_em.isoformat(timespec="milliseconds"),
         # "payment_methods": {"installments": 1},  # habilite se quiser travar parcelas
         # "binary_mode": True,                     # opcional (aprova ou rejeita; sem "in_process")
         "metadata": {
             "inscricao_id": inscricao.id,
             "paroquia_id": inscricao.paroquia_id,
             "evento_id": str(inscricao.evento_id),
-            "criado_em": now().isoformat(),
+            "criado_em": dj_tz.now().isoformat(),
         },
     }
 
@@ -2227,18 +2346,15 @@ def iniciar_pagamento(request, inscricao_id):
         if not init_point.lower().startswith(("http://", "https://")):
             init_point = "https://" + init_point
 
-        # Agora sim, cria/atualiza registro pendente para auditoria
-        Pagamento.objects.update_or_create(
-            inscricao=inscricao,
-            defaults={
-                "valor": inscricao.evento.valor_inscricao,
-                "status": Pagamento.StatusPagamento.PENDENTE,
-                "metodo": Pagamento.MetodoPagamento.PIX,  # o método real vem no webhook
-            },
-        )
+        # Agora sim, cria/atualiza registro pendente para auditoria (e reuso)
+        _guardar_preferencia(inscricao, resp, init_point, expira_em)
 
         return redirect(init_point)
 
+    except MPIndisponivel as e:
+        logging.warning("Checkout recusado sem chamar o MP: %s", e)
+        messages.error(request, MSG_MP_INDISPONIVEL)
+        return redirect("inscricoes:ver_inscricao", inscricao.id)
     except Exception as e:
         logging.exception("Erro ao criar preferência do Mercado Pago: %s", e)
         if settings.DEBUG:
@@ -2273,7 +2389,7 @@ def mp_success(request, inscricao_id):
             logging.exception("Erro ao validar sucesso MP: %s", e)
 
     # Carrega a política (onde você colocou logo/imagens, inclusive 'imagem_pagto')
-    politica = PoliticaPrivacidade.objects.order_by("-id").first()
+    politica = politica_atual()
 
     # Monta a URL do vídeo de boas-vindas (o botão que permanece)
     video_url = reverse("inscricoes:pagina_video_evento", kwargs={"slug": evento.slug})
@@ -2308,7 +2424,9 @@ def mp_failure(request, inscricao_id):
 @csrf_exempt
 def mp_webhook(request):
     """
-    Produção: consulta pagamento na API do MP e sincroniza por external_reference.
+    Produção: grava a notificação na caixa de entrada (NotificacaoMercadoPago)
+    e responde 200 na hora; o worker consulta o MP e sincroniza depois.
+    A paróquia vem assinada no ?r= da notification_url (uma consulta ao MP).
     DEBUG: se payload trouxer 'test': {'inscricao_id': ..., 'status': ...},
            atualiza direto sem chamar o MP.
     """
@@ -2330,9 +2448,6 @@ def mp_webhook(request):
 
                 if status in ("approved", "confirmado"):
                     pagamento.status = Pagamento.StatusPagamento.CONFIRMADO
-                    inscricao.pagamento_confirmado = True
-                    inscricao.inscricao_concluida = True
-                    inscricao.save(update_fields=["pagamento_confirmado", "inscricao_concluida"])
                 elif status in ("pending", "in_process", "pendente"):
                     pagamento.status = Pagamento.StatusPagamento.PENDENTE
                 else:
@@ -2344,32 +2459,20 @@ def mp_webhook(request):
                 return HttpResponse(status=200)
         # --------------------------------------------------------
 
-        # Fluxo normal (produção): extrai payment_id e descobre external_reference
+        # Fluxo normal (produção): só grava na caixa de entrada e responde.
+        # Consulta ao MP e sincronização rodam no worker (processar_notificacoes_mp).
         payment_id = (payload.get("data") or {}).get("id") or payload.get("id")
         if not payment_id:
             logging.warning("Webhook sem payment_id: %s", payload)
             return HttpResponse(status=200)
 
-        # 1ª consulta (qualquer token) só para descobrir external_reference
-        cfg_any = MercadoPagoConfig.objects.first()
-        if not cfg_any or not cfg_any.access_token:
-            logging.error("Nenhuma configuração do MP encontrada.")
-            return HttpResponse(status=200)
-
-        mp_any = mercadopago.SDK(cfg_any.access_token.strip())
-        payment_tmp = mp_any.payment().get(payment_id).get("response", {})
-        inscricao_id = payment_tmp.get("external_reference")
-        if not inscricao_id:
-            logging.error("Pagamento %s sem external_reference.", payment_id)
-            return HttpResponse(status=200)
-
-        inscricao = get_object_or_404(Inscricao, id=inscricao_id)
-
-        # Reconsulta com a credencial da paróquia correta e sincroniza
-        mp = _mp_client_by_paroquia(inscricao.paroquia)
-        _sincronizar_pagamento(mp, inscricao, payment_id)
-
-        logging.info("Webhook OK para pagamento %s (inscrição %s)", payment_id, inscricao_id)
+        try:
+            # ?r= assinado pela própria app; assinatura inválida → fluxo legado
+            registrar_notificacao(payment_id, payload, paroquia_id=ler_rota(request.GET.get("r")))
+        except Exception as e:
+            # não gravou → deixa o MP reentregar
+            logging.exception("Erro ao gravar webhook MP %s: %s", payment_id, e)
+            return HttpResponse(status=500)
         return HttpResponse(status=200)
 
     except Exception as e:
@@ -2620,7 +2723,7 @@ def qr_code_png(request, token):
 
 def aguardando_pagamento(request, inscricao_id):
     """
-    Cria a preferência no MP e mostra uma página 'Aguardando pagamento'.
+    Cria (ou reaproveita) a preferência no MP e mostra uma página 'Aguardando pagamento'.
     A página abre o Checkout em nova aba e começa a fazer polling no backend.
     """
     inscricao = get_object_or_404(Inscricao, id=inscricao_id)
@@ -2632,6 +2735,14 @@ def aguardando_pagamento(request, inscricao_id):
     if inscricao.pagamento_confirmado:
         return redirect("inscricoes:mp_success", inscricao.id)
 
+    # Preferência anterior ainda vale → reaproveita
+    pgto = _preferencia_valida(inscricao)
+    if pgto:
+        return render(request, "pagamentos/aguardando.html", {
+            "inscricao": inscricao,
+            "init_point": pgto.mp_init_point,
+        })
+
     # Config MP
     try:
         cfg = inscricao.paroquia.mp_config
@@ -2644,14 +2755,15 @@ def aguardando_pagamento(request, inscricao_id):
         messages.error(request, "Pagamento não configurado.")
         return redirect("inscricoes:pagina_de_contato")
 
-    sdk = mercadopago.SDK(access_token)
+    sdk = cliente_paroquia(inscricao.paroquia_id, access_token)
 
     # URLs absolutas no seu domínio
     sucesso_url = request.build_absolute_uri(reverse("inscricoes:mp_success", args=[inscricao.id]))
     falha_url   = request.build_absolute_uri(reverse("inscricoes:mp_failure", args=[inscricao.id]))
     pend_url    = request.build_absolute_uri(reverse("inscricoes:mp_pending", args=[inscricao.id]))
-    # notification_url precisa ser público e HTTPS
-    webhook_url = request.build_absolute_uri(reverse("inscricoes:mp_webhook"))
+    # notification_url precisa ser público e HTTPS (com a paróquia assinada)
+    webhook_url = url_com_rota(request.build_absolute_uri(reverse("inscricoes:mp_webhook")), inscricao.paroquia_id)
+    expira_em = _validade_preferencia()
 
     pref_data = {
         "items": [{
@@ -2665,6 +2777,9 @@ def aguardando_pagamento(request, inscricao_id):
         "back_urls": {"success": sucesso_url, "failure": falha_url, "pending": pend_url},
         "auto_return": "approved",               # só cartão aprovado redireciona
         "notification_url": webhook_url,        # webhook é a 'fonte da verdade'
+        "expires": True,
+        "expiration_date_to": expira_em.isoformat(timespec="milliseconds"),
+        "metadata": {"inscricao_id": inscricao.id, "paroquia_id": inscricao.paroquia_id},
     }
 
     try:
@@ -2682,21 +2797,18 @@ def aguardando_pagamento(request, inscricao_id):
             messages.error(request, "Preferência criada sem link de checkout.")
             return redirect("inscricoes:ver_inscricao", inscricao.id)
 
-        # marca/garante pagamento pendente (auditoria)
-        Pagamento.objects.update_or_create(
-            inscricao=inscricao,
-            defaults={
-                "valor": inscricao.evento.valor_inscricao,
-                "status": Pagamento.StatusPagamento.PENDENTE,
-                "metodo": Pagamento.MetodoPagamento.PIX,
-            },
-        )
+        # marca/garante pagamento pendente (auditoria) e guarda a preferência
+        _guardar_preferencia(inscricao, resp, init_point, expira_em)
 
         # Renderiza página que abre o MP em nova aba e faz polling
         return render(request, "pagamentos/aguardando.html", {
             "inscricao": inscricao,
             "init_point": init_point,
         })
+    except MPIndisponivel as e:
+        logging.warning("Checkout recusado sem chamar o MP: %s", e)
+        messages.error(request, MSG_MP_INDISPONIVEL)
+        return redirect("inscricoes:ver_inscricao", inscricao.id)
     except Exception as e:
         logging.exception("Erro ao criar preferência MP: %s", e)
         if settings.DEBUG:
@@ -2705,27 +2817,23 @@ def aguardando_pagamento(request, inscricao_id):
         return redirect("inscricoes:ver_inscricao", inscricao.id)
 
 
-@require_GET
-def status_pagamento(request, inscricao_id):
-    """
-    API simples para o polling no front.
-    Retorna o status atual do Pagamento da inscrição.
-    """
-    inscricao = get_object_or_404(Inscricao, id=inscricao_id)
-    pgto = Pagamento.objects.filter(inscricao=inscricao).first()
+def _pix_expires_at(expira_em) -> str:
+    """Formato exigido pelo MP e usado no countdown do template (ISO UTC)."""
+    return expira_em.astimezone(dt_tz.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
 
-    status = "pendente"
-    if pgto:
-        if pgto.status == Pagamento.StatusPagamento.CONFIRMADO:
-            status = "confirmado"
-        elif pgto.status == Pagamento.StatusPagamento.CANCELADO:
-            status = "cancelado"
 
-    return JsonResponse({
-        "status": status,
-        "pagamento_confirmado": inscricao.pagamento_confirmado,
+def _render_pix(request, inscricao, payment_id, qr_code_text, qr_code_base64, ticket_url, expira_em):
+    return render(request, "pagamentos/pix.html", {
+        "inscricao": inscricao,
+        "payment_id": payment_id,
+        "qr_code_text": qr_code_text,
+        "qr_code_base64": qr_code_base64,  # data URI pronto para <img src="{{ qr_code_base64 }}">
+        "ticket_url": ticket_url,
+        "expires_at": _pix_expires_at(expira_em),
+        "valor": float(inscricao.evento.valor_inscricao),
     })
 
+
 def iniciar_pagamento_pix(request, inscricao_id):
     inscricao = get_object_or_404(Inscricao, id=inscricao_id)
 
@@ -2736,6 +2844,14 @@ def iniciar_pagamento_pix(request, inscricao_id):
     if inscricao.pagamento_confirmado:
         return redirect("inscricoes:mp_success", inscricao.id)
 
+    # Cobrança ainda válida → serve do banco (refresh não cria outro PIX)
+    pgto = Pagamento.objects.filter(inscricao=inscricao).first()
+    if pgto and pgto.pix_reutilizavel(inscricao.evento.valor_inscricao):
+        return _render_pix(
+            request, inscricao, pgto.transacao_id, pgto.pix_qr_code, pgto.pix_qr_code_base64,
+            pgto.pix_ticket_url, pgto.pix_expira_em,
+        )
+
     # Credenciais da paróquia
     try:
         cfg = inscricao.paroquia.mp_config
@@ -2748,14 +2864,15 @@ def iniciar_pagamento_pix(request, inscricao_id):
         messages.error(request, "Pagamento não configurado.")
         return redirect("inscricoes:pagina_de_contato")
 
-    mp = mercadopago.SDK(access_token)
+    mp = cliente_paroquia(inscricao.paroquia_id, access_token)
 
     # URL absoluta e pública (HTTPS) para o webhook
     base = (getattr(settings, "SITE_URL", "") or "https://eismeaqui.app.br").rstrip("/") + "/"
-    notification_url = urljoin(base, reverse("inscricoes:mp_webhook").lstrip("/"))
+    notification_url = url_com_rota(urljoin(base, reverse("inscricoes:mp_webhook").lstrip("/")), inscricao.paroquia_id)
 
     # Expiração em 30 min — exigido pelo MP: YYYY-MM-DDTHH:MM:SS.000Z (UTC)
-    expires_at = (dj_tz.now().astimezone(dt_tz.utc) + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    expira_em = (dj_tz.now() + timedelta(minutes=30)).replace(microsecond=0)
+    expires_at = _pix_expires_at(expira_em)
 
     body = {
         "transaction_amount": float(inscricao.evento.valor_inscricao),
@@ -2765,6 +2882,7 @@ def iniciar_pagamento_pix(request, inscricao_id):
         "external_reference": str(inscricao.id),
         "notification_url": notification_url,
         "date_of_expiration": expires_at,
+        "metadata": {"inscricao_id": inscricao.id, "paroquia_id": inscricao.paroquia_id},
     }
 
     try:
@@ -2802,7 +2920,7 @@ def iniciar_pagamento_pix(request, inscricao_id):
             messages.error(request, "Não foi possível obter o QR do PIX. Tente de novo.")
             return redirect("inscricoes:ver_inscricao", inscricao.id)
 
-        # Registra/atualiza pagamento como pendente
+        # Registra/atualiza pagamento como pendente (com o QR, para reaproveitar)
         Pagamento.objects.update_or_create(
             inscricao=inscricao,
             defaults={
@@ -2810,20 +2928,20 @@ def iniciar_pagamento_pix(request, inscricao_id):
                 "status": Pagamento.StatusPagamento.PENDENTE,
                 "metodo": Pagamento.MetodoPagamento.PIX,
                 "transacao_id": str(payment_id or ""),
+                "pix_qr_code": qr_code_text,
+                "pix_qr_code_base64": qr_code_base64,
+                "pix_ticket_url": ticket_url or "",
+                "pix_expira_em": expira_em,
             }
         )
 
         # Renderiza a página com o QR no seu site
-        return render(request, "pagamentos/pix.html", {
-            "inscricao": inscricao,
-            "payment_id": payment_id,
-            "qr_code_text": qr_code_text,
-            "qr_code_base64": qr_code_base64,  # data URI pronto para <img src="{{ qr_code_base64 }}">
-            "ticket_url": ticket_url,
-            "expires_at": expires_at,
-            "valor": float(inscricao.evento.valor_inscricao),
-        })
+        return _render_pix(request, inscricao, payment_id, qr_code_text, qr_code_base64, ticket_url, expira_em)
 
+    except MPIndisponivel as e:
+        logging.warning("PIX recusado sem chamar o MP: %s", e)
+        messages.error(request, MSG_MP_INDISPONIVEL)
+        return redirect("inscricoes:ver_inscricao", inscricao.id)
     except Exception as e:
         logging.exception("Erro ao criar pagamento PIX: %s", e)
         if settings.DEBUG or request.GET.get("debug") == "1":
@@ -2834,17 +2952,23 @@ def iniciar_pagamento_pix(request, inscricao_id):
 
 @require_GET
 def status_pagamento(request, inscricao_id):
-    inscricao = get_object_or_404(Inscricao, id=inscricao_id)
-    pgto = Pagamento.objects.filter(inscricao=inscricao).first()
+    """
+    API do polling no front (fallback do WebSocket ws/pagamento/<id>/).
+    Responde do read model em cache (sem banco) com ETag; 304 se nada mudou.
+    """
+    registro = estado_em_cache(inscricao_id)
+    if registro is None:
+        raise Http404
 
-    status = "pendente"
-    if pgto:
-        if pgto.status == Pagamento.StatusPagamento.CONFIRMADO:
-            status = "confirmado"
-        elif pgto.status == Pagamento.StatusPagamento.CANCELADO:
-            status = "cancelado"
+    etag = f'"{inscricao_id}-{registro["versao"]}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        resp = HttpResponse(status=304)
+    else:
+        resp = JsonResponse({"status": registro["status"], "pagamento_confirmado": registro["pagamento_confirmado"]})
+    resp["ETag"] = etag
+    resp["Cache-Control"] = "no-cache"
+    return resp
 
-    return JsonResponse({"status": status, "pagamento_confirmado": inscricao.pagamento_confirmado})
 
 @require_http_methods(["GET", "POST"])
 def minhas_inscricoes_por_cpf(request):
@@ -2858,12 +2982,12 @@ def minhas_inscricoes_por_cpf(request):
 
     def _buscar_por_cpf(cpf_raw: str):
         """Normaliza e busca inscrições selecionadas do participante."""
-        cpf_limpo = "".join(c for c in (cpf_raw or "") if c.isdigit())
+        cpf_limpo = cpf_digitos(cpf_raw)
         if len(cpf_limpo) != 11:
             messages.error(request, "Informe um CPF válido (11 dígitos).")
             return None, []
         try:
-            p = Participante.objects.get(cpf=cpf_limpo)
+            p = Participante.objects.por_cpf(cpf_limpo).get()
         except Participante.DoesNotExist:
             messages.error(request, "CPF não encontrado em nosso sistema.")
             return None, []
@@ -2880,7 +3004,7 @@ def minhas_inscricoes_por_cpf(request):
         participante, inscricoes = _buscar_por_cpf(cpf_informado)
 
     # Envia a política pra exibir a logo no topo
-    politica = PoliticaPrivacidade.objects.order_by("-id").first()
+    politica = politica_atual()
 
     return render(request, "inscricoes/minhas_inscricoes.html", {
         "cpf_informado": cpf_informado,
@@ -2898,7 +3022,7 @@ def portal_participante(request):
         if not cpf.isdigit():
             messages.error(request, "CPF inválido. Digite apenas números.")
         else:
-            participante = Participante.objects.filter(cpf=cpf).first()
+            participante = Participante.objects.por_cpf(cpf).first()
             if participante:
                 # lista TODAS as inscrições do participante
                 inscricoes = (Inscricao.objects
@@ -2914,27 +3038,9 @@ def portal_participante(request):
     })
 
 
-@login_required
-@user_passes_test(is_admin_geral)
-def financeiro_geral(request):
-    """
-    Relatório consolidado por paróquia (e breakdown por evento).
-    Considera apenas pagamentos CONFIRMADOS.
-    Query params:
-      ?ini=YYYY-MM-DD&fim=YYYY-MM-DD&paroquia=<id>&fee=5.0
-    """
-    ini = parse_date(request.GET.get("ini") or "")
-    fim = parse_date(request.GET.get("fim") or "")
-    paroquia_id = request.GET.get("paroquia") or ""
-    fee_param = request.GET.get("fee")
-    try:
-        fee_percent = Decimal(fee_param) if fee_param is not None else settings.FEE_DEFAULT_PERCENT
-    except Exception:
-        fee_percent = settings.FEE_DEFAULT_PERCENT
-
-    pagamentos = Pagamento.objects.filter(
-        status=Pagamento.StatusPagamento.CONFIRMADO
-    ).select_related("inscricao__paroquia", "inscricao__evento")
+def _financeiro_por_periodo(ini, fim, paroquia_id):
+    """Agregados por paróquia e por evento direto de Pagamento (recorte por data de pagamento)."""
+    pagamentos = Pagamento.objects.filter(status=Pagamento.StatusPagamento.CONFIRMADO)
 
     # filtros de período (pela data_pagamento, caindo para data_inscricao se nulo)
     if ini:
@@ -2948,17 +3054,11 @@ def financeiro_geral(request):
     if paroquia_id:
         pagamentos = pagamentos.filter(inscricao__paroquia_id=paroquia_id)
 
-    # agregado por paróquia
     por_paroquia = (
         pagamentos.values("inscricao__paroquia_id", "inscricao__paroquia__nome")
-        .annotate(
-            total_bruto=Sum("valor"),
-            qtd=Count("id"),
-        )
+        .annotate(total_bruto=Sum("valor"), qtd=Count("id"))
         .order_by("inscricao__paroquia__nome")
     )
-
-    # breakdown por evento
     por_evento = (
         pagamentos.values(
             "inscricao__paroquia_id", "inscricao__paroquia__nome",
@@ -2967,6 +3067,56 @@ def financeiro_geral(request):
         .annotate(total_evento=Sum("valor"), qtd_evento=Count("id"))
         .order_by("inscricao__paroquia__nome", "inscricao__evento__nome")
     )
+    return por_paroquia, por_evento
+
+
+def _financeiro_consolidado(ini, fim, paroquia_id):
+    """
+    Sem período: lê ResumoFinanceiroEvento (uma linha por evento).
+    Com período: o resumo não tem recorte por data, então agrega Pagamento.
+    Mesmas chaves nos dois casos (o template usa os nomes de Pagamento).
+    """
+    if ini or fim:
+        return _financeiro_por_periodo(ini, fim, paroquia_id)
+
+    resumos = ResumoFinanceiroEvento.objects.filter(qtd_confirmados__gt=0)
+    if paroquia_id:
+        resumos = resumos.filter(paroquia_id=paroquia_id)
+    por_paroquia = (
+        resumos.values(inscricao__paroquia_id=F("paroquia_id"), inscricao__paroquia__nome=F("paroquia__nome"))
+        .annotate(total_bruto=Sum("bruto"), qtd=Sum("qtd_confirmados"))
+        .order_by("inscricao__paroquia__nome")
+    )
+    por_evento = (
+        resumos.values(
+            inscricao__paroquia_id=F("paroquia_id"), inscricao__paroquia__nome=F("paroquia__nome"),
+            inscricao__evento_id=F("evento_id"), inscricao__evento__nome=F("evento__nome"),
+            total_evento=F("bruto"), qtd_evento=F("qtd_confirmados"),
+        )
+        .order_by("paroquia__nome", "evento__nome")
+    )
+    return por_paroquia, por_evento
+
+
+@login_required
+@user_passes_test(is_admin_geral)
+def financeiro_geral(request):
+    """
+    Relatório consolidado por paróquia (e breakdown por evento).
+    Considera apenas pagamentos CONFIRMADOS.
+    Query params:
+      ?ini=YYYY-MM-DD&fim=YYYY-MM-DD&paroquia=<id>&fee=5.0
+    """
+    ini = parse_date(request.GET.get("ini") or "")
+    fim = parse_date(request.GET.get("fim") or "")
+    paroquia_id = request.GET.get("paroquia") or ""
+    fee_param = request.GET.get("fee")
+    try:
+        fee_percent = Decimal(fee_param) if fee_param is not None else getattr(settings, "FEE_DEFAULT_PERCENT", TAXA_SISTEMA_DEFAULT)
+    except Exception:
+        fee_percent = getattr(settings, "FEE_DEFAULT_PERCENT", TAXA_SISTEMA_DEFAULT)
+
+    por_paroquia, por_evento = _financeiro_consolidado(ini, fim, paroquia_id)
 
     # monta índice evento por paróquia
     eventos_idx = {}
@@ -3026,30 +3176,11 @@ def financeiro_geral_export(request):
     paroquia_id = request.GET.get("paroquia") or ""
     fee_param = request.GET.get("fee")
     try:
-        fee_percent = Decimal(fee_param) if fee_param is not None else settings.FEE_DEFAULT_PERCENT
+        fee_percent = Decimal(fee_param) if fee_param is not None else getattr(settings, "FEE_DEFAULT_PERCENT", TAXA_SISTEMA_DEFAULT)
     except Exception:
-        fee_percent = settings.FEE_DEFAULT_PERCENT
+        fee_percent = getattr(settings, "FEE_DEFAULT_PERCENT", TAXA_SISTEMA_DEFAULT)
 
-    pagamentos = Pagamento.objects.filter(
-        status=Pagamento.StatusPagamento.CONFIRMADO
-    ).select_related("inscricao__paroquia", "inscricao__evento")
-
-    if ini:
-        pagamentos = pagamentos.filter(
-            Q(data_pagamento__date__gte=ini) | Q(data_pagamento__isnull=True, inscricao__data_inscricao__date__gte=ini)
-        )
-    if fim:
-        pagamentos = pagamentos.filter(
-            Q(data_pagamento__date__lte=fim) | Q(data_pagamento__isnull=True, inscricao__data_inscricao__date__lte=fim)
-        )
-    if paroquia_id:
-        pagamentos = pagamentos.filter(inscricao__paroquia_id=paroquia_id)
-
-    por_paroquia = (
-        pagamentos.values("inscricao__paroquia_id", "inscricao__paroquia__nome")
-        .annotate(total_bruto=Sum("valor"), qtd=Count("id"))
-        .order_by("inscricao__paroquia__nome")
-    )
+    por_paroquia, _ = _financeiro_consolidado(ini, fim, paroquia_id)
 
     # CSV
     resp = HttpResponse(content_type="text/csv; charset=utf-8")
@@ -3194,97 +3325,49 @@ def admin_paroquia_delete_admin(request, user_id: int):
         url += f"?paroquia={request.GET.get('paroquia')}"
     return redirect(url)
 
-try:
-    from .finance_calc import calcular_financeiro_evento as _calc_financeiro_evento_external
-except Exception:
-    _calc_financeiro_evento_external = None
-
-
-# ===== CÁLCULO FINANCEIRO (com fallback) =====
-TAXA_SISTEMA_DEFAULT = Decimal("3.00")
-
-def calcular_financeiro_evento(evento, taxa_percentual=TAXA_SISTEMA_DEFAULT):
-    """
-    Se existir .finance_calc, delega para lá. Caso contrário,
-    calcula aqui com base nos Pagamentos confirmados do evento.
-    """
-    if _calc_financeiro_evento_external:
-        return _calc_financeiro_evento_external(evento, taxa_percentual)
-
-    pagos = Pagamento.objects.filter(
-        inscricao__evento=evento,
-        status=Pagamento.StatusPagamento.CONFIRMADO
-    )
-
-    bruto = pagos.aggregate(total=Sum("valor"))["total"] or Decimal("0.00")
-
-    # taxa do MP (se a coluna fee_mp existir)
-    try:
-        Pagamento._meta.get_field("fee_mp")
-        taxas_mp = pagos.aggregate(total=Sum("fee_mp"))["total"] or Decimal("0.00")
-    except FieldDoesNotExist:
-        taxas_mp = Decimal("0.00")
-
-    base = (bruto - taxas_mp).quantize(Decimal("0.01"))
-    taxa = (base * Decimal(taxa_percentual) / Decimal("100")).quantize(Decimal("0.01"))
-    liquido_paroquia = (base - taxa).quantize(Decimal("0.01"))
-
-    return {
-        "bruto": bruto,
-        "taxas_mp": taxas_mp,
-        "base_repasse": base,
-        "taxa_percent": Decimal(taxa_percentual),
-        "valor_repasse": taxa,
-        "liquido_paroquia": liquido_paroquia,
-    }
-
-
 # ===== LISTA DE EVENTOS (REPASSES) =====
 @login_required
 @user_passes_test(lambda u: u.is_admin_paroquia())
 def repasse_lista_eventos(request):
     paroquia = request.user.paroquia
-    eventos = (EventoAcampamento.objects
+    # uma linha de resumo por evento (services.financeiro), sem agregar Pagamento aqui
+    sem_resumo = EventoAcampamento.objects.filter(paroquia=paroquia, resumo_financeiro__isnull=True)
+    if sem_resumo.exists():
+        recalcular_resumos(sem_resumo.values("pk"))
+    resumos = (ResumoFinanceiroEvento.objects
                .filter(paroquia=paroquia)
-               .order_by("-data_inicio"))
-
-    # verifica se o campo fee_mp existe no modelo Pagamento
-    has_fee_mp = True
-    try:
-        Pagamento._meta.get_field("fee_mp")
-    except FieldDoesNotExist:
-        has_fee_mp = False
+               .select_related("evento")
+               .order_by("-evento__data_inicio"))
 
     linhas = []
-    for ev in eventos:
-        pagos = Pagamento.objects.filter(
-            inscricao__evento=ev,
-            status=Pagamento.StatusPagamento.CONFIRMADO
-        )
-        bruto = pagos.aggregate(total=Sum("valor"))["total"] or Decimal("0.00")
-
-        if has_fee_mp:
-            taxas_mp = pagos.aggregate(total=Sum("fee_mp"))["total"] or Decimal("0.00")
-        else:
-            taxas_mp = Decimal("0.00")  # sem a coluna fee_mp
-
+    tot_bruto = tot_taxas = Decimal("0.00")
+    for r in resumos:
+        tot_bruto += r.bruto
+        tot_taxas += r.taxas_mp
         linhas.append({
-            "evento": ev,
-            "bruto": bruto,
-            "taxas_mp": taxas_mp,
-            "detalhe_url": reverse("inscricoes:repasse_evento_detalhe", args=[ev.id]),
-            "sem_fee_mp": not has_fee_mp,
+            "evento": r.evento,
+            "bruto": r.bruto,
+            "taxas_mp": r.taxas_mp,
+            "detalhe_url": reverse("inscricoes:repasse_evento_detalhe", args=[r.evento_id]),
+            "sem_fee_mp": False,
         })
 
-    return render(request, "financeiro/repasse_lista_eventos.html", {"linhas": linhas})
+    return render(request, "financeiro/repasse_lista_eventos.html", {
+        "linhas": linhas,
+        "tot_bruto": tot_bruto,
+        "tot_taxas": tot_taxas,
+    })
 
 
 # ===== DETALHE DO EVENTO (REPASSE) =====
 @login_required
 @user_passes_test(lambda u: u.is_admin_paroquia())
 def repasse_evento_detalhe(request, evento_id):
-    evento = get_object_or_404(EventoAcampamento, id=evento_id, paroquia=request.user.paroquia)
-    fin = calcular_financeiro_evento(evento)
+    evento = get_object_or_404(
+        EventoAcampamento.objects.select_related("resumo_financeiro"),
+        id=evento_id, paroquia=request.user.paroquia,
+    )
+    fin = financeiro_evento(resumo_evento(evento))
 
     historico = (Repasse.objects
                  .filter(evento=evento, paroquia=request.user.paroquia)
@@ -3302,71 +3385,27 @@ def repasse_evento_detalhe(request, evento_id):
 @user_passes_test(lambda u: u.is_admin_paroquia())
 def gerar_pix_repasse_evento(request, evento_id):
     evento = get_object_or_404(EventoAcampamento, id=evento_id, paroquia=request.user.paroquia)
-    fin = calcular_financeiro_evento(evento)
-    valor = float(fin["valor_repasse"])
-
-    if valor <= 0:
-        messages.error(request, "Não há valor a repassar para este evento.")
-        return redirect("inscricoes:repasse_evento_detalhe", evento_id=evento.id)
 
     try:
-        sdk, cfg = mp_owner_client()
+        mp_owner_client()
     except Exception as e:
         messages.error(request, f"Configuração do Mercado Pago (DONO) ausente/inválida: {e}")
         return redirect("inscricoes:repasse_evento_detalhe", evento_id=evento.id)
 
-    notification_url = (cfg.notificacao_webhook_url or "").strip()
-
-    with transaction.atomic():
-        # Reutiliza (lock) ou cria um único repasse pendente por evento
-        repasse = (Repasse.objects
-                   .select_for_update()
-                   .filter(paroquia=request.user.paroquia,
-                           evento=evento,
-                           status=Repasse.Status.PENDENTE)
-                   .first())
-
-        if not repasse:
-            repasse = Repasse.objects.create(
-                paroquia=request.user.paroquia,
-                evento=evento,
-                valor_base=fin["base_repasse"],
-                taxa_percentual=fin["taxa_percent"],
-                valor_repasse=fin["valor_repasse"],
-                status=Repasse.Status.PENDENTE,
-            )
-        else:
-            # atualiza valores (se mudou algo desde a criação)
-            repasse.valor_base = fin["base_repasse"]
-            repasse.taxa_percentual = fin["taxa_percent"]
-            repasse.valor_repasse = fin["valor_repasse"]
-
-        body = {
-            "transaction_amount": float(repasse.valor_repasse),
-            "description": f"Repasse taxa sistema – {evento.nome}",
-            "payment_method_id": "pix",
-            "payer": {
-                "email": (request.user.email or cfg.email_cobranca or "repasse@dominio.local")
-            },
-            "external_reference": f"repasse:{request.user.paroquia_id}:{evento.id}",
-        }
-        if notification_url:
-            body["notification_url"] = notification_url
-
-        try:
-            resp = sdk.payment().create(body).get("response", {}) or {}
-            pio = (resp.get("point_of_interaction") or {})
-            tx = (pio.get("transaction_data") or {})
-
-            repasse.transacao_id = str(resp.get("id") or "")
-            repasse.qr_code_text = tx.get("qr_code")
-            repasse.qr_code_base64 = tx.get("qr_code_base64")
-            repasse.save()
-
-            messages.success(request, "PIX de repasse gerado/atualizado com sucesso.")
-        except Exception as e:
-            messages.error(request, f"Erro ao gerar PIX: {e}")
+    # mesmo fluxo do lote (services.repasse_lote): cobrança criada fora do lock
+    try:
+        res = gerar_repasses(eventos=[evento], pagador_email=request.user.email or None, max_workers=1)
+    except Exception as e:
+        logging.exception("Erro ao gerar repasse do evento %s: %s", evento.id, e)
+        messages.error(request, "Não foi possível gerar o PIX de repasse. Tente novamente.")
+        return redirect("inscricoes:repasse_evento_detalhe", evento_id=evento.id)
 
+    if not res.eventos:
+        messages.error(request, "Não há valor a repassar para este evento.")
+    elif res.erros:
+        messages.error(request, f"Erro ao gerar PIX: {res.erros[0][1]}")
+    else:
+        messages.success(request, "PIX de repasse gerado/atualizado com sucesso.")
     return redirect("inscricoes:repasse_evento_detalhe", evento_id=evento.id)
 
 
@@ -3423,7 +3462,7 @@ class LoginComImagemView(LoginView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["politica"] = PoliticaPrivacidade.objects.order_by("-id").first()
+        ctx["politica"] = politica_atual()
         return ctx
     
 @login_required
@@ -3464,20 +3503,19 @@ def video_evento_form(request, slug):
     })
 
 @never_cache
+@pagina_publica("painel_sorteio", por_requisicao={
+    # data/hora do servidor (localtime, respeita TIME_ZONE) preenchidas a cada acesso, mesmo com a página em cache
+    "server_now_iso": lambda request: timezone.localtime().isoformat(),       # para JS iniciar o relógio
+    "server_date": lambda request: timezone.localtime().strftime("%d/%m/%Y"),  # para render imediato
+    "server_time": lambda request: timezone.localtime().strftime("%H:%M:%S"),  # para render imediato
+})
 def painel_sorteio(request, slug):
     """
-    Página pública (telão). Envia data/hora do servidor (localtime) para o template.
+    Página pública (telão). Data/hora do servidor chegam pelo context processor
+    pagina_publica (ver decorator).
     """
     evento = get_object_or_404(EventoAcampamento, slug=slug)
-
-    agora = timezone.localtime()  # respeita TIME_ZONE e USE_TZ=True
-    context = {
-        "evento": evento,
-        "server_now_iso": agora.isoformat(),            # para JS iniciar o relógio
-        "server_date": agora.strftime("%d/%m/%Y"),      # para render imediato
-        "server_time": agora.strftime("%H:%M:%S"),      # para render imediato
-    }
-    return render(request, "inscricoes/painel_sorteio.html", context)
+    return render(request, "inscricoes/painel_sorteio.html", {"evento": evento})
 
 
 @never_cache
@@ -3504,12 +3542,12 @@ def api_selecionados(request, slug):
 
     def serializa_part(i: Inscricao) -> dict:
         p = i.participante
-        # foto: CloudinaryField pode não existir/estar vazio
+        # foto: CloudinaryField pode não existir/estar vazio; no telão vai a miniatura
         foto_url = None
         try:
             f = getattr(p, "foto", None)
             if f:
-                foto_url = f.url
+                foto_url = url_miniatura(f, 480) or None
         except Exception:
             foto_url = None
         return {
@@ -4083,13 +4121,12 @@ def _digits(s: str | None) -> str:
     return re.sub(r"\D", "", s or "")
 
 import re
-from uuid import uuid4, UUID
+from uuid import UUID
 from decimal import Decimal
 from datetime import date, datetime
 
 from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.utils.dateparse import parse_date, parse_datetime
 
@@ -4269,38 +4306,11 @@ def _parse_filhos_from_post(post):
         filhos.append({"nome": nome, "idade": idade, "telefone": tel})
     return filhos
 
-# ===================== AJUSTE 1 (helper de salvar arquivo) =====================
-def _save_binary_to_filefield(instance, candidate_field_names, filename, data) -> str | None:
-    """
-    Atribui um ContentFile diretamente ao campo de arquivo (ImageField/CloudinaryField).
-    Mantém a tentativa em múltiplos nomes de campo e usa savepoints.
-    """
-    field_names = {f.name for f in instance._meta.get_fields() if hasattr(f, "attname")}
-    content = ContentFile(data, name=filename)
-
-    for name in candidate_field_names:
-        if name not in field_names:
-            continue
-        sid = transaction.savepoint()
-        try:
-            setattr(instance, name, content)
-            instance.save(update_fields=[name])
-            transaction.savepoint_commit(sid)
-            return name
-        except Exception:
-            transaction.savepoint_rollback(sid)
-            continue
-    return None
-# ==============================================================================
-
+@controlar_admissao("evento_id")
 def formulario_casais(request, evento_id):
     evento = get_object_or_404(EventoAcampamento, id=evento_id)
 
-    politica = None
-    try:
-        politica = PoliticaPrivacidade.objects.first()
-    except Exception:
-        pass
+    politica = politica_atual()
 
     etapa = int(request.session.get("casais_etapa", 1))
 
@@ -4318,8 +4328,9 @@ def formulario_casais(request, evento_id):
                     if form_participante.is_valid() and form_inscricao.is_valid():
                         cpf = _digits(form_participante.cleaned_data.get("cpf"))
                         participante1, _ = Participante.objects.update_or_create(
-                            cpf=cpf,
+                            cpf_digitos=cpf,
                             defaults={
+                                "cpf": cpf,
                                 "nome": form_participante.cleaned_data.get("nome"),
                                 "email": form_participante.cleaned_data.get("email"),
                                 "telefone": form_participante.cleaned_data.get("telefone"),
@@ -4329,13 +4340,9 @@ def formulario_casais(request, evento_id):
                         if addr1:
                             _apply_address_to_participante(participante1, addr1)
 
-                        foto_tmp_path = None
-                        foto_original_name = None
+                        # original guardado uma vez (por conteúdo); o processamento fica com o worker
                         foto_file = form_inscricao.cleaned_data.get("foto_casal")
-                        if foto_file:
-                            foto_original_name = getattr(foto_file, "name", "foto_casal.jpg")
-                            tmp_name = f"tmp/casais/{uuid4()}_{foto_original_name}"
-                            foto_tmp_path = default_storage.save(tmp_name, foto_file)
+                        foto_id = registrar_foto(foto_file).pk if foto_file else None
 
                         dados_insc_serial = _serialize_for_session_from_form(form_inscricao)
                         dados_insc_serial.pop("foto_casal", None)
@@ -4354,8 +4361,7 @@ def formulario_casais(request, evento_id):
                         request.session["conjuge1"] = {
                             "participante_id": participante1.id,
                             "dados_inscricao": dados_insc_serial,
-                            "foto_tmp_path": foto_tmp_path,
-                            "foto_original_name": foto_original_name,
+                            "foto_id": foto_id,
                             "shared": {
                                 "endereco": addr1,
                                 "contatos": shared_contacts,
@@ -4376,8 +4382,9 @@ def formulario_casais(request, evento_id):
 
                         cpf2 = _digits(form_participante.cleaned_data.get("cpf"))
                         participante2, _ = Participante.objects.update_or_create(
-                            cpf=cpf2,
+                            cpf_digitos=cpf2,
                             defaults={
+                                "cpf": cpf2,
                                 "nome": form_participante.cleaned_data.get("nome"),
                                 "email": form_participante.cleaned_data.get("email"),
                                 "telefone": form_participante.cleaned_data.get("telefone"),
@@ -4418,40 +4425,26 @@ def formulario_casais(request, evento_id):
 
                         _pair_inscricoes(insc1, insc2)
 
-                        ic1 = InscricaoCasais.objects.create(inscricao=insc1, **dados1)
-                        ic2 = InscricaoCasais.objects.create(inscricao=insc2, **dados2)
+                        InscricaoCasais.objects.create(inscricao=insc1, **dados1)
+                        InscricaoCasais.objects.create(inscricao=insc2, **dados2)
 
-                        # ===================== AJUSTE 2 (leitura do arquivo) =====================
-                        # Lê do form_inscricao.files primeiro; se não tiver, cai no request.FILES
+                        # Foto: uma ArquivoFoto por conteúdo, ligada às duas inscrições. O worker
+                        # (processar_fotos) reduz, sobe e preenche foto_casal + Participante.foto.
                         foto_up = (getattr(form_inscricao, "files", None) or {}).get("foto_casal") \
                                   or request.FILES.get("foto_casal")
-                        data = None
-                        base_name = "foto_casal.jpg"
-
+                        foto = None
                         if foto_up:
-                            data = foto_up.read()
-                            base_name = getattr(foto_up, "name", base_name)
-                        else:
-                            tmp_path = (c1 or {}).get("foto_tmp_path")
-                            base_name = (c1 or {}).get("foto_original_name") or base_name
-                            if tmp_path and default_storage.exists(tmp_path):
-                                with default_storage.open(tmp_path, "rb") as fh:
-                                    data = fh.read()
-                                def _delete_tmp():
-                                    try:
-                                        default_storage.delete(tmp_path)
-                                    except Exception:
-                                        pass
-                                transaction.on_commit(_delete_tmp)
-                        # ==========================================================================
-
-                        if data:
-                            def _save_all_images():
-                                _save_binary_to_filefield(ic1, ["foto_casal", "foto", "imagem", "image", "photo"], base_name, data)
-                                _save_binary_to_filefield(ic2, ["foto_casal", "foto", "imagem", "image", "photo"], base_name, data)
-                                _save_binary_to_filefield(participante1, ["foto", "foto_participante", "imagem", "image", "avatar", "photo"], base_name, data)
-                                _save_binary_to_filefield(participante2, ["foto", "foto_participante", "imagem", "image", "avatar", "photo"], base_name, data)
-                            transaction.on_commit(_save_all_images)
+                            foto = registrar_foto(foto_up)
+                        elif c1.get("foto_id"):
+                            foto = ArquivoFoto.objects.filter(pk=c1["foto_id"]).first()
+                        elif c1.get("foto_tmp_path") and default_storage.exists(c1["foto_tmp_path"]):
+                            # sessão iniciada antes do worker de fotos
+                            tmp_path = c1["foto_tmp_path"]
+                            with default_storage.open(tmp_path, "rb") as fh:
+                                foto = registrar_foto(fh, c1.get("foto_original_name") or "")
+                            transaction.on_commit(lambda: default_storage.delete(tmp_path))
+                        if foto:
+                            vincular_foto(foto, [insc1, insc2])
 
                         filhos = ((c1.get("shared") or {}).get("filhos")) or []
                         for f in filhos:
@@ -4474,7 +4467,9 @@ def formulario_casais(request, evento_id):
                         request.session.pop("conjuge1", None)
                         request.session.pop("casais_etapa", None)
 
-                        return redirect("inscricoes:ver_inscricao", pk=insc1.id)
+                        resp = redirect("inscricoes:ver_inscricao", pk=insc1.id)
+                        liberar(request, resp, evento.pk)
+                        return resp
 
         except Exception:
             # Se algo falhar, deixe o Django mostrar a stacktrace em DEBUG
@@ -4661,11 +4656,15 @@ def alocar_em_massa(request: HttpRequest, evento_id: int) -> HttpResponse:
     # Filtro por busca de nome/CPF/email (GET ?q=)
     q = (request.GET.get("q") or "").strip()
     if q:
-        inscricoes_qs = inscricoes_qs.filter(
+        filtro = (
             Q(participante__nome__icontains=q)
             | Q(participante__cpf__icontains=q)
             | Q(participante__email__icontains=q)
         )
+        if len(cpf_digitos(q)) == 11:
+            # CPF completo, com ou sem máscara
+            filtro |= Q(participante__cpf_digitos=cpf_digitos(q))
+        inscricoes_qs = inscricoes_qs.filter(filtro)
 
     total_listados = inscricoes_qs.count()
 